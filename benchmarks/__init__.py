@@ -0,0 +1 @@
+''' Benchmarks for the isoxml package, run with python -m benchmarks.<name> '''
@@ -0,0 +1,48 @@
+'''
+Benchmark comparing the etree and expat parser backends: throughput and peak memory
+
+Usage: python -m benchmarks.builder_bench [TASKDATA.XML ...]
+
+Without arguments a synthetic document with 200000 points is used.
+'''
+import sys
+import time
+import tracemalloc
+
+from isoxml import entity
+
+from .spec_bench import document
+
+def measure(data, **options):
+    ''' Returns the best parse time and the peak traced memory of parsing data '''
+    timings = []
+    for _ in range(3):
+        start = time.perf_counter()
+        entity.fromstring(data, **options)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    entity.fromstring(data, **options)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return min(timings), peak
+
+def main(paths):
+    ''' Runs the benchmark on each path or on a synthetic document '''
+    samples = [(path, open(path, "rb").read()) for path in paths] or [("synthetic", document(200000).encode())]
+
+    for name, data in samples:
+        size = len(data) / 1e6
+        print(f"{name}: {size:.1f} MB")
+        for label, options in [
+            ("etree", {}),
+            ("etree compact", {"compact": True, "keep_element": False}),
+            ("expat", {"backend": "expat"}),
+            ("expat compact", {"backend": "expat", "compact": True}),
+        ]:
+            seconds, peak = measure(data, **options)
+            print(f"  {label:14} {size / seconds:6.1f} MB/s  peak {peak / 1e6:7.1f} MB")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,54 @@
+'''
+Benchmark of parallel parsing of a single document with 1 to N worker processes
+
+Usage: python -m benchmarks.parallel_bench [TASKDATA.XML ...]
+
+Without arguments a synthetic document with 20000 fields and 20000 tasks is used. The scan and
+unpickling the entities of the workers run in the calling process and bound the speedup.
+'''
+import concurrent.futures
+import os
+import sys
+import time
+
+from isoxml import entity, parallel
+
+def document(n):
+    ''' Returns a taskdata document with n fields of 20 boundary points and n tasks '''
+    pnts = '<PNT A="10" C="49.3682793876954" D="9.55990880103963" />' * 20
+    pfds = "".join(f'<PFD A="PFD{i}" C="Field {i}" D="1"><PLN A="1"><LSG A="1">{pnts}</LSG></PLN></PFD>' for i in range(n))
+    tsks = "".join(f'<TSK A="TSK{i}" G="1" E="PFD{i}"><TZN A="1"><PDV A="0006" B="100" /></TZN></TSK>' for i in range(n))
+    return f"""<ISO11783_TaskData VersionMajor="4" VersionMinor="0" ManagementSoftwareManufacturer="GaiaData"
+        ManagementSoftwareVersion="1.0.0" DataTransferOrigin="1">{pfds}{tsks}</ISO11783_TaskData>"""
+
+def best(fn, repeat=3):
+    ''' Returns the best wall clock time of fn over repeat runs '''
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main(paths):
+    ''' Runs the benchmark on each path or on a synthetic document '''
+    samples = [(path, open(path, "rb").read()) for path in paths] or [("synthetic", document(20000).encode())]
+    options = {"compact": True, "keep_element": False}
+
+    for name, data in samples:
+        size = len(data) / 1e6
+        sequential = best(lambda: entity.fromstring(data, **options))
+        scan = best(lambda: parallel.scan(data))
+        print(f"{name}: {size:.1f} MB, sequential {sequential:.2f} s, scan {scan:.2f} s")
+
+        workers = 1
+        while workers <= (os.cpu_count() or 1):
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+                # start the workers before timing
+                list(pool.map(abs, range(workers)))
+                seconds = best(lambda: parallel.parse(data, executor=pool, chunk_size=len(data) // (4 * workers), **options))
+            print(f"  {workers:3} workers {seconds:6.2f} s  speedup {sequential / seconds:5.2f}x")
+            workers *= 2
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
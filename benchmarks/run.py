@@ -0,0 +1,222 @@
+'''
+Reproducible benchmark suite over synthetic TASKDATA sets
+
+Usage: python -m benchmarks.run [--scale small|medium|large] [--repeat N] [--output FILE]
+
+Generates a TASKDATA set of the given scale with benchmarks.synthetic in a temporary directory and
+measures import time, parse throughput and peak memory of the parser backends, loading and indexing
+the set, decoding and aggregating its time logs, process values and grids, assigning positions to
+its fields, projecting positions and writing it back. Runs offline and deterministically and prints
+the results as JSON (or writes them to FILE), so runs on different commits or machines can be
+compared. Requires numpy.
+'''
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+
+import isoxml
+import numpy as np
+
+from isoxml import aggregate, builder, dataset, device, entity, geodesy, spatial, timelog, writer
+
+from . import synthetic
+from .spec_bench import best
+
+SCALES = {
+    "small": {"tasks": 10, "vertices": 100, "depth": 3, "records": 1000, "grid": (50, 50)},
+    "medium": {"tasks": 200, "vertices": 500, "depth": 5, "records": 10000, "grid": (200, 200)},
+    "large": {"tasks": 2000, "vertices": 2000, "depth": 7, "records": 50000, "grid": (500, 500)},
+}
+
+def peak_memory(fn):
+    ''' Returns the peak memory traced by tracemalloc while running fn '''
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+def import_time(repeat):
+    ''' Returns the best time of importing isoxml in a fresh interpreter '''
+    code = "import time; start = time.perf_counter(); import isoxml.entity; print(time.perf_counter() - start)"
+    timings = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+        timings.append(float(output))
+    return min(timings)
+
+def parse(data, repeat):
+    ''' Returns throughput and peak memory of parsing data with each backend and option set '''
+    variants = {
+        "etree": lambda: entity.fromstring(data),
+        "etree_compact": lambda: entity.fromstring(data, compact=True, keep_element=False),
+        "expat_compact": lambda: builder.parse(data, compact=True),
+        "expat_columnar": lambda: builder.parse(data, compact=True, columnar=True),
+    }
+    results = {}
+    for name, fn in variants.items():
+        seconds = best(fn, repeat)
+        results[name] = {
+            "seconds": seconds,
+            "mb_per_second": len(data) / 1e6 / seconds,
+            "peak_memory": peak_memory(fn),
+        }
+    return results
+
+def timelogs(ds, repeat):
+    ''' Returns the throughput of decoding all time logs of ds '''
+    tlgs = [tlg for tsk in ds.tsks for tlg in getattr(tsk, "tlgs", ())]
+
+    def decode():
+        count = 0
+        for tlg in tlgs:
+            with ds.timelog(tlg) as log:
+                for chunk in log.chunks():
+                    count += len(chunk)
+        return count
+
+    records = decode()
+    seconds = best(decode, repeat)
+    return {"records": records, "seconds": seconds, "records_per_second": records / seconds}
+
+def time_ranges(ds, repeat):
+    ''' Returns the time of building the time index of a log and of reading a tenth of it by time '''
+    tlg = ds.tsks[0].tlgs[0]
+    with ds.timelog(tlg) as log:
+        build = best(log.build_index, repeat)
+        times = log.read(0, 1)["time"], log.read(-1)["time"]
+        start = times[0][0] + (times[1][0] - times[0][0]) * 45 // 100
+        stop = start + (times[1][0] - times[0][0]) // 10
+        seconds = best(lambda: log.read_time(start, stop), repeat)
+        scan = best(lambda: timelog.TimeLog(log.header, log.data).read_time(start, stop), repeat)
+    return {"build_seconds": build, "indexed_seconds": seconds, "unindexed_seconds": scan}
+
+def devices(ds, repeat):
+    ''' Returns the build time of the device tables of ds and their throughput scaling logged values '''
+    build = best(lambda: device.Devices(ds.dvcs), repeat)
+    tables = device.Devices(ds.dvcs)
+
+    tlg = ds.tsks[0].tlgs[0]
+    with ds.timelog(tlg) as log:
+        records = log.read()
+        dlvs = log.header.dlvs
+    values = records["values"]
+    seconds = best(lambda: tables.decode(values, dlvs, records["present"]), repeat)
+    return {"build_seconds": build, "decode_seconds": seconds, "values_per_second": values.size / seconds}
+
+def summaries(ds, repeat):
+    ''' Returns the throughput of summarizing the time logs of all tasks of ds '''
+    tasks = ds.tsks
+    devices = device.Devices(ds.dvcs)
+    records = sum(aggregate.summarize_task(ds, tsk, devices).records for tsk in tasks)
+    seconds = best(lambda: [aggregate.summarize_task(ds, tsk, devices) for tsk in tasks], repeat)
+    return {"records": records, "seconds": seconds, "records_per_second": records / seconds}
+
+def projections(ds, repeat, positions=1000000):
+    ''' Returns the throughput of projecting positions to UTM and ENU and of field boundary areas '''
+    rng = np.random.default_rng(0)
+    north, east = rng.uniform(48, 48.1, positions), rng.uniform(9, 9.1, positions)
+    utm = best(lambda: geodesy.utm(north, east), repeat)
+    local = best(lambda: geodesy.enu(north, east), repeat)
+    length = best(lambda: geodesy.distance(north[:-1], east[:-1], north[1:], east[1:]), repeat)
+
+    plns = [pln for pfd in ds.pfds for pln in getattr(pfd, "plns", ())]
+    area = best(lambda: [geodesy.pln_area(pln) for pln in plns], repeat)
+    return {
+        "utm_positions_per_second": positions / utm,
+        "enu_positions_per_second": positions / local,
+        "distance_pairs_per_second": (positions - 1) / length,
+        "pln_area_seconds": area,
+    }
+
+def grids(ds, repeat):
+    ''' Returns the throughput of opening all grids of ds and summing their cells '''
+    pairs = [(grd, tsk) for tsk in ds.tsks for grd in getattr(tsk, "grds", ())]
+
+    def read():
+        cells = 0
+        for grd, tsk in pairs:
+            values = ds.grid(grd, tsk)
+            values.sum(dtype="i8")
+            cells += values.size
+        return cells
+
+    cells = read()
+    seconds = best(read, repeat)
+    return {"cells": cells, "seconds": seconds, "cells_per_second": cells / seconds}
+
+def fields(ds, repeat, positions=100000):
+    ''' Returns the build time of the field index of ds and its throughput assigning random positions '''
+    pfds = ds.pfds
+    build = best(lambda: spatial.FieldIndex(pfds), repeat)
+    index = spatial.FieldIndex(pfds)
+
+    rng = np.random.default_rng(0)
+    south, west, north, east = index.bbox()
+    north, east = rng.uniform(south, north, positions), rng.uniform(west, east, positions)
+    seconds = best(lambda: index.locate(north, east), repeat)
+    return {"build_seconds": build, "query_seconds": seconds, "positions_per_second": positions / seconds}
+
+def run(scale="small", repeat=3, directory=None):
+    ''' Runs the suite on a set of the given scale, generated in directory or a temporary one, and returns the results '''
+    parameters = SCALES[scale]
+    with tempfile.TemporaryDirectory() as temporary:
+        target = directory or os.path.join(temporary, "TASKDATA")
+        counts = synthetic.generate(target, **parameters)
+        with open(os.path.join(target, dataset.ROOT), "rb") as f:
+            data = f.read()
+
+        ds = dataset.open(target, compact=True, keep_element=False)
+        results = {
+            "import_seconds": import_time(repeat),
+            "parse": parse(data, repeat),
+            "index_seconds": best(lambda: dataset.open(target, compact=True, keep_element=False).index(), repeat),
+            "query_seconds": best(lambda: ds.query().count("TSK/TZN/PDV[ddi=0006]"), repeat),
+            "timelog": timelogs(ds, repeat),
+            "time_range": time_ranges(ds, repeat),
+            "device": devices(ds, repeat),
+            "aggregate": summaries(ds, repeat),
+            "grid": grids(ds, repeat),
+            "fields": fields(ds, repeat),
+            "geodesy": projections(ds, repeat),
+        }
+        seconds = best(lambda: writer.write(ds.root, io.BytesIO()), repeat)
+        results["write"] = {"seconds": seconds, "mb_per_second": len(data) / 1e6 / seconds}
+        ds.close()
+
+    return {
+        "version": isoxml.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scale": scale,
+        "parameters": parameters,
+        "size": len(data),
+        "entities": counts,
+        "results": results,
+    }
+
+def main(argv=None):
+    ''' Runs the suite with the parameters given on the command line '''
+    parser = argparse.ArgumentParser(description="Run the isoxml benchmark suite")
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="JSON file to write the results to instead of stdout")
+    args = parser.parse_args(argv)
+
+    results = json.dumps(run(args.scale, args.repeat), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(results + "\n")
+    else:
+        print(results)
+
+if __name__ == "__main__":
+    main()
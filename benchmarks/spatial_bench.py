@@ -0,0 +1,39 @@
+'''
+Benchmark of building the field index and assigning positions to fields
+
+Usage: python -m benchmarks.spatial_bench [fields] [vertices] [positions]
+
+Fields with boundaries of the given number of vertices are generated with benchmarks.synthetic and
+random positions around them are assigned to the fields with spatial.FieldIndex.
+'''
+import sys
+import tempfile
+
+import numpy as np
+
+from isoxml import dataset, spatial
+
+from . import synthetic
+from .spec_bench import best
+
+def main(fields=1000, vertices=200, positions=1000000):
+    ''' Runs the benchmark on a generated set of fields '''
+    with tempfile.TemporaryDirectory() as directory:
+        synthetic.generate(directory, tasks=fields, vertices=vertices, records=0, grid=(1, 1))
+        pfds = dataset.open(directory, compact=True, keep_element=False, columnar=True).pfds
+
+    build = best(lambda: spatial.FieldIndex(pfds))
+    index = spatial.FieldIndex(pfds)
+
+    rng = np.random.default_rng(0)
+    south, west, north, east = index.bbox()
+    north, east = rng.uniform(south, north, positions), rng.uniform(west, east, positions)
+    query = best(lambda: index.locate(north, east), repeat=3)
+    assigned = int((index.locate(north, east) >= 0).sum())
+
+    print(f"fields: {fields}, vertices: {vertices}, positions: {positions}")
+    print(f"build: {build * 1000:.1f} ms")
+    print(f"query: {query * 1000:.1f} ms ({positions / query:,.0f} positions/s, {assigned} in a field)")
+
+if __name__ == "__main__":
+    main(*(int(x) for x in sys.argv[1:]))
@@ -0,0 +1,74 @@
+'''
+Microbenchmark comparing attribute handling of the compiled spec against the original dict spec
+
+Usage: python -m benchmarks.spec_bench [number of points]
+
+Also reports how parse time grows with the document size, which should be linear.
+'''
+import re
+import sys
+import time
+import xml.etree.ElementTree
+
+from isoxml import entity, spec
+
+def document(n):
+    ''' Returns a taskdata document with a single boundary of n points '''
+    pnts = '<PNT A="10" C="49.3682793876954" D="9.55990880103963" />' * n
+    return f"""<ISO11783_TaskData VersionMajor="4" VersionMinor="0" ManagementSoftwareManufacturer="GaiaData"
+        ManagementSoftwareVersion="1.0.0" DataTransferOrigin="1">
+        <PFD A="PFD1" C="Field" D="1"><PLN A="1"><LSG A="1">{pnts}</LSG></PLN></PFD>
+    </ISO11783_TaskData>"""
+
+def legacy(element, definitions):
+    ''' The original parse loop: dict spec lookups and regex renaming of every attribute '''
+    definition = definitions[element.tag]
+    _map = definition["map"]
+    pattern = re.compile(r'(?<!^)(?=[A-Z])')
+    fields = {}
+
+    for k, v in element.attrib.items():
+        if k in _map:
+            k = _map[k]
+        fields[pattern.sub('_', k).lower()] = v
+
+    for k in definition["required"]:
+        if pattern.sub('_', k).lower() not in fields:
+            raise ValueError(k)
+
+    for child_tag in definition["ctags"]:
+        children = element.findall(child_tag)
+        if children:
+            fields[child_tag.lower() + 's'] = [legacy(e, definitions) for e in children]
+
+    return fields
+
+def best(fn, repeat=5):
+    ''' Returns the best wall clock time of fn over repeat runs '''
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main(n=100000):
+    ''' Runs the benchmark on a document with n points '''
+    element = xml.etree.ElementTree.fromstring(document(n))
+    definitions = spec.init()
+
+    old = best(lambda: legacy(element, definitions))
+    new = best(lambda: entity.Entity.from_element(element, raw=True))
+
+    print(f"points: {n}")
+    print(f"dict spec + regex: {old * 1000:.1f} ms ({n / old:,.0f} PNT/s)")
+    print(f"compiled spec:     {new * 1000:.1f} ms ({n / new:,.0f} PNT/s)")
+    print(f"speedup:           {old / new:.2f}x")
+
+    # 8x the points should take about 8x the time, much more means super-linear growth
+    small, large = document(n // 8), document(n)
+    ratio = best(lambda: entity.Entity(large)) / best(lambda: entity.Entity(small))
+    print(f"8x points:         {ratio:.2f}x time")
+
+if __name__ == "__main__":
+    main(*(int(x) for x in sys.argv[1:]))
@@ -0,0 +1,169 @@
+'''
+Generator of synthetic, valid TASKDATA sets at configurable scale
+
+Usage: python -m benchmarks.synthetic DIRECTORY [--tasks N] [--vertices N] [--depth N]
+       [--records N] [--grid ROWS COLUMNS] [--seed N]
+
+Every task has its own field (PFD) with a boundary of the given number of vertices, treatment zones,
+a grid of process values (GRD) and a time log (TLG) of the given number of records. The device (DVC)
+has a binary tree of device elements (DET) of the given depth, each with process data (DPD). The
+output only depends on the parameters and the seed. Requires numpy.
+'''
+import argparse
+import math
+import random
+
+import numpy as np
+
+from isoxml import entity, writer
+
+# DDIs of the generated process data: setpoint volume per area and setpoint mass per area
+# application rate, actual work state and total area
+_ddis = (0x0001, 0x0006, 0x008D, 0x0074)
+
+def _boundary(rng, north, east, vertices):
+    ''' Returns the PNT of a closed, irregular ring around north/east '''
+    pnts = []
+    for i in range(vertices):
+        angle = 2 * math.pi * i / vertices
+        radius = 0.002 * (1 + 0.3 * rng.random())
+        pnts.append(entity.new("PNT", compact=True, type=2, north=round(north + radius * math.sin(angle), 9),
+                               east=round(east + radius * math.cos(angle), 9)))
+    pnts.append(entity.new("PNT", compact=True, type=2, north=pnts[0].north, east=pnts[0].east))
+    return pnts
+
+def _device(depth):
+    ''' Returns a DVC with a binary tree of DET of depth levels, each with a DPD per DDI '''
+    dets, dpds = [], []
+    object_id = 1
+
+    def add(parent, level):
+        nonlocal object_id
+        det_object = object_id
+        object_id += 1
+        dors = []
+        for ddi in _ddis:
+            dpds.append(entity.new("DPD", compact=True, object_id=object_id, ddi=ddi, property=1, trigger_methods=31,
+                                   designator=f"DDI {ddi:04X}", dvp_object_id=0x7FFF))
+            dors.append(entity.new("DOR", compact=True, device_object_id=object_id))
+            object_id += 1
+        dets.append(entity.new("DET", compact=True, id=f"DET-{len(dets) + 1}", object_id=det_object,
+                               type=1 if level == 0 else (2 if level < depth - 1 else 4),
+                               designator=f"Element {det_object}", number=len(dets), parent_object_id=parent,
+                               dors=dors))
+        if level < depth - 1:
+            for _ in range(2):
+                add(det_object, level + 1)
+
+    add(0, 0)
+    dvp = entity.new("DVP", compact=True, object_id=0x7FFF, offset=0, scale=0.001, number_of_decimals=3,
+                     unit_designator="l/ha")
+    return entity.new("DVC", compact=True, id="DVC-1", designator="Sprayer", client_name="A000860020800001",
+                      structure_label="535052415945525F", localization_label="FF000000006564",
+                      dets=dets, dpds=dpds, dvps=[dvp])
+
+def _timelog(rng, north, east, records, dets):
+    ''' Returns the header and the binary records of a TLG logging every DDI of the first DETs '''
+    dlvs = [(ddi, det.id) for det in dets[:4] for ddi in _ddis]
+    tim = entity.new("TIM", start="", type=4,
+                     ptns=[entity.new("PTN", north="", east="", status="", number_of_satellites="")],
+                     dlvs=[entity.new("DLV", ddi=ddi, value="", det_id_ref=det) for ddi, det in dlvs])
+
+    fields = [("time", "<u4"), ("date", "<u2"), ("north", "<i4"), ("east", "<i4"), ("status", "u1"),
+              ("satellites", "u1"), ("count", "u1")]
+    for i in range(len(dlvs)):
+        fields += [(f"index{i}", "u1"), (f"value{i}", "<i4")]
+    data = np.zeros(records, dtype=np.dtype(fields))
+
+    ms = 8 * 3600 * 1000 + np.arange(records, dtype=np.int64) * 1000
+    data["time"] = ms % 86400000
+    data["date"] = 15706 + ms // 86400000
+    step = np.arange(records) / max(records, 1)
+    data["north"] = np.round((north - 0.002 + 0.004 * step) * 1e7)
+    data["east"] = np.round((east + 0.001 * np.sin(step * 50)) * 1e7)
+    data["status"] = 4
+    data["satellites"] = 12
+    data["count"] = len(dlvs)
+    values = np.random.default_rng(rng.randrange(2 ** 32)).integers(0, 100000, size=(records, len(dlvs)))
+    for i in range(len(dlvs)):
+        data[f"index{i}"] = i
+        data[f"value{i}"] = values[:, i]
+
+    return writer.tostring(tim), data.tobytes()
+
+def generate(target, tasks=10, vertices=100, depth=3, records=1000, grid=(100, 100), seed=0):
+    '''
+    Writes a synthetic TASKDATA set to target, a directory or the path of a ZIP archive
+
+    Returns the number of entities per tag of TASKDATA.XML.
+    '''
+    rng = random.Random(seed)
+    dvc = _device(depth)
+    rows, columns = grid
+    files = {}
+    pfds, tsks = [], []
+
+    for i in range(1, tasks + 1):
+        north, east = 48 + 0.01 * (i // 100), 9 + 0.01 * (i % 100)
+        pln = entity.new("PLN", compact=True, type=1, lsgs=[
+            entity.new("LSG", compact=True, type=1, pnts=_boundary(rng, north, east, vertices))])
+        pfds.append(entity.new("PFD", compact=True, id=f"PFD{i}", designator=f"Field {i}", area=40000,
+                               ctr_id_ref="CTR1", frm_id_ref="FRM1", plns=[pln]))
+
+        tzns = [
+            entity.new("TZN", compact=True, code=code, designator=f"Zone {code}", pdvs=[
+                entity.new("PDV", compact=True, ddi=0x0006, value=rng.randrange(50000, 200000), pdt_id_ref="PDT1",
+                           vpn_id_ref="VPN1")])
+            for code in range(1, 4)
+        ]
+
+        cells = np.random.default_rng(rng.randrange(2 ** 32)).integers(50000, 200000, size=(rows, columns, 1))
+        files[f"GRD{i:05d}.BIN"] = cells.astype("<i4").tobytes()
+        grd = entity.new("GRD", compact=True, minimum_north_position=north - 0.002, minimum_east_position=east - 0.003,
+                         cell_north_size=0.004 / rows, cell_east_size=0.006 / columns, maximum_column=columns,
+                         maximum_row=rows, file_name=f"GRD{i:05d}", file_length=rows * columns * 4, grid_type=2,
+                         treatment_zone_code=1)
+
+        header, data = _timelog(rng, north, east, records, dvc.dets)
+        files[f"TLG{i:05d}.XML"] = header
+        files[f"TLG{i:05d}.BIN"] = data
+
+        tsks.append(entity.new("TSK", compact=True, id=f"TSK{i}", designator=f"Task {i}", ctr_id_ref="CTR1",
+                               frm_id_ref="FRM1", pfd_id_ref=f"PFD{i}", status=4, default_treatment_zone_code=2,
+                               position_lost_treatment_zone_code=3, out_of_field_treatment_zone_code=3,
+                               tzns=tzns, grds=[grd], tlgs=[entity.new("TLG", compact=True, file_name=f"TLG{i:05d}", type=1)]))
+
+    root = entity.new(
+        "ISO11783_TaskData", compact=True, version_major=4, version_minor=3,
+        management_software_manufacturer="isoxml benchmarks", management_software_version="1.0",
+        data_transfer_origin=1,
+        ctrs=[entity.new("CTR", compact=True, id="CTR1", last_name="Farmer")],
+        dvcs=[dvc],
+        frms=[entity.new("FRM", compact=True, id="FRM1", designator="Farm", ctr_id_ref="CTR1")],
+        pfds=pfds,
+        pdts=[entity.new("PDT", compact=True, id="PDT1", designator="Fertilizer", vpn_id_ref="VPN1")],
+        tsks=tsks,
+        vpns=[entity.new("VPN", compact=True, id="VPN1", offset=0, scale=0.01, number_of_decimals=2,
+                         unit_designator="l/ha")],
+    )
+    writer.write_set(root, target, files=files, indent=" ")
+
+    return {"TSK": tasks, "PFD": tasks, "PNT": tasks * (vertices + 1), "DET": len(dvc.dets), "DPD": len(dvc.dpds)}
+
+def main(argv=None):
+    ''' Generates a TASKDATA set with the parameters given on the command line '''
+    parser = argparse.ArgumentParser(description="Generate a synthetic TASKDATA set")
+    parser.add_argument("target", help="directory or .zip path")
+    parser.add_argument("--tasks", type=int, default=10)
+    parser.add_argument("--vertices", type=int, default=100)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--records", type=int, default=1000)
+    parser.add_argument("--grid", type=int, nargs=2, default=(100, 100), metavar=("ROWS", "COLUMNS"))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    counts = generate(args.target, args.tasks, args.vertices, args.depth, args.records, tuple(args.grid), args.seed)
+    print(", ".join(f"{count} {tag}" for tag, count in counts.items()))
+
+if __name__ == "__main__":
+    main()
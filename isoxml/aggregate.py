@@ -0,0 +1,292 @@
+'''
+Streaming aggregation of TimeLog process values per DDI and device element
+
+Records of a TLG are reduced chunk by chunk into a Summary holding count, sum, minimum, maximum,
+first and last value of every logged (DDI, DET id), the time spent in work state and, given a
+prescription.Prescription, the sum and count of the values per treatment zone. Summaries are merged
+across chunks of a log and across logs, so a season of logs never has to be held in memory and
+files or tasks can be summarized in parallel and combined afterwards.
+
+Typical usage example:
+
+summary = isoxml.aggregate.summarize_task(dataset, tsk)
+print(summary.total(aggregate.TOTAL_AREA), summary.work_time())
+
+'''
+
+import numpy as np
+
+from . import device
+from . import exception
+
+# DDIs of the totals and of the work state
+TOTAL_VOLUME = 0x0050
+TOTAL_AREA = 0x0074
+WORK_STATE = 0x008D
+
+# the work state value of an element that is working
+_WORKING = 1
+
+# zone codes are bytes, row 0 collects the records without a zone (code -1)
+_ZONES = 256 + 1
+
+# per key arrays and their initial values
+_fields = {
+    "count": 0,
+    "sum": 0.0,
+    "min": np.inf,
+    "max": -np.inf,
+    "first": np.nan,
+    "first_time": np.nan,
+    "last": np.nan,
+    "last_time": np.nan,
+    "delta": 0.0,
+    "work": 0.0,
+    "leading": 0.0,
+    "state": np.nan,
+}
+
+class Summary:
+    '''
+    Mergeable statistics of the process values of time logs, keyed by (DDI, DET id)
+
+    keys lists the keys in order of first appearance, the arrays count, sum, min, max, first, last,
+    first_time and last_time (ms since the epoch) hold one entry per key. delta is the increase of
+    each value from its first to its last record, summed over the merged logs, which is the amount
+    logged by total counters such as TOTAL_AREA. work holds the milliseconds spent with each
+    WORK_STATE key on. zone_sum and zone_count hold the sum and count of the values per zone code
+    (row code + 1) and key. start and end are the times of the first and last record, records the
+    number of records.
+    '''
+
+    def __init__(self, keys=()):
+        self.keys = []
+        self._columns = {}
+        self.records = 0
+        self.start = None
+        self.end = None
+        for name, value in _fields.items():
+            setattr(self, name, np.full(0, value, dtype=np.int64 if name == "count" else float))
+        self.zone_sum = np.zeros((_ZONES, 0))
+        self.zone_count = np.zeros((_ZONES, 0), dtype=np.int64)
+        self.columns(keys)
+
+    def columns(self, keys):
+        ''' Returns the columns of keys, adding columns for new keys '''
+        keys = [tuple(k) for k in keys]
+        new = [k for k in dict.fromkeys(keys) if k not in self._columns]
+        if new:
+            for k in new:
+                self._columns[k] = len(self.keys)
+                self.keys.append(k)
+            for name, value in _fields.items():
+                array = getattr(self, name)
+                setattr(self, name, np.concatenate([array, np.full(len(new), value, dtype=array.dtype)]))
+            self.zone_sum = np.pad(self.zone_sum, ((0, 0), (0, len(new))))
+            self.zone_count = np.pad(self.zone_count, ((0, 0), (0, len(new))))
+        return np.array([self._columns[k] for k in keys], dtype=np.intp)
+
+    def merge(self, other, continuous=False):
+        '''
+        Adds the statistics of another summary, e.g. of another chunk, log or task
+
+        other must follow this summary in time for first and last to be meaningful. If continuous is
+        set, other is the next chunk of the same log: the interval between the last record of this
+        summary and the first of other counts towards the work time and the increase of the values
+        between them towards delta.
+        '''
+        if not other.records:
+            return self
+        c = self.columns(other.keys)
+        joined = continuous and self.records > 0
+
+        if joined:
+            gap = other.start - self.end
+            working = self.state[c] == _WORKING
+            self.work[c] += np.where(working, gap + other.leading, 0.0)
+            unknown = np.isnan(self.state[c])
+            self.leading[c] += np.where(unknown, gap + other.leading, 0.0)
+            both = (self.count[c] > 0) & (other.count > 0)
+            self.delta[c] += np.where(both, other.first - np.where(both, self.last[c], 0.0), 0.0)
+        elif not self.records:
+            self.leading[c] = other.leading
+
+        empty = self.count[c] == 0
+        self.first[c] = np.where(empty, other.first, self.first[c])
+        self.first_time[c] = np.where(empty, other.first_time, self.first_time[c])
+        logged = other.count > 0
+        self.last[c] = np.where(logged, other.last, self.last[c])
+        self.last_time[c] = np.where(logged, other.last_time, self.last_time[c])
+        self.state[c] = np.where(np.isnan(other.state), self.state[c], other.state)
+
+        self.count[c] += other.count
+        self.sum[c] += other.sum
+        self.min[c] = np.minimum(self.min[c], other.min)
+        self.max[c] = np.maximum(self.max[c], other.max)
+        self.delta[c] += other.delta
+        self.work[c] += other.work
+        self.zone_sum[:, c] += other.zone_sum
+        self.zone_count[:, c] += other.zone_count
+
+        self.start = other.start if self.start is None else min(self.start, other.start)
+        self.end = other.end if self.end is None else max(self.end, other.end)
+        self.records += other.records
+        return self
+
+    def _select(self, ddi, det_id):
+        ''' Returns the column of (ddi, det_id), or of the first key with ddi if det_id is None '''
+        if det_id is not None:
+            return self._columns.get((ddi, det_id))
+        return next((i for i, (d, _) in enumerate(self.keys) if d == ddi), None)
+
+    def total(self, ddi=TOTAL_AREA, det_id=None):
+        '''
+        Returns the amount logged by a total counter (e.g. TOTAL_AREA or TOTAL_VOLUME) or None
+
+        The amount is the increase of the counter within every log, in the unit of its DVP or of
+        the DDI. Without det_id the first element logging ddi is used, which is usually the device.
+        '''
+        i = self._select(ddi, det_id)
+        return None if i is None or not self.count[i] else float(self.delta[i])
+
+    def work_time(self, det_id=None):
+        ''' Returns the seconds spent in work state, of the first element logging it if det_id is None '''
+        i = self._select(WORK_STATE, det_id)
+        return None if i is None else float(self.work[i]) / 1000
+
+    def mean(self, ddi, det_id=None):
+        ''' Returns the mean of the values of ddi or None '''
+        i = self._select(ddi, det_id)
+        return None if i is None or not self.count[i] else float(self.sum[i] / self.count[i])
+
+    def zone_means(self, ddi, det_id=None):
+        ''' Returns a dict mapping zone codes to the mean of the values of ddi logged within the zone '''
+        i = self._select(ddi, det_id)
+        if i is None:
+            return {}
+        rows = np.flatnonzero(self.zone_count[:, i])
+        return {int(row) - 1: float(self.zone_sum[row, i] / self.zone_count[row, i]) for row in rows}
+
+    def as_dict(self):
+        ''' Returns the statistics per key as a dict, e.g. for exporting them as JSON '''
+        result = {}
+        for i, (ddi, det_id) in enumerate(self.keys):
+            if not self.count[i]:
+                continue
+            result[f"{ddi:04X}/{det_id}"] = {
+                "count": int(self.count[i]),
+                "sum": float(self.sum[i]),
+                "min": float(self.min[i]),
+                "max": float(self.max[i]),
+                "first": float(self.first[i]),
+                "last": float(self.last[i]),
+                "delta": float(self.delta[i]),
+            }
+        return {"records": self.records, "start": self.start, "end": self.end, "keys": result}
+
+def reduce(records, dlvs, devices=None, prescription=None):
+    '''
+    Returns the Summary of a chunk of decoded timelog records
+
+    dlvs holds (DDI, DET id) of the values columns, as timelog.Header.dlvs. Values are scaled
+    with the DVP of their DPD if devices (device.Devices) are given. If a prescription is given,
+    values are also aggregated per zone of the record positions, which requires the north and east
+    fields in the records. Logs with more than one DLV of the same (DDI, DET id) are rejected, as
+    their values cannot be told apart.
+    '''
+    keys = [tuple(k) for k in dlvs]
+    if len(set(keys)) != len(keys):
+        duplicates = sorted({k for k in keys if keys.count(k) > 1})
+        raise exception.ISOXMLParseException(f"Duplicate DLVs in time log: {duplicates}")
+    summary = Summary(dlvs)
+    n = len(records)
+    if not n:
+        return summary
+
+    present = records["present"]
+    if devices is not None:
+        values = devices.decode(records["values"], dlvs, present)
+    else:
+        values = np.where(present, records["values"], np.nan)
+    time = records["time"].astype(np.int64).astype(float)
+
+    summary.records = n
+    summary.start, summary.end = time[0], time[-1]
+    summary.count = present.sum(axis=0)
+    summary.sum = np.where(present, values, 0.0).sum(axis=0)
+    summary.min = np.where(present, values, np.inf).min(axis=0)
+    summary.max = np.where(present, values, -np.inf).max(axis=0)
+
+    logged = summary.count > 0
+    columns = np.arange(len(dlvs))
+    first = present.argmax(axis=0)
+    last = n - 1 - present[::-1].argmax(axis=0)
+    summary.first = np.where(logged, values[first, columns], np.nan)
+    summary.last = np.where(logged, values[last, columns], np.nan)
+    summary.first_time = np.where(logged, time[first], np.nan)
+    summary.last_time = np.where(logged, time[last], np.nan)
+    summary.delta = np.where(logged, summary.last - summary.first, 0.0)
+
+    # the work state holds from its record until the next record, the time before the first
+    # logged state is kept as leading to be resolved when merging with the previous chunk
+    durations = np.diff(time)
+    for j, (ddi, _) in enumerate(dlvs):
+        if ddi != WORK_STATE:
+            continue
+        if not logged[j]:
+            summary.leading[j] = time[-1] - time[0]
+            continue
+        index = np.maximum.accumulate(np.where(present[:, j], np.arange(n), -1))
+        state = values[index, j]
+        summary.work[j] = durations[(state[:-1] == _WORKING) & (index[:-1] >= 0)].sum()
+        summary.leading[j] = time[first[j]] - time[0]
+        summary.state[j] = state[-1]
+
+    if prescription is not None and len(dlvs):
+        codes = prescription.zones(records["north"], records["east"]).astype(np.intp) + 1
+        k = len(dlvs)
+        index = (codes[:, None] * k + columns)[present]
+        summary.zone_sum = np.bincount(index, weights=values[present], minlength=_ZONES * k).reshape(_ZONES, k)
+        summary.zone_count = np.bincount(index, minlength=_ZONES * k).reshape(_ZONES, k)
+
+    return summary
+
+def summarize(log, devices=None, prescription=None, chunk_size=65536):
+    ''' Returns the Summary of all records of a timelog.TimeLog, reading it chunk by chunk '''
+    dlvs = log.header.dlvs
+    summary = Summary(dlvs)
+    for chunk in log.chunks(chunk_size):
+        summary.merge(reduce(chunk, dlvs, devices, prescription), continuous=True)
+    return summary
+
+def summarize_task(dataset, tsk, devices=None, zones=True, executor=None, chunk_size=65536):
+    '''
+    Returns the merged Summary of the TLGs of a TSK of a dataset.Dataset
+
+    Values are scaled with the device descriptions of the dataset unless devices is given. If
+    zones is set, values are aggregated per treatment zone of the task (see
+    prescription.Prescription). If executor (e.g. a concurrent.futures.ThreadPoolExecutor) is
+    given, the logs are summarized concurrently.
+    '''
+    from . import prescription
+
+    if devices is None:
+        devices = device.Devices(dataset.dvcs)
+
+    zoning = None
+    if zones and getattr(tsk, "tzns", None):
+        grd = getattr(tsk, "grds", [None])[0]
+        cells = dataset.grid(grd, tsk) if grd is not None else None
+        zoning = prescription.Prescription(tsk, cells, dataset.vpns)
+
+    def run(tlg):
+        with dataset.timelog(tlg) as log:
+            return summarize(log, devices, zoning, chunk_size)
+
+    tlgs = getattr(tsk, "tlgs", [])
+    summaries = executor.map(run, tlgs) if executor is not None else map(run, tlgs)
+
+    result = Summary()
+    for summary in summaries:
+        result.merge(summary)
+    return result
@@ -0,0 +1,138 @@
+'''
+Batch ingestion of many TASKDATA sets across a process pool
+
+Inputs are parsed in chunks by worker processes. By default the entities are compact and without
+elements (see entity.Options), which keeps pickling the results back to the calling process cheap.
+
+Typical usage example:
+
+for result in isoxml.batch.parse(paths, progress=print):
+    if result.error:
+        log(result.error)
+    else:
+        store(result.root, result.external)
+
+'''
+
+import concurrent.futures
+import os
+import typing
+import xml.etree.ElementTree
+import zipfile
+
+from . import dataset
+from . import entity
+from . import exception
+
+class Result(typing.NamedTuple):
+    '''
+    Result of parsing one input
+
+    index is the position of the input in the sources, root the root entity of TASKDATA.XML (or of
+    the XML document), external maps the names of the external files of a TASKDATA set to their
+    XFC root entities (None unless the input is a TASKDATA set) and error is an
+    exception.ISOXMLParseException if parsing failed.
+    '''
+    index: int
+    source: str
+    root: typing.Any = None
+    external: typing.Optional[typing.Mapping[str, typing.Any]] = None
+    error: typing.Optional[exception.ISOXMLParseException] = None
+
+# errors that are reported per input instead of aborting the batch
+_errors = (exception.ISOXMLException, xml.etree.ElementTree.ParseError, OSError, zipfile.BadZipFile)
+
+def _label(index, source):
+    return f"<input {index}>" if isinstance(source, (bytes, bytearray)) else os.fspath(source)
+
+def parse_one(index, source, **options):
+    '''
+    Parses a single input, which is XML as bytes, the path of an XML file or of a TASKDATA set
+    (directory or ZIP archive), and returns a Result
+    '''
+    label = _label(index, source)
+    try:
+        if isinstance(source, (bytes, bytearray)):
+            return Result(index, label, entity.fromstring(source, **options))
+
+        if os.path.isdir(source) or zipfile.is_zipfile(source):
+            with dataset.open(source, **options) as d:
+                return Result(index, label, d.root, d.load())
+
+        with open(source, "rb") as f:
+            return Result(index, label, entity.fromstring(f.read(), **options))
+
+    except _errors as e:
+        return _failed(index, label, f"{label}: {e}")
+
+def _failed(index, label, message):
+    ''' Returns the Result of an input that could not be parsed '''
+    error = exception.ISOXMLParseException(message)
+    error.source = label
+    return Result(index, label, error=error)
+
+def _parse_chunk(chunk, options):
+    '''
+    Parses a chunk of (index, source) in a worker process and returns (result, message) pairs
+
+    Exceptions are rebuilt in the calling process from their message, so the results are returned
+    without them.
+    '''
+    results = []
+    for index, source in chunk:
+        result = parse_one(index, source, **options)
+        message = None if result.error is None else str(result.error)
+        results.append((result._replace(error=None), message))
+    return results
+
+def parse(sources, max_workers=None, chunksize=1, progress=None, executor=None, **options):
+    '''
+    Parses many inputs across a process pool and yields a Result per input as they complete
+
+    sources are XML documents as bytes or paths of XML files, TASKDATA directories or ZIP archives.
+    Inputs are sent to the workers in chunks of chunksize. progress is called as
+    progress(completed, total) after every chunk. A concurrent.futures executor can be passed
+    instead of max_workers to reuse a pool. The keyword arguments are parse options (see
+    entity.Options and entity.fromstring), defaulting to compact entities without elements.
+
+    If a chunk fails as a whole, e.g. because its worker crashed or its results cannot be pickled,
+    every input of the chunk gets a Result with an error and the other chunks are still parsed.
+
+    The stats and index options are not supported, as they would only be filled in the workers; an
+    ISOXMLException is raised when the iteration starts. Use index.Index.add_tree on the results
+    instead.
+    '''
+    if options.get("stats") is not None or options.get("index") is not None:
+        raise exception.ISOXMLException("The stats and index options are not supported by batch parsing")
+
+    options = dict({"compact": True, "keep_element": False}, **options)
+    items = list(enumerate(sources))
+    chunks = [items[i:i + chunksize] for i in range(0, len(items), chunksize)]
+
+    pool = executor or concurrent.futures.ProcessPoolExecutor(max_workers=max_workers)
+    futures = {}
+    try:
+        futures = {pool.submit(_parse_chunk, chunk, options): chunk for chunk in chunks}
+        completed = 0
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                results = future.result()
+            except Exception as e:
+                results = []
+                for index, source in futures[future]:
+                    label = _label(index, source)
+                    results.append((Result(index, label), f"{label}: {type(e).__name__}: {e}"))
+
+            for result, message in results:
+                if message is not None:
+                    result = _failed(result.index, result.source, message)
+                completed += 1
+                yield result
+
+            if progress is not None:
+                progress(completed, len(items))
+    finally:
+        for future in futures:
+            future.cancel()
+        if executor is None:
+            pool.shutdown()
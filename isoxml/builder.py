@@ -0,0 +1,160 @@
+'''
+Parser backend building entities directly from expat events
+
+The default backend parses the document into an ElementTree first and then builds the entities
+from it, allocating two object graphs. This backend builds the entities straight from the start
+and end element events of xml.parsers.expat using the compiled schemas, so no element tree is
+ever created. The resulting entities are the same as with the default backend, except that they
+have no element.
+
+Typical usage example:
+
+taskdata = isoxml.entity.fromstring(data, backend="expat", compact=True)
+
+'''
+
+import xml.parsers.expat
+
+from . import entity
+from . import exception
+from . import spec
+
+class _Frame:
+    ''' An entity under construction '''
+    __slots__ = ("entity", "schema", "fields", "lists", "names", "pnts")
+
+    def __init__(self, e, schema, fields):
+        self.entity = e
+        self.schema = schema
+        self.fields = fields
+        self.lists = {}
+        self.names = _names(schema)
+        self.pnts = None
+
+_child_names = {}
+
+def _names(schema):
+    ''' Returns a dict mapping the child tags of schema to the names of their lists '''
+    names = _child_names.get(schema.tag)
+    if names is None:
+        names = _child_names[schema.tag] = dict(schema.children)
+    return names
+
+class Builder:
+    '''
+    Builds entities from expat start and end element events
+
+    Child elements whose tag is not a child tag of their parent in the spec, or that are skipped by
+    the include and exclude options, are ignored together with their subtree.
+    '''
+
+    def __init__(self, options):
+        if options.lazy:
+            raise exception.ISOXMLException("Lazy parsing is not supported by the expat backend")
+
+        self.options = options
+        self.root = None
+        self._stack = []
+        self._skip = 0
+
+    def start(self, tag, attrib):
+        ''' Handles the start of an element '''
+        if self._skip:
+            self._skip += 1
+            return
+
+        options = self.options
+        if self._stack:
+            parent = self._stack[-1]
+            if parent.pnts is not None and tag == "PNT":
+                parent.pnts.append(attrib)
+                self._skip = 1
+                return
+            if tag not in parent.names or not entity._selected(tag, options):
+                self._skip = 1
+                return
+
+        schema = spec.schema(tag)
+        if schema is None:
+            raise exception.ISOXMLParseException(f"Unknown tag {tag}")
+
+        cls = entity.compact_class(tag) if options.compact else entity.Entity
+        e = cls.__new__(cls)
+        e._tag = tag
+        e.element = None
+
+        fields = {} if cls._slotted else e.__dict__
+        names = entity.decode(schema, attrib, fields, options)
+        if names:
+            e._names = names
+
+        frame = _Frame(e, schema, fields)
+        if options.columnar and tag == "LSG":
+            frame.pnts = []
+        self._stack.append(frame)
+
+    def end(self, tag):
+        ''' Handles the end of an element '''
+        if self._skip:
+            self._skip -= 1
+            return
+
+        frame = self._stack.pop()
+        e, fields = frame.entity, frame.fields
+
+        if frame.pnts is not None:
+            from . import geometry
+            fields["points"] = geometry.from_attributes(frame.pnts)
+
+        # child lists in the order of the spec, like the default backend
+        if frame.lists:
+            for _, name in frame.schema.children:
+                if name in frame.lists:
+                    fields[name] = frame.lists[name]
+
+        if e._slotted:
+            for name, value in fields.items():
+                setattr(e, name, value)
+
+        if self.options.index is not None:
+            self.options.index.add(e, frame.schema)
+
+        if self._stack:
+            parent = self._stack[-1]
+            parent.lists.setdefault(parent.names[tag], []).append(e)
+        else:
+            self.root = e
+
+    def parser(self):
+        ''' Returns an expat parser feeding this builder '''
+        parser = xml.parsers.expat.ParserCreate()
+        parser.buffer_text = True
+        parser.StartElementHandler = self.start
+        parser.EndElementHandler = self.end
+        return parser
+
+def parse(source, **options):
+    '''
+    Parses a document and returns the root entity, see entity.Options for the keyword arguments
+
+    source is a string, bytes or a binary file object, which is read incrementally.
+    '''
+    options = entity.Options(**options)
+    if options.stats is not None:
+        from . import stats
+        return stats.parse_expat(source, options)
+    return run(Builder(options), source)
+
+def run(builder, source):
+    ''' Feeds source to builder and returns the root entity '''
+    parser = builder.parser()
+
+    try:
+        if hasattr(source, "read"):
+            parser.ParseFile(source)
+        else:
+            parser.Parse(source, True)
+    except xml.parsers.expat.ExpatError as e:
+        raise exception.ISOXMLParseException(f"Invalid XML: {e}") from e
+
+    return builder.root
@@ -0,0 +1,281 @@
+'''
+Persistent on-disk cache of parsed documents and decoded arrays
+
+Entries are keyed by a SHA-256 hash of the file contents, the parse options, the library version
+and the spec fingerprint, so any change to one of them is a cache miss. Values are pickled with
+protocol 5 and NumPy arrays (e.g. decoded TLG records or columnar points) are stored out-of-band,
+aligned after the pickle. When an entry has such buffers it is memory-mapped on load and the
+arrays are read-only views of the file, so loading them takes milliseconds regardless of size.
+
+The cache is bounded by max_bytes: loading an entry marks it as recently used and the least
+recently used entries are deleted when an entry is stored.
+
+Typical usage example:
+
+cache = isoxml.cache.Cache("~/.cache/isoxml")
+taskdata = cache.fromstring(data, compact=True)
+records = cache.records(timelog)
+cache.time_index(timelog, path, str(os.path.getmtime(path)))
+
+'''
+
+import copyreg
+import hashlib
+import io
+import mmap
+import os
+import pickle
+import struct
+import sys
+import tempfile
+import time
+
+from . import __version__
+from . import entity
+from . import exception
+from . import spec
+
+_MAGIC = b"ISOXMLC1"
+# magic, length of the pickle and number of out-of-band buffers
+_HEADER = struct.Struct("<8sQI")
+# offset and length of an out-of-band buffer
+_BUFFER = struct.Struct("<QQ")
+_ALIGNMENT = 64
+_SUFFIX = ".cache"
+
+# errors of reading an entry that is treated as a miss, e.g. a truncated or foreign file
+_errors = (OSError, ValueError, EOFError, struct.error, pickle.UnpicklingError, AttributeError, ImportError)
+
+class Cache:
+    '''
+    A directory of cached values bounded by max_bytes
+
+    get and put store arbitrary picklable values under keys returned by key. fromstring, records
+    and time_index cache parsed documents, decoded TLG records and TLG time indexes.
+    '''
+
+    def __init__(self, directory, max_bytes=1 << 30):
+        self.directory = os.path.expanduser(directory)
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, *parts):
+        ''' Returns the key of parts (bytes or strings) for the current library and spec version '''
+        h = hashlib.sha256(f"{__version__}\0{spec.fingerprint()}".encode())
+        for part in parts:
+            if isinstance(part, str):
+                part = part.encode()
+            h.update(struct.pack("<Q", len(part)))
+            h.update(part)
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + _SUFFIX)
+
+    def get(self, key, default=None):
+        ''' Returns the value of key and marks it as recently used, or default if it is not cached '''
+        path = self._path(key)
+        try:
+            value = _load(path)
+        except FileNotFoundError:
+            return default
+        except _errors:
+            _remove(path)
+            return default
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def put(self, key, value):
+        ''' Stores value under key and evicts the least recently used entries beyond max_bytes '''
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                _dump(value, f)
+            os.replace(tmp, self._path(key))
+        except BaseException:
+            _remove(tmp)
+            raise
+
+        self.evict()
+
+    def evict(self, max_bytes=None):
+        ''' Deletes the least recently used entries until the cache holds at most max_bytes '''
+        if max_bytes is None:
+            max_bytes = self.max_bytes
+
+        entries = []
+        with os.scandir(self.directory) as it:
+            for e in it:
+                if e.name.endswith(_SUFFIX):
+                    try:
+                        stat = e.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime_ns, stat.st_size, e.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            _remove(path)
+            total -= size
+
+    def clear(self):
+        ''' Deletes all entries '''
+        self.evict(0)
+
+    def fromstring(self, data, backend="etree", **options):
+        '''
+        Returns the root entity of a document like entity.fromstring, parsing it only on a miss
+
+        data is the document as bytes. The index option is not supported, as the index would not
+        be filled on a hit; use index.Index.add_tree on the result instead. With the stats option
+        a hit is recorded as a cache hit without per-tag counts.
+        '''
+        key, root = self.lookup(data, backend, **options)
+        if root is None:
+            root = entity.fromstring(data, backend=backend, **options)
+            self.put(key, root)
+        return root
+
+    def lookup(self, data, backend="etree", **options):
+        '''
+        Returns the key of the document data and its cached root entity, or None on a miss
+
+        With the stats option a hit is recorded with the time spent hashing and loading the
+        document. See fromstring for the options.
+        '''
+        if options.get("index") is not None:
+            raise exception.ISOXMLException("The index option cannot be used with the cache")
+
+        start = time.perf_counter()
+        key = self.document_key(data, backend, **options)
+        root = self.get(key)
+        if root is not None and options.get("stats") is not None:
+            options["stats"].record_hit(data, time.perf_counter() - start)
+        return key, root
+
+    def document_key(self, data, backend="etree", **options):
+        '''
+        Returns the key of the document data parsed with backend and options
+
+        The stats option does not change the parsed document and is not part of the key.
+        '''
+        options.pop("stats", None)
+        options = {k: _normalize(v) for k, v in options.items()}
+        return self.key(b"xml", backend, repr(sorted(options.items())), data)
+
+    def records(self, timelog, start=0, stop=None):
+        ''' Returns timelog.read(start, stop), decoding the records only on a miss '''
+        key = self.key(b"tlg", repr(timelog.header), repr((start, stop)), timelog.data)
+        records = self.get(key)
+        if records is None:
+            records = timelog.read(start, stop)
+            self.put(key, records)
+        return records
+
+    def time_index(self, timelog, *identity):
+        '''
+        Returns the timelog.TimeIndex of timelog and sets it as its index, building it only on a miss
+
+        identity are strings identifying the binary file, e.g. its path and modification time, as
+        hashing a log of several GB would take longer than building the index. The size of the
+        data is always part of the key.
+        '''
+        key = self.key(b"tlg-index", repr(timelog.header), str(len(timelog.data)), *identity)
+        index = self.get(key)
+        if index is None:
+            index = timelog.build_index()
+            self.put(key, index)
+        timelog.index = index
+        return index
+
+def _normalize(value):
+    '''
+    Returns a collection option (e.g. include) as a sorted tuple
+
+    The repr of a set depends on the hash seed of the process, and a list or frozenset of the
+    same tags is the same option.
+    '''
+    if isinstance(value, (set, frozenset, list, tuple)):
+        return tuple(sorted(value))
+    return value
+
+def _dump(value, f):
+    ''' Writes value with its out-of-band buffers to the binary file f '''
+    buffers = []
+    out = io.BytesIO()
+    pickler = pickle.Pickler(out, protocol=5, buffer_callback=buffers.append)
+    # arrays can only be in the value if numpy is imported already
+    np = sys.modules.get("numpy")
+    if np is not None:
+        pickler.dispatch_table = copyreg.dispatch_table.copy()
+        pickler.dispatch_table[np.ndarray] = _reduce_array
+    pickler.dump(value)
+    data = out.getbuffer()
+    raws = [b.raw() for b in buffers]
+
+    position = _HEADER.size + _BUFFER.size * len(raws) + len(data)
+    table = []
+    for raw in raws:
+        position += -position % _ALIGNMENT
+        table.append((position, raw.nbytes))
+        position += raw.nbytes
+
+    f.write(_HEADER.pack(_MAGIC, len(data), len(raws)))
+    for offset, length in table:
+        f.write(_BUFFER.pack(offset, length))
+    f.write(data)
+    for (offset, _), raw in zip(table, raws):
+        f.write(b"\0" * (offset - f.tell()))
+        f.write(raw)
+
+def _reduce_array(a):
+    '''
+    Pickles the data of an array out-of-band
+
+    NumPy only does so for dtypes that support the buffer protocol, which excludes datetime64
+    and thereby decoded TLG records, so the data is exported as bytes instead.
+    '''
+    if a.dtype.hasobject:
+        return a.__reduce_ex__(5)
+    return _array, (pickle.PickleBuffer(a.reshape(-1).view("u1")), a.dtype, a.shape)
+
+def _array(buffer, dtype, shape):
+    import numpy as np
+    return np.frombuffer(buffer, dtype=dtype).reshape(shape)
+
+def _load(path):
+    ''' Reads a value written by _dump, memory-mapping the file if it has out-of-band buffers '''
+    with open(path, "rb") as f:
+        magic, size, count = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a cache entry")
+
+        table = [_BUFFER.unpack(f.read(_BUFFER.size)) for _ in range(count)]
+        if not count:
+            data = f.read(size)
+            if len(data) != size:
+                raise EOFError(f"{path} is truncated")
+            with entity.paused_gc():
+                return pickle.loads(data)
+
+        view = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    start = _HEADER.size + _BUFFER.size * count
+    if start + size > len(view) or any(offset + length > len(view) for offset, length in table):
+        raise EOFError(f"{path} is truncated")
+
+    buffers = [view[offset:offset + length] for offset, length in table]
+    with entity.paused_gc():
+        return pickle.loads(view[start:start + size], buffers=buffers)
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
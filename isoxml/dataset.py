@@ -0,0 +1,246 @@
+'''
+Loader for complete TASKDATA sets in a directory or ZIP archive
+
+A TASKDATA set consists of TASKDATA.XML and the files it references: external XML files listed as
+XFR (e.g. TSK00001.XML, whose XFC root holds the actual entities) and binary files such as TLG and
+GRD. ZIP archives are read in place without extracting them to disk.
+
+External files are parsed lazily, when entities of their tag are accessed for the first time, or
+all at once with Dataset.load, optionally in a thread or process pool.
+'''
+
+import builtins
+import concurrent.futures
+import os
+import zipfile
+
+from . import entity
+from . import exception
+from . import spec
+
+ROOT = "TASKDATA.XML"
+
+class Dataset:
+    '''
+    A TASKDATA set opened from a directory, a ZIP archive or a zipfile.ZipFile
+
+    The keyword arguments are parse options passed to every parsed file (see entity.Options). The
+    root entity is available as root, entities of a top-level tag from TASKDATA.XML and all external
+    files are available as list attributes named like the child lists of the root, e.g. tsks. If a
+    cache.Cache is given, parsed files are loaded from it and stored in it.
+    '''
+
+    def __init__(self, source, cache=None, **options):
+        self.options = options
+        self.cache = cache
+        self._external = {}
+        self._zip = None
+        # archives passed in are closed by the caller
+        self._owns_zip = False
+        self.directory = None
+
+        if isinstance(source, zipfile.ZipFile):
+            self._zip = source
+        elif os.path.isdir(source):
+            self.directory = source
+        else:
+            self._zip = zipfile.ZipFile(source)
+            self._owns_zip = True
+
+        if self._zip is not None:
+            members = [m for m in self._zip.namelist() if not m.endswith("/")]
+        else:
+            members = [
+                os.path.relpath(os.path.join(d, f), source).replace(os.sep, "/")
+                for d, _, files in os.walk(source) for f in files
+            ]
+
+        # the directory of the shallowest TASKDATA.XML is the base of all file names
+        roots = sorted((m for m in members if m.rsplit("/", 1)[-1].upper() == ROOT), key=lambda m: m.count("/"))
+        if not roots:
+            raise exception.ISOXMLParseException(f"{ROOT} not found in {source}")
+        base = roots[0][:-len(ROOT)]
+
+        # file names in TASKDATA sets are case-insensitive
+        self._members = {m[len(base):].upper(): m for m in members if m.startswith(base) and "/" not in m[len(base):]}
+        self.root = self._parse(self.read(ROOT))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        ''' Closes the ZIP archive if the dataset opened one, a zipfile.ZipFile passed in stays open '''
+        if self._owns_zip:
+            self._zip.close()
+
+    def path(self, name):
+        ''' Returns the path of a file of the set or None if the set is a ZIP archive '''
+        member = self._member(name)
+        if self._zip is not None:
+            return None
+        return os.path.join(self.directory, member)
+
+    def _member(self, name):
+        try:
+            return self._members[name.upper()]
+        except KeyError:
+            raise exception.ISOXMLParseException(f"File {name} not found in TASKDATA set") from None
+
+    def read(self, name):
+        ''' Returns the contents of a file of the set as bytes '''
+        member = self._member(name)
+        if self._zip is not None:
+            return self._zip.read(member)
+        with builtins.open(os.path.join(self.directory, member), "rb") as f:
+            return f.read()
+
+    def _parse(self, data):
+        if self.cache is not None:
+            return self.cache.fromstring(data, **self.options)
+        return entity.fromstring(data, **self.options)
+
+    def external(self, name):
+        ''' Returns the XFC root entity of the external file name (without extension), parsing it on first use '''
+        result = self._external.get(name)
+        if result is None:
+            result = self._parse(self.read(name + ".XML"))
+            self._external[name] = result
+        return result
+
+    def load(self, executor=None):
+        '''
+        Parses all external files that were not parsed yet and returns a dict mapping the names of
+        all external files to their XFC root entities
+
+        If executor (a concurrent.futures executor) is given, the files are parsed concurrently.
+        With a process pool the entities are pickled back to this process, so consider the compact
+        and keep_element=False options to keep that cheap. The stats and index options are not
+        supported with a process pool, as they would only be filled in the workers.
+        '''
+        if isinstance(executor, concurrent.futures.ProcessPoolExecutor) and (
+                self.options.get("stats") is not None or self.options.get("index") is not None):
+            raise exception.ISOXMLException("The stats and index options cannot be used with a process pool")
+
+        names = [x.file_name for x in getattr(self.root, "xfrs", []) if x.file_name not in self._external]
+        if executor is None:
+            for name in names:
+                self.external(name)
+            return dict(self._external)
+
+        futures = []
+        for name in names:
+            data = self.read(name + ".XML")
+            key = None
+            if self.cache is not None:
+                key, result = self.cache.lookup(data, **self.options)
+                if result is not None:
+                    self._external[name] = result
+                    continue
+            futures.append((name, key, executor.submit(entity.fromstring, data, **self.options)))
+
+        for name, key, future in futures:
+            self._external[name] = future.result()
+            if key is not None:
+                self.cache.put(key, self._external[name])
+        return dict(self._external)
+
+    def entities(self, tag):
+        '''
+        Returns all entities of a top-level tag, from TASKDATA.XML and the external files
+
+        External files are named after the tag of their contents (e.g. TSK00001), so only files
+        named after tag, or not following that convention, are parsed.
+        '''
+        schema = spec.schema(tag)
+        name = tag.lower() + "s"
+        result = list(getattr(self.root, name, []))
+
+        for xfr in getattr(self.root, "xfrs", []):
+            prefix = xfr.file_name[:3].upper()
+            if prefix == tag or spec.schema(prefix) is None or schema is None:
+                result.extend(getattr(self.external(xfr.file_name), name, []))
+
+        return result
+
+    def __getattr__(self, name):
+        tag = name[:-1].upper()
+        if name.endswith("s") and tag in spec.schema("XFC").ctags:
+            return self.entities(tag)
+        raise AttributeError(name)
+
+    def index(self):
+        ''' Returns an index.Index of TASKDATA.XML and all external files, parsing them if needed '''
+        from .index import Index
+
+        self.load()
+        result = Index()
+        result.add_tree(self.root)
+        for root in self._external.values():
+            result.add_tree(root)
+        return result
+
+    def query(self):
+        ''' Returns a query.Query over TASKDATA.XML and all external files, parsing them if needed '''
+        from .query import Query
+
+        return Query(self.root, *self.load().values())
+
+    def devices(self):
+        ''' Returns the device.Devices lookup tables of all DVC of the set '''
+        from .device import Devices
+
+        return Devices(self.dvcs)
+
+    def fields(self, **options):
+        ''' Returns a spatial.FieldIndex of all PFD of the set, see FieldIndex for the keyword arguments '''
+        from .spatial import FieldIndex
+
+        return FieldIndex(self.pfds, **options)
+
+    def timelog(self, tlg, index=False):
+        '''
+        Returns the timelog.TimeLog of a TLG entity, memory-mapped if the set is a directory
+
+        If index is set, the time index of the log is loaded from the cache of the set, or from a
+        sidecar file next to the BIN file if the set is a directory without cache, and built if it
+        is not found there.
+        '''
+        from . import timelog
+
+        header = self.read(tlg.file_name + ".XML")
+        name = tlg.file_name + ".BIN"
+        if self._zip is None:
+            path = self.path(name)
+            log = timelog.TimeLog(header, timelog.map_file(path))
+        else:
+            log = timelog.TimeLog(header, self.read(name))
+
+        if not index:
+            return log
+        if self.cache is not None:
+            if self._zip is None:
+                identity = (os.path.abspath(path), str(os.stat(path).st_mtime_ns))
+            else:
+                info = self._zip.getinfo(self._member(name))
+                identity = (str(self._zip.filename), info.filename, str(info.CRC))
+            self.cache.time_index(log, *identity)
+        elif self._zip is None:
+            timelog.load_index(log, os.path.splitext(path)[0] + timelog.INDEX_SUFFIX, path)
+        else:
+            log.build_index()
+        return log
+
+    def grid(self, grd, tsk=None):
+        ''' Returns the cells of a GRD entity (see grid.from_buffer), memory-mapped if the set is a directory '''
+        from . import grid
+
+        if self._zip is None:
+            return grid.open_file(grd, self.path(grd.file_name + ".BIN"), tsk)
+        return grid.from_buffer(grd, self.read(grd.file_name + ".BIN"), tsk)
+
+def open(source, **options):
+    ''' Opens a TASKDATA set, see Dataset '''
+    return Dataset(source, **options)
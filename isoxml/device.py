@@ -0,0 +1,203 @@
+'''
+Lookup tables of device descriptions (DVC) for decoding process data
+
+A DVC describes a machine as a tree of device elements (DET) linked by their ParentObjectId. Each
+DET references its process data (DPD) and properties (DPT) with DOR children, and these reference
+the value presentation (DVP) giving the offset, scale, number of decimals and unit of their values.
+Devices compiles these links once into flat tables, so logged values can be scaled with a few NumPy
+operations instead of walking the entities for every value.
+
+Typical usage example:
+
+devices = isoxml.device.Devices(dataset.dvcs)
+with dataset.timelog(tlg) as log:
+    records = log.read()
+    values = devices.decode(records["values"], log.header.dlvs, records["present"])
+
+'''
+
+import typing
+
+import numpy as np
+
+from . import exception
+from . import spec
+
+class Presentation(typing.NamedTuple):
+    ''' Value presentation of a DPD or DPT: displayed value = (value + offset) * scale '''
+    offset: float
+    scale: float
+    decimals: int
+    unit: typing.Optional[str]
+
+# presentation of values without a DVP
+_IDENTITY = Presentation(0.0, 1.0, 0, None)
+
+_NONE = object()
+
+def _value(e, name, default=_NONE):
+    '''
+    Returns the attribute name of e, decoding it with the spec converter in raw documents
+
+    default is returned if the attribute is missing or empty, without a default this raises an
+    ISOXMLException.
+    '''
+    value = getattr(e, name, None)
+    if value is None or value == "":
+        if default is _NONE:
+            raise exception.ISOXMLException(f"{e.tag()} has no {name}")
+        return default
+    if isinstance(value, str):
+        convert = spec.schema(e.tag()).converters.get(name)
+        if convert is not None:
+            return convert(value)
+    return value
+
+class Devices:
+    '''
+    Lookup tables of the device elements and process data of one or more DVC
+
+    Device elements are numbered in the order of the DVCs and their DETs: ids holds the DET id of
+    every element and element maps it back to its number. The hierarchy is given by the arrays
+    device (index of the DVC), parent (number of the parent element, -1 for the root element of a
+    device), depth (0 for root elements), object_id, type and number. process_data and properties
+    map (DET id, DDI) to the DPD and DPT linked to an element by its DOR.
+    '''
+
+    def __init__(self, dvcs):
+        self.dvcs = list(dvcs)
+        self.ids = []
+        self.element = {}
+        self.process_data = {}
+        self.properties = {}
+        self.presentations = {}
+        device, object_ids, types, numbers, parents = [], [], [], [], []
+
+        for d, dvc in enumerate(self.dvcs):
+            dvps = {_value(v, "object_id"): v for v in getattr(dvc, "dvps", ())}
+            objects = {_value(o, "object_id"): o for o in list(getattr(dvc, "dpds", ())) + list(getattr(dvc, "dpts", ()))}
+            elements = {}
+
+            for det in getattr(dvc, "dets", ()):
+                if det.id in self.element:
+                    raise exception.ISOXMLException(f"Duplicate DET id {det.id}")
+                elements[_value(det, "object_id")] = len(self.ids)
+                self.element[det.id] = len(self.ids)
+                self.ids.append(det.id)
+                device.append(d)
+                object_ids.append(_value(det, "object_id"))
+                types.append(_value(det, "type"))
+                numbers.append(_value(det, "number"))
+
+                for dor in getattr(det, "dors", ()):
+                    o = objects.get(_value(dor, "device_object_id"))
+                    if o is None:
+                        continue
+                    key = (det.id, _value(o, "ddi"))
+                    (self.process_data if o.tag() == "DPD" else self.properties)[key] = o
+                    dvp = dvps.get(_value(o, "dvp_object_id", None))
+                    if dvp is not None:
+                        self.presentations.setdefault(key, Presentation(
+                            float(_value(dvp, "offset")), float(_value(dvp, "scale")), _value(dvp, "number_of_decimals"),
+                            getattr(dvp, "unit_designator", None)))
+
+            # parents are referenced by object id within the same device, 0 is the device itself
+            for det in getattr(dvc, "dets", ()):
+                parent = elements.get(_value(det, "parent_object_id"), -1)
+                parents.append(parent if parent != self.element[det.id] else -1)
+
+        self.device = np.array(device, dtype=np.intp)
+        self.object_id = np.array(object_ids, dtype=np.int64)
+        self.type = np.array(types, dtype=np.uint8)
+        self.number = np.array(numbers, dtype=np.int64)
+        self.parent = np.array(parents, dtype=np.intp)
+        self.depth = self._depth()
+
+        # presentations sorted by (element, DDI) key for vectorized lookups
+        keys = sorted((self.element[det_id] << 16 | ddi, p) for (det_id, ddi), p in self.presentations.items())
+        self._keys = np.array([k for k, _ in keys], dtype=np.int64)
+        self._offset = np.array([p.offset for _, p in keys] + [_IDENTITY.offset])
+        self._scale = np.array([p.scale for _, p in keys] + [_IDENTITY.scale])
+
+    def _depth(self):
+        ''' Returns the depth of every element, following the parents with one step per tree level '''
+        depth = np.zeros(len(self.parent), dtype=np.intp)
+        current = self.parent.copy()
+        while (current >= 0).any():
+            if depth.max() > len(self.parent):
+                raise exception.ISOXMLException("Cycle in the DET hierarchy")
+            has = current >= 0
+            depth[has] += 1
+            current[has] = self.parent[current[has]]
+        return depth
+
+    def __len__(self):
+        return len(self.ids)
+
+    def ancestors(self, det_id):
+        ''' Returns the DET ids of the parent, grandparent, ... of an element '''
+        result = []
+        i = self.parent[self.element[det_id]]
+        while i >= 0:
+            result.append(self.ids[i])
+            i = self.parent[i]
+        return result
+
+    def children(self, det_id):
+        ''' Returns the DET ids of the child elements of an element '''
+        return [self.ids[i] for i in np.flatnonzero(self.parent == self.element[det_id])]
+
+    def presentation(self, det_id, ddi):
+        ''' Returns the Presentation of the DPD or DPT of an element, without a DVP offset 0 and scale 1 '''
+        return self.presentations.get((det_id, ddi), _IDENTITY)
+
+    def property(self, det_id, ddi, inherit=True):
+        '''
+        Returns the DPT with ddi of an element or None
+
+        If inherit is set and the element has no such DPT, the ancestors are searched, e.g. for the
+        working width of a boom given at the device element of the whole machine.
+        '''
+        for element in [det_id] + (self.ancestors(det_id) if inherit else []):
+            dpt = self.properties.get((element, ddi))
+            if dpt is not None:
+                return dpt
+        return None
+
+    def elements(self, det_ids):
+        ''' Returns the element numbers of an iterable of DET ids, -1 for unknown ids '''
+        return np.array([self.element.get(det_id, -1) for det_id in det_ids], dtype=np.intp)
+
+    def scaling(self, elements, ddis):
+        '''
+        Returns the offset and scale arrays of the given arrays of element numbers and DDIs
+
+        Pairs without a DVP, or with an unknown element (-1), get offset 0 and scale 1.
+        '''
+        elements = np.asarray(elements, dtype=np.int64)
+        ddis = np.asarray(ddis, dtype=np.int64)
+        keys = elements << 16 | ddis
+        table = self._keys
+        if len(table):
+            slot = np.minimum(np.searchsorted(table, keys), len(table) - 1)
+            found = (elements >= 0) & (table[slot] == keys)
+        else:
+            slot = found = np.zeros(keys.shape, dtype=bool)
+        # the last entry of the tables is the identity presentation
+        slot = np.where(found, slot, len(table))
+        return self._offset[slot], self._scale[slot]
+
+    def decode(self, values, dlvs, present=None):
+        '''
+        Scales logged values with the presentation of their DPD
+
+        values holds one column per DLV, e.g. the values column of timelog records, and dlvs holds
+        (DDI, DET id) of each column as in timelog.Header.dlvs. Returns a float array, with NaN for
+        values that are not present if a present mask of the same shape is given.
+        '''
+        ddis = [ddi for ddi, _ in dlvs]
+        offset, scale = self.scaling(self.elements(det_id for _, det_id in dlvs), ddis)
+        result = (np.asarray(values) + offset) * scale
+        if present is not None:
+            result[~np.asarray(present)] = np.nan
+        return result
@@ -7,11 +7,44 @@ import isoxml
 taskdata = isoxml.entity.Entity("<ISO11783_TaskData> ... </ISO11783_TaskData>")
 
 """
-import re
+import contextlib
+import copyreg
+import gc
+import typing
 import xml.etree.ElementTree
 from . import exception
 from . import spec
 
+class Options(typing.NamedTuple):
+    '''
+    Parse options, shared by all entities of a document
+
+    compact: build instances of the slotted per-tag classes (see compact_class), not supported
+             by Entity(data) as its root is a plain Entity; use fromstring or Entity.from_element
+    keep_element: keep a reference to the xml.etree element of every entity
+    raw: keep attribute values as strings instead of decoding them according to the spec
+    decimal: decode decimal attributes (e.g. PNT North/East) to decimal.Decimal instead of float
+    columnar: store the PNT children of LSG as geometry.Points NumPy columns in the points
+              attribute instead of building a list of PNT entities (requires numpy)
+    index: an index.Index that every parsed entity is added to
+    include: if given, only child entities with one of these tags are parsed
+    exclude: child entities with one of these tags are skipped together with their subtree
+    lazy: defer parsing of child entity lists until their first access, True for all child tags
+          or a collection of the child tags to defer (e.g. {"PNT", "DVC"}). Entities with deferred
+          children keep their element until they are garbage collected.
+    stats: a stats.Stats instance collecting per-tag counts and timings of the parse
+    '''
+    compact: bool = False
+    keep_element: bool = True
+    raw: bool = False
+    decimal: bool = False
+    columnar: bool = False
+    index: typing.Any = None
+    include: typing.Optional[typing.Collection[str]] = None
+    exclude: typing.Collection[str] = ()
+    lazy: typing.Union[bool, typing.Collection[str]] = False
+    stats: typing.Any = None
+
 class Entity:
     '''
     Entity represents an ISOXML entity with its attributes and child entities
@@ -20,52 +53,347 @@ class Entity:
     and parse the XML. Based on the type of the entity and its associated spec, we populate the
     attributes and child entities.
 
+    For large documents, compact entities can be requested instead: these are instances of
+    per-tag subclasses generated from the spec (see compact_class) that store the attributes and
+    child entities in __slots__ instead of a __dict__. Attributes that are not part of the spec
+    are still accepted and kept in a __dict__ that is only allocated when needed.
+
     '''
 
-    # we start by initializing the spec
-    spec = spec.init()
+    __slots__ = ("_tag", "element", "_lazy", "_names", "__dict__")
+
+    # True for the generated per-tag classes that keep their fields in __slots__
+    _slotted = False
+
+    def __init__(self, data, **options):
+        options = Options(**options)
+        if options.compact:
+            raise exception.ISOXMLException("Entity(data) cannot build a compact root, use fromstring(data, compact=True)")
+        if options.stats is not None:
+            from . import stats
+            stats.init(self, data, options)
+            return
 
-    def __init__(self, data):
         self.element = xml.etree.ElementTree.fromstring(data)
-        self.parse()
+        self._tag = self.element.tag
+        self.parse(options)
+
+    @classmethod
+    def from_element(cls, element, **options):
+        ''' Create an entity from an already parsed xml.etree.ElementTree.Element
+
+        The element is used as is, so no serialization or re-parsing of the subtree takes place.
+        See Options for the keyword arguments, e.g. compact=True builds instances of the slotted
+        per-tag classes and keep_element=False drops the reference to the element once the entity
+        is parsed so the XML tree can be garbage collected.
+        '''
+        options = Options(**options)
+        if options.stats is not None:
+            from . import stats
+            return stats.from_element(element, options)
+        return cls._from_element(element, options)
+
+    @classmethod
+    def _from_element(cls, element, options):
+        if options.compact:
+            cls = compact_class(element.tag)
+            if cls is None:
+                raise exception.ISOXMLParseException(f"Unknown tag {element.tag}")
+
+        self = cls.__new__(cls)
+        self.element = element
+        self._tag = element.tag
+        self.parse(options)
+        return self
 
     def tag(self):
         ''' Returns the tag of the entity (e.g. ISO11783_TaskData)'''
-        return self.element.tag
+        return self._tag
 
-    def parse(self):
+    def parse(self, options=Options()):
         ''' Parse the XML and populate the attributes and child entities based on the spec '''
-        if self.element.tag in Entity.spec:
-            _map = Entity.spec[self.element.tag]["map"]
-            required = Entity.spec[self.element.tag]["required"]
-            ctags = Entity.spec[self.element.tag]["ctags"]
+        schema = spec.schema(self._tag)
+        if schema is None:
+            raise exception.ISOXMLParseException(f"Unknown tag {self._tag}")
 
-            pattern = re.compile(r'(?<!^)(?=[A-Z])')
+        fields = {} if self._slotted else self.__dict__
+        names = decode(schema, self.element.attrib, fields, options)
+        if names:
+            self._names = names
 
-            # populate the attributes
-            for k, v in self.element.attrib.items():
-                if k in _map:
-                    k = _map[k]
+        if options.columnar and self._tag == "LSG":
+            from . import geometry
+            fields["points"] = geometry.from_element(self.element)
+            child_lists = ()
+        else:
+            child_lists = schema.children
 
-                self.__dict__[pattern.sub('_', k).lower()] = v
+        lazy = options.lazy
+        deferred = False
 
-            # check if all required attributes are present
-            for k in required:
-                if pattern.sub('_', k).lower() not in self.__dict__:
-                    msg = f"Required attribute {k} not found in {self.element.tag}"
-                    raise exception.ISOXMLParseException(msg)
+        # recursively find and parse child entities for child tags
+        for child_tag, name in child_lists:
+            if not _selected(child_tag, options):
+                continue
 
-            # recursively find and parse child entities for child tags
-            for child_tag in ctags:
-                children = self.element.findall(child_tag)
+            if lazy and (lazy is True or child_tag in lazy):
+                # parsed on first access by __getattr__
+                deferred = deferred or self.element.find(child_tag) is not None
+                continue
+
+            children = self.element.findall(child_tag)
+
+            if children:
+                fields[name] = [Entity._from_element(e, options) for e in children]
+
+        if self._slotted:
+            for name, value in fields.items():
+                setattr(self, name, value)
+
+        if options.index is not None:
+            options.index.add(self, schema)
 
+        if deferred:
+            self._lazy = options
+        elif not options.keep_element:
+            self.element = None
+
+    def __getattr__(self, name):
+        ''' Parses deferred child entity lists on first access, see Options.lazy '''
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        try:
+            options = self._lazy
+        except AttributeError:
+            raise AttributeError(f"{self._tag} has no attribute {name}") from None
+
+        for child_tag, list_name in spec.schema(self._tag).children:
+            if list_name == name and _selected(child_tag, options):
+                children = self.element.findall(child_tag)
                 if children:
-                    self.__dict__[child_tag.lower() + 's'] = [Entity(xml.etree.ElementTree.tostring(e)) for e in children]
-        else:
-            raise exception.ISOXMLParseException(f"Unknown tag {self.element.tag}")
+                    value = [Entity._from_element(e, options) for e in children]
+                    setattr(self, name, value)
+                    return value
+
+        raise AttributeError(f"{self._tag} has no attribute {name}")
+
+    def _fields(self):
+        ''' Returns the attributes and child entities of the entity as a dict '''
+        return self.__dict__
 
     def __repr__(self):
-        return f"{self.element.tag} {self.__dict__}"
+        return f"{self._tag} {self._fields()}"
 
     def __str__(self):
-        return f"{self.element.tag} {self.__dict__}"
+        return f"{self._tag} {self._fields()}"
+
+def new(tag, compact=False, **fields):
+    '''
+    Creates an entity from attribute values and child entity lists, e.g. for writing (see writer)
+
+    Fields are named like the attributes of parsed entities, e.g.
+    new("PNT", type=2, north=49.1, east=9.5) or new("LSG", type=1, pnts=[...]). compact creates an
+    instance of the slotted class of tag (see compact_class).
+    '''
+    cls = compact_class(tag) if compact else Entity
+    schema = spec.schema(tag)
+    if cls is None or schema is None:
+        raise exception.ISOXMLException(f"Unknown tag {tag}")
+
+    for name in schema.required:
+        if name not in fields:
+            raise exception.ISOXMLException(f"Required attribute {name} not given for {tag}")
+
+    e = cls.__new__(cls)
+    e._tag = tag
+    e.element = None
+    for name, value in fields.items():
+        setattr(e, name, value)
+    return e
+
+def decode(schema, attrib, fields, options):
+    '''
+    Decodes the XML attributes attrib of an element according to its schema into the dict fields
+
+    Attribute names are mapped to entity attribute names, values are converted unless
+    options.raw is set and required attributes are checked. Attributes that are not part of the
+    spec are named in snake_case. Returns a dict mapping such names to their XML names if
+    spec.camel_case does not restore them (e.g. P094_Quality), so they can be written back, or None.
+    '''
+    attributes = schema.attributes
+    names = None
+
+    # populate the attributes
+    for k, v in attrib.items():
+        name = attributes.get(k)
+        if name is None:
+            name = spec.snake_case(k)
+            if spec.camel_case(name) != k:
+                names = names or {}
+                names[name] = k
+        fields[name] = v
+
+    if not options.raw:
+        converters = schema.decimal_converters if options.decimal else schema.converters
+        for name, convert in converters.items():
+            # empty values are kept, e.g. the TLG header marks logged values with empty attributes
+            if fields.get(name):
+                try:
+                    fields[name] = convert(fields[name])
+                except (ValueError, ArithmeticError) as e:
+                    msg = f"Invalid value {fields[name]!r} for attribute {name} in {schema.tag}"
+                    raise exception.ISOXMLParseException(msg) from e
+
+    # check if all required attributes are present
+    for name in schema.required:
+        if name not in fields:
+            msg = f"Required attribute {name} not found in {schema.tag}"
+            raise exception.ISOXMLParseException(msg)
+
+    return names
+
+def _selected(tag, options):
+    ''' Returns whether child entities of tag are parsed according to the include and exclude options '''
+    return tag not in options.exclude and (options.include is None or tag in options.include)
+
+def fromstring(data, backend="etree", **options):
+    '''
+    Parse a document from a string and return the root entity, see Options for the keyword arguments
+
+    backend selects the parser: "etree" builds the entities from an xml.etree element tree,
+    "expat" builds them directly from expat events without an element tree (see builder).
+    '''
+    if backend == "expat":
+        from . import builder
+        return builder.parse(data, **options)
+    if backend != "etree":
+        raise ValueError(f"Unknown backend {backend}")
+
+    options = Options(**options)
+    if options.stats is not None:
+        from . import stats
+        return stats.fromstring(data, options)
+    return Entity._from_element(xml.etree.ElementTree.fromstring(data), options)
+
+@contextlib.contextmanager
+def paused_gc():
+    '''
+    Context manager pausing the cyclic garbage collector
+
+    Parsing and unpickling large documents allocate many objects without creating reference
+    cycles, which triggers the collector over and over. Pausing it meanwhile more than halves the
+    time spent unpickling entities.
+    '''
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+_classes = {}
+
+def compact_class(tag):
+    '''
+    Returns the slotted Entity subclass for tag or None if the tag is unknown
+
+    The class is generated from the spec on first use and has one slot per attribute and per child
+    entity list, e.g. the PNT class has the slots type, designator, north, east, ... The classes
+    are also available as attributes of this module, e.g. isoxml.entity.PNT, which is how pickle
+    finds them.
+    '''
+    cls = _classes.get(tag)
+    if cls is None:
+        schema = spec.schema(tag)
+        if schema is None:
+            return None
+
+        slots = tuple(schema.attributes.values()) + tuple(name for _, name in schema.children)
+        cls = type(tag, (Entity,), {
+            "__slots__": slots,
+            "__module__": __name__,
+            "__doc__": f"Compact {tag} entity",
+            "__reduce_ex__": _reduce_compact,
+            "_slotted": True,
+            "_fields": _compact_fields,
+        })
+        # getters of the slot descriptors, reading them directly skips __getattr__
+        cls._getters = tuple((name, cls.__dict__[name].__get__) for name in slots)
+        _classes[tag] = cls
+
+    return cls
+
+def __getattr__(name):
+    cls = compact_class(name) if not name.startswith("_") else None
+    if cls is None:
+        raise AttributeError(f"module {__name__} has no attribute {name}")
+    return cls
+
+def _compact_fields(self):
+    ''' Returns the attributes and child entities of a compact entity as a dict '''
+    fields = {}
+    cls = type(self)
+    for name, get in cls._getters:
+        # getattr would parse deferred child entity lists
+        try:
+            fields[name] = get(self, cls)
+        except AttributeError:
+            pass
+    fields.update(self.__dict__)
+    return fields
+
+def _reduce_compact(self, protocol):
+    ''' Pickle support for the generated classes, restoring the slots without calling __init__ '''
+    slots = self._fields()
+    slots["_tag"] = self._tag
+    slots["element"] = self.element
+    names = getattr(self, "_names", None)
+    if names:
+        slots["_names"] = names
+    lazy = getattr(self, "_lazy", None)
+    if lazy is not None:
+        # deferred children of the copy are not added to a copy of the index or stats
+        slots["_lazy"] = lazy._replace(index=None, stats=None)
+    return copyreg.__newobj__, (type(self),), (None, slots)
+
+def iterparse(source, tags=None, **options):
+    '''
+    Incrementally parse a taskdata document and yield its top-level entities one at a time
+
+    source is a file name or file object. Each child of the root element (e.g. TSK, PFD, DVC) is
+    yielded as a fully parsed entity and then removed from the tree, so peak memory is bounded by
+    the largest top-level entity rather than by the size of the file. If tags is given, only
+    top-level entities with one of these tags are parsed, all others are skipped. See Options for
+    the keyword arguments.
+    '''
+    options = Options(**options)
+    if tags is not None:
+        tags = frozenset(tags)
+
+    if options.stats is not None:
+        from . import stats
+        return stats.iterparse(source, tags, options)
+    return _iterparse(source, tags, options, Entity._from_element)
+
+def _iterparse(source, tags, options, build):
+    root = None
+    schema = None
+    depth = 0
+
+    for event, element in xml.etree.ElementTree.iterparse(source, events=("start", "end")):
+        if event == "start":
+            if root is None:
+                schema = spec.schema(element.tag)
+                if schema is None:
+                    raise exception.ISOXMLParseException(f"Unknown tag {element.tag}")
+                root = element
+            depth += 1
+            continue
+
+        depth -= 1
+        if depth == 1:
+            if element.tag in schema.ctags and (tags is None or element.tag in tags):
+                yield build(element, options)
+            root.remove(element)
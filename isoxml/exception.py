@@ -4,6 +4,8 @@ class ISOXMLException(Exception):
 class ISOXMLParseException(ISOXMLException):
     ''' Exception raised when there is an error parsing the ISOXML '''
 
+    # the file or input the error occurred in, if known
+    source = None
+
 class ISOXMLInitException(ISOXMLException):
     ''' Exception raised when there is an error initializing the ISOXML '''
-
@@ -0,0 +1,210 @@
+'''
+Vectorized metric computations on WGS84 coordinates
+
+Coordinates of ISOXML (PNT, TLG positions, GRD origins) are WGS84 degrees. This module converts
+arrays of them to earth-centered (ECEF), local east/north/up (ENU) and UTM coordinates in metres
+and computes geodesic lengths (Vincenty) and areas (on the authalic sphere, which has the surface
+of the ellipsoid). All functions take NumPy arrays or geometry.Points and work on whole arrays at
+once, without external services.
+
+Typical usage example:
+
+area = isoxml.geodesy.pln_area(pfd.plns[0])
+easting, northing, zone = isoxml.geodesy.utm(points.north, points.east)
+
+'''
+
+import numpy as np
+
+from . import geometry
+
+# WGS84 ellipsoid: semi-major axis, flattening, semi-minor axis and first eccentricity squared
+A = 6378137.0
+F = 1 / 298.257223563
+B = A * (1 - F)
+E2 = F * (2 - F)
+
+def _q(sin):
+    ''' Returns q of the authalic latitude for the sine of geodetic latitudes '''
+    e = np.sqrt(E2)
+    return (1 - E2) * (sin / (1 - E2 * sin ** 2) - np.log((1 - e * sin) / (1 + e * sin)) / (2 * e))
+
+_QP = _q(1.0)
+
+# radius of the authalic sphere
+R_AUTHALIC = A * np.sqrt(_QP / 2)
+
+def authalic(north):
+    ''' Returns the authalic latitudes in radians of geodetic latitudes in degrees '''
+    return np.arcsin(np.clip(_q(np.sin(np.radians(north))) / _QP, -1, 1))
+
+def ecef(north, east, up=0.0):
+    ''' Returns the earth-centered, earth-fixed x, y and z of positions in degrees and metres '''
+    lat, lon = np.radians(np.asarray(north, dtype=float)), np.radians(np.asarray(east, dtype=float))
+    sin_lat = np.sin(lat)
+    n = A / np.sqrt(1 - E2 * sin_lat ** 2)
+    r = (n + up) * np.cos(lat)
+    return r * np.cos(lon), r * np.sin(lon), (n * (1 - E2) + up) * sin_lat
+
+def enu(north, east, up=0.0, origin=None):
+    '''
+    Returns east, north and up in metres of positions relative to origin
+
+    origin is (north, east) or (north, east, up) and defaults to the centre of the bounding box of
+    the positions.
+    '''
+    north, east = np.asarray(north, dtype=float), np.asarray(east, dtype=float)
+    if origin is None:
+        origin = ((np.nanmin(north) + np.nanmax(north)) / 2, (np.nanmin(east) + np.nanmax(east)) / 2)
+    lat0, lon0 = origin[:2]
+    h0 = origin[2] if len(origin) > 2 else 0.0
+
+    x, y, z = ecef(north, east, up)
+    x0, y0, z0 = ecef(lat0, lon0, h0)
+    dx, dy, dz = x - x0, y - y0, z - z0
+
+    sin_lat, cos_lat = np.sin(np.radians(lat0)), np.cos(np.radians(lat0))
+    sin_lon, cos_lon = np.sin(np.radians(lon0)), np.cos(np.radians(lon0))
+    e = -sin_lon * dx + cos_lon * dy
+    n = -sin_lat * cos_lon * dx - sin_lat * sin_lon * dy + cos_lat * dz
+    u = cos_lat * cos_lon * dx + cos_lat * sin_lon * dy + sin_lat * dz
+    return e, n, u
+
+def utm_zone(north, east):
+    ''' Returns the UTM zone numbers of positions, including the exceptions of Norway and Svalbard '''
+    north, east = np.asarray(north, dtype=float), np.asarray(east, dtype=float)
+    zone = (np.floor((east + 180) / 6).astype(np.int64) % 60) + 1
+    zone = np.where((north >= 56) & (north < 64) & (east >= 3) & (east < 12), 32, zone)
+    svalbard = (north >= 72) & (north < 84) & (east >= 0) & (east < 42)
+    return np.where(svalbard, np.clip(((east + 3) // 12).astype(np.int64) * 2 + 31, 31, 37), zone)
+
+# Krüger series of the transverse Mercator projection to fourth order in the third flattening n
+_N = F / (2 - F)
+_RECTIFYING = A / (1 + _N) * (1 + _N ** 2 / 4 + _N ** 4 / 64)
+_ALPHA = (
+    _N / 2 - 2 * _N ** 2 / 3 + 5 * _N ** 3 / 16 + 41 * _N ** 4 / 180,
+    13 * _N ** 2 / 48 - 3 * _N ** 3 / 5 + 557 * _N ** 4 / 1440,
+    61 * _N ** 3 / 240 - 103 * _N ** 4 / 140,
+    49561 * _N ** 4 / 161280,
+)
+_K0 = 0.9996
+
+def transverse_mercator(north, east, meridian):
+    ''' Returns x (east) and y (north) in metres of the transverse Mercator projection around meridian, scaled by 0.9996 '''
+    lat = np.radians(np.asarray(north, dtype=float))
+    lon = np.radians(np.asarray(east, dtype=float) - meridian)
+    c = 2 * np.sqrt(_N) / (1 + _N)
+    sin = np.sin(lat)
+    t = np.sinh(np.arctanh(sin) - c * np.arctanh(c * sin))
+    xi = np.arctan2(t, np.cos(lon))
+    eta = np.arctanh(np.sin(lon) / np.sqrt(1 + t ** 2))
+
+    x, y = eta.copy(), xi.copy()
+    for j, alpha in enumerate(_ALPHA, 1):
+        x += alpha * np.cos(2 * j * xi) * np.sinh(2 * j * eta)
+        y += alpha * np.sin(2 * j * xi) * np.cosh(2 * j * eta)
+    return _K0 * _RECTIFYING * x, _K0 * _RECTIFYING * y
+
+def utm(north, east, zone=None):
+    '''
+    Returns easting, northing and zone of positions in UTM
+
+    All positions are projected to the same zone so their coordinates can be compared, by default
+    the zone of the centre of their bounding box. Positions south of the equator get the false
+    northing of 10000 km.
+    '''
+    north, east = np.asarray(north, dtype=float), np.asarray(east, dtype=float)
+    if zone is None:
+        zone = int(utm_zone((np.nanmin(north) + np.nanmax(north)) / 2, (np.nanmin(east) + np.nanmax(east)) / 2))
+    x, y = transverse_mercator(north, east, 6 * zone - 183)
+    return x + 500000, np.where(north < 0, y + 10000000, y), zone
+
+def distance(north1, east1, north2, east2, iterations=200, tolerance=1e-12):
+    '''
+    Returns the geodesic distances in metres between pairs of positions (Vincenty's inverse formula)
+
+    The iteration runs on all pairs at once until every pair converged. Nearly antipodal pairs,
+    for which the formula does not converge, are NaN.
+    '''
+    lat1, lat2 = np.radians(np.asarray(north1, dtype=float)), np.radians(np.asarray(north2, dtype=float))
+    L = np.radians(np.asarray(east2, dtype=float) - np.asarray(east1, dtype=float))
+    u1, u2 = np.arctan((1 - F) * np.tan(lat1)), np.arctan((1 - F) * np.tan(lat2))
+    sin_u1, cos_u1, sin_u2, cos_u2 = np.sin(u1), np.cos(u1), np.sin(u2), np.cos(u2)
+
+    lam = L
+    converged = np.zeros(np.broadcast(lat1, lat2, L).shape, dtype=bool)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for _ in range(iterations):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.hypot(cos_u2 * sin_lam, cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam)
+            cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+            sin_alpha = np.where(sin_sigma == 0, 0.0, cos_u1 * cos_u2 * sin_lam / sin_sigma)
+            cos2_alpha = 1 - sin_alpha ** 2
+            # cos2_alpha is 0 on the equator
+            cos_2sigma_m = np.where(cos2_alpha == 0, 0.0, cos_sigma - 2 * sin_u1 * sin_u2 / cos2_alpha)
+            c = F / 16 * cos2_alpha * (4 + F * (4 - 3 * cos2_alpha))
+            previous = lam
+            lam = L + (1 - c) * F * sin_alpha * (
+                sigma + c * sin_sigma * (cos_2sigma_m + c * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)))
+            converged = np.abs(lam - previous) < tolerance
+            if converged.all():
+                break
+
+        u2_ = cos2_alpha * (A ** 2 - B ** 2) / B ** 2
+        a = 1 + u2_ / 16384 * (4096 + u2_ * (-768 + u2_ * (320 - 175 * u2_)))
+        b = u2_ / 1024 * (256 + u2_ * (-128 + u2_ * (74 - 47 * u2_)))
+        delta = b * sin_sigma * (cos_2sigma_m + b / 4 * (
+            cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+            - b / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)))
+        return np.where(converged, B * a * (sigma - delta), np.nan)
+
+def polygon_area(north, east):
+    '''
+    Returns the area in square metres of a ring of positions on the authalic sphere
+
+    The ring may be closed or open and is oriented either way. Each edge contributes the exact
+    spherical excess of the area between it and the equator.
+    '''
+    lat = authalic(np.asarray(north, dtype=float))
+    lon = np.radians(np.asarray(east, dtype=float))
+    if len(lat) < 3:
+        return 0.0
+    lat2, lon2 = np.roll(lat, -1), np.roll(lon, -1)
+    # longitude differences across the antimeridian
+    dlon = (lon2 - lon + np.pi) % (2 * np.pi) - np.pi
+    t1, t2 = np.tan(lat / 2), np.tan(lat2 / 2)
+    excess = 2 * np.arctan2(np.tan(dlon / 2) * (t1 + t2), 1 + t1 * t2)
+    return float(abs(excess.sum()) * R_AUTHALIC ** 2)
+
+def length(points):
+    ''' Returns the geodesic length in metres of the line string through geometry.Points '''
+    if len(points) < 2:
+        return 0.0
+    north, east = points.north, points.east
+    return float(distance(north[:-1], east[:-1], north[1:], east[1:]).sum())
+
+def area(points):
+    ''' Returns the area in square metres of the ring formed by geometry.Points '''
+    return polygon_area(points.north, points.east)
+
+def pln_area(pln):
+    ''' Returns the area in square metres of a PLN entity: its exterior rings minus its interior rings '''
+    total = 0.0
+    for lsg_type, points in geometry.rings(pln):
+        if lsg_type == 1:
+            total += area(points)
+        elif lsg_type == 2:
+            total -= area(points)
+    return total
+
+def cell_areas(grd):
+    '''
+    Returns the area in square metres of the cells of each row of a GRD entity
+
+    Cells are bounded by parallels and meridians, so their area only depends on their row.
+    '''
+    rows = int(grd.maximum_row)
+    edges = float(grd.minimum_north_position) + float(grd.cell_north_size) * np.arange(rows + 1)
+    width = np.radians(float(grd.cell_east_size))
+    return R_AUTHALIC ** 2 * width * np.diff(np.sin(authalic(edges)))
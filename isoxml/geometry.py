@@ -0,0 +1,137 @@
+''' Columnar geometry for point lists (LSG/PNT) backed by NumPy arrays '''
+
+import typing
+
+import numpy as np
+
+from . import exception
+
+class Points(typing.NamedTuple):
+    '''
+    Columnar representation of the PNT children of a LSG
+
+    north, east and type hold one value per point. The optional columns up, horizontal_accuracy and
+    vertical_accuracy are None if no point carries the attribute and NaN for points missing it.
+    Coordinates are WGS84 degrees, so lengths and areas are in degrees as well, see geodesy for
+    metric ones.
+    '''
+    north: np.ndarray
+    east: np.ndarray
+    type: np.ndarray
+    up: typing.Optional[np.ndarray] = None
+    horizontal_accuracy: typing.Optional[np.ndarray] = None
+    vertical_accuracy: typing.Optional[np.ndarray] = None
+
+    def __len__(self):
+        return len(self.north)
+
+    def bbox(self):
+        ''' Returns the bounding box as (min north, min east, max north, max east) '''
+        return (self.north.min(), self.east.min(), self.north.max(), self.east.max())
+
+    def length(self):
+        ''' Returns the length of the line string through all points '''
+        return float(np.hypot(np.diff(self.north), np.diff(self.east)).sum())
+
+    def area(self):
+        ''' Returns the area of the ring formed by the points using the shoelace formula '''
+        north, east = self.north, self.east
+        return float(abs(np.dot(east, np.roll(north, -1)) - np.dot(north, np.roll(east, -1))) / 2)
+
+# PNT attribute -> Points column of the optional columns
+_optional = {"E": "up", "H": "horizontal_accuracy", "I": "vertical_accuracy"}
+
+def _column(pnts, attribute, required):
+    values = [p.get(attribute) for p in pnts]
+    if None in values:
+        if required:
+            raise exception.ISOXMLParseException(f"Required attribute {attribute} not found in PNT")
+        if not any(values):
+            return None
+        return np.array([np.nan if v is None else float(v) for v in values])
+
+    try:
+        return np.array(values, dtype=float)
+    except ValueError as e:
+        raise exception.ISOXMLParseException(f"Invalid value for attribute {attribute} in PNT") from e
+
+def from_element(element):
+    ''' Builds the columnar points of a LSG directly from its xml.etree element '''
+    return from_attributes(element.findall("PNT"))
+
+def from_attributes(pnts):
+    ''' Builds columnar points from the XML attributes of PNT elements, given as mappings or elements '''
+    columns = {name: _column(pnts, attribute, False) for attribute, name in _optional.items()}
+    return Points(
+        north=_column(pnts, "C", True),
+        east=_column(pnts, "D", True),
+        type=_column(pnts, "A", True).astype(np.uint8),
+        **columns
+    )
+
+def from_entities(pnts):
+    ''' Builds columnar points from a list of PNT entities '''
+    columns = {}
+    for name in _optional.values():
+        values = [getattr(p, name, None) for p in pnts]
+        if any(v is not None for v in values):
+            columns[name] = np.array([np.nan if v is None else float(v) for v in values])
+
+    return Points(
+        north=np.array([float(p.north) for p in pnts]),
+        east=np.array([float(p.east) for p in pnts]),
+        type=np.array([int(p.type) for p in pnts], dtype=np.uint8),
+        **columns
+    )
+
+def points(lsg):
+    '''
+    Returns the columnar points of a LSG entity
+
+    Uses the points built while parsing with columnar=True if present, otherwise the points are
+    built from the element of the entity, or from its PNT entities if the element was dropped.
+    '''
+    result = getattr(lsg, "points", None)
+    if result is not None:
+        return result
+    if lsg.element is not None:
+        return from_element(lsg.element)
+    return from_entities(getattr(lsg, "pnts", []))
+
+def rings(pln):
+    ''' Returns the rings of a PLN entity as a list of (LSG type, Points) tuples '''
+    return [(int(lsg.type), points(lsg)) for lsg in getattr(pln, "lsgs", [])]
+
+def contains(rings, north, east):
+    '''
+    Even-odd point in polygon test of arrays of positions against a polygon given as a list of rings
+
+    Interior rings (holes) are handled by the even-odd rule, so all rings of a PLN can be passed at
+    once. Returns a boolean array, the loop runs over the ring edges and is vectorized over points.
+    '''
+    north, east = np.asarray(north, dtype=float), np.asarray(east, dtype=float)
+    inside = np.zeros(north.shape, dtype=bool)
+
+    for ring in rings:
+        if len(ring) < 3:
+            continue
+
+        # only test the positions within the bounding box of the ring
+        min_north, min_east, max_north, max_east = ring.bbox()
+        index = np.flatnonzero((north >= min_north) & (north <= max_north) & (east >= min_east) & (east <= max_east))
+        if not len(index):
+            continue
+
+        y, x = north[index], east[index]
+        ry, rx = ring.north, ring.east
+        odd = np.zeros(len(index), dtype=bool)
+        for i in range(len(ry)):
+            y1, x1, y2, x2 = ry[i - 1], rx[i - 1], ry[i], rx[i]
+            if y1 == y2:
+                continue
+            crosses = (y1 > y) != (y2 > y)
+            odd ^= crosses & (x < x1 + (y - y1) * (x2 - x1) / (y2 - y1))
+
+        inside[index] ^= odd
+
+    return inside
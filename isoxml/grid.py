@@ -0,0 +1,94 @@
+'''
+Reader for binary grid files (GRD)
+
+A GRD entity describes a grid of MaximumRow x MaximumColumn cells starting at its minimum north and
+east position. The cells are stored row by row in GRDxxxxx.BIN, starting with the south-west cell
+and moving east, then north. Grid type 1 stores one byte per cell holding a TZN code, grid type 2
+stores one int32 process value per PDV of the TZN referenced by the GRD TreatmentZoneCode.
+
+Grids are returned as NumPy arrays of shape (rows, columns) or (rows, columns, PDVs) that are views
+of the file, either memory-mapped or over a bytes-like object, so no data is copied.
+'''
+
+import os
+
+import numpy as np
+
+from . import exception
+
+def zone(grd, tsk):
+    ''' Returns the TZN of tsk referenced by the TreatmentZoneCode of grd or None '''
+    code = getattr(grd, "treatment_zone_code", None)
+    if code is None:
+        return None
+    for tzn in getattr(tsk, "tzns", []):
+        if int(tzn.code) == int(code):
+            return tzn
+    return None
+
+def layout(grd, count=None):
+    '''
+    Returns the dtype and shape of the cells of grd
+
+    count is the number of process values per cell of grid type 2 and is left as None if unknown.
+    '''
+    rows, columns = int(grd.maximum_row), int(grd.maximum_column)
+    grid_type = int(grd.grid_type)
+
+    if grid_type == 1:
+        return np.dtype("u1"), (rows, columns)
+    if grid_type == 2:
+        return np.dtype("<i4"), (rows, columns, count)
+
+    raise exception.ISOXMLParseException(f"Unsupported grid type {grid_type}")
+
+def _validate(grd, size, count):
+    ''' Returns dtype and shape of grd after validating them against the file size '''
+    dtype, shape = layout(grd, count)
+    cells = shape[0] * shape[1] * dtype.itemsize
+
+    if shape[-1] is None:
+        # infer the number of process values per cell of grid type 2 from the file size
+        if cells == 0 or size % cells:
+            raise exception.ISOXMLParseException(
+                f"GRD file length {size} is not a multiple of {shape[0]} x {shape[1]} cells")
+        shape = shape[:2] + (size // cells,)
+
+    expected = int(np.prod(shape)) * dtype.itemsize
+    if size != expected:
+        raise exception.ISOXMLParseException(
+            f"GRD file length {size} does not match {'x'.join(map(str, shape))} cells ({expected} bytes)")
+
+    length = getattr(grd, "file_length", None)
+    if length is not None and int(length) != size:
+        raise exception.ISOXMLParseException(f"GRD file length {size} does not match FileLength {length}")
+
+    return dtype, shape
+
+def count(grd, tsk):
+    ''' Returns the number of process values per cell of grid type 2 from the TZN referenced by grd '''
+    tzn = zone(grd, tsk)
+    if tzn is None:
+        raise exception.ISOXMLParseException(f"TZN {getattr(grd, 'treatment_zone_code', None)} of GRD not found")
+    return len(getattr(tzn, "pdvs", []))
+
+def from_buffer(grd, data, tsk=None):
+    '''
+    Returns the cells of grd as a read-only array over data, a bytes-like object with the file contents
+
+    The number of process values of grid type 2 is taken from the TZN of tsk if given, otherwise it
+    is inferred from the size of data.
+    '''
+    n = count(grd, tsk) if tsk is not None and int(grd.grid_type) == 2 else None
+    dtype, shape = _validate(grd, memoryview(data).nbytes, n)
+    return np.frombuffer(data, dtype=dtype).reshape(shape)
+
+def open(grd, directory, tsk=None):
+    ''' Returns the cells of grd memory-mapped from its BIN file in directory, see from_buffer '''
+    return open_file(grd, os.path.join(directory, grd.file_name + ".BIN"), tsk)
+
+def open_file(grd, path, tsk=None):
+    ''' Returns the cells of grd memory-mapped from the file at path, see from_buffer '''
+    n = count(grd, tsk) if tsk is not None and int(grd.grid_type) == 2 else None
+    dtype, shape = _validate(grd, os.path.getsize(path), n)
+    return np.memmap(path, dtype=dtype, mode="r", shape=shape)
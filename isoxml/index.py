@@ -0,0 +1,82 @@
+'''
+Index of entities by Id and of the IdRef references between them
+
+Entities are added while parsing with the index parse option (see entity.Options), or afterwards
+with Index.add_tree. Resolving an IdRef and finding the entities referencing an Id are then dict
+lookups instead of scans over the entity lists.
+'''
+
+import typing
+
+from . import spec
+
+class Reference(typing.NamedTuple):
+    ''' An IdRef attribute of an entity '''
+    entity: typing.Any
+    attribute: str
+    id: str
+
+class Index:
+    '''
+    Index of entities by Id and of their IdRef references
+
+    ids maps every Id to its entity, references maps every referenced Id to the list of references
+    to it and duplicates holds the entities whose Id was already taken by another entity.
+    '''
+
+    def __init__(self):
+        self.ids = {}
+        self.references = {}
+        self.duplicates = []
+
+    def add(self, entity, schema=None):
+        ''' Adds an entity, without its children, to the index '''
+        if schema is None:
+            schema = spec.schema(entity.tag())
+
+        if schema.identifier is not None:
+            id = getattr(entity, schema.identifier, None)
+            if id is not None:
+                if id in self.ids:
+                    self.duplicates.append(entity)
+                else:
+                    self.ids[id] = entity
+
+        for attribute in schema.references:
+            ref = getattr(entity, attribute, None)
+            if ref is not None:
+                self.references.setdefault(ref, []).append(Reference(entity, attribute, ref))
+
+    def add_tree(self, entity):
+        ''' Adds an entity and all its descendants to the index '''
+        schema = spec.schema(entity.tag())
+        self.add(entity, schema)
+        for _, name in schema.children:
+            for child in getattr(entity, name, ()):
+                self.add_tree(child)
+
+    def update(self, other):
+        ''' Merges another index into this one, e.g. the index of an external file '''
+        for id, entity in other.ids.items():
+            if id in self.ids:
+                self.duplicates.append(entity)
+            else:
+                self.ids[id] = entity
+        for id, references in other.references.items():
+            self.references.setdefault(id, []).extend(references)
+        self.duplicates.extend(other.duplicates)
+
+    def resolve(self, id):
+        ''' Returns the entity with the given Id or None '''
+        return self.ids.get(id)
+
+    def referencing(self, id, tag=None, attribute=None):
+        ''' Returns the entities referencing id, optionally only those of tag or by attribute '''
+        return [
+            r.entity for r in self.references.get(id, ())
+            if (tag is None or r.entity.tag() == tag) and (attribute is None or r.attribute == attribute)
+        ]
+
+    def dangling(self):
+        ''' Returns all references to an Id that is not part of the index '''
+        return [r for id, references in self.references.items() if id not in self.ids for r in references]
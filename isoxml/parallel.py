@@ -0,0 +1,200 @@
+'''
+Parallel parsing of a single large taskdata document
+
+The byte ranges of the top-level children of the root element (e.g. PFD, TSK) are found with a
+single expat pass that builds nothing. Consecutive ranges are grouped into chunks and every chunk
+is parsed by a worker process as a document of its own, made of the prolog and root start tag, the
+chunk and the root end tag. The child lists of the chunk roots are then joined in document order,
+so the result is the same as parsing the document sequentially.
+
+Typical usage example:
+
+taskdata = isoxml.parallel.parse("TASKDATA.XML", max_workers=8, compact=True)
+
+'''
+
+import concurrent.futures
+import os
+import pickle
+import typing
+import xml.parsers.expat
+
+from . import entity
+from . import exception
+from . import index
+from . import spec
+
+class Layout(typing.NamedTuple):
+    '''
+    Byte layout of a document
+
+    header ends at the first top-level child, trailer starts at the root end tag and ranges are the
+    (start, stop) offsets of the top-level children, each ending where the next one starts.
+    '''
+    header: int
+    trailer: int
+    ranges: typing.List[typing.Tuple[int, int]]
+
+def scan(source):
+    ''' Returns the Layout of a document given as bytes or as the path of a file '''
+    parser = xml.parsers.expat.ParserCreate()
+    starts = []
+    depth = 0
+    trailer = None
+
+    def start(tag, attrib):
+        nonlocal depth
+        if depth == 1:
+            starts.append(parser.CurrentByteIndex)
+        depth += 1
+
+    def end(tag):
+        nonlocal depth, trailer
+        depth -= 1
+        if depth == 0:
+            trailer = parser.CurrentByteIndex
+
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+
+    try:
+        if isinstance(source, (bytes, bytearray)):
+            parser.Parse(source, True)
+        else:
+            with open(source, "rb") as f:
+                parser.ParseFile(f)
+    except xml.parsers.expat.ExpatError as e:
+        raise exception.ISOXMLParseException(f"Invalid XML: {e}") from e
+
+    if not starts:
+        return Layout(trailer, trailer, [])
+    return Layout(starts[0], trailer, list(zip(starts, starts[1:] + [trailer])))
+
+def _chunks(ranges, size):
+    ''' Groups consecutive ranges into (start, stop) chunks of at least size bytes '''
+    chunks = []
+    first = None
+    for start, stop in ranges:
+        if first is None:
+            first = start
+        if stop - first >= size:
+            chunks.append((first, stop))
+            first = None
+    if first is not None:
+        chunks.append((first, ranges[-1][1]))
+    return chunks
+
+def _read(source, start, stop=None):
+    if isinstance(source, (bytes, bytearray)):
+        return source[start:stop]
+    with open(source, "rb") as f:
+        f.seek(start)
+        return f.read() if stop is None else f.read(stop - start)
+
+class _Recorder(index.Index):
+    ''' Index of a chunk that also records the entities with an Id in the order they were added '''
+
+    def __init__(self):
+        super().__init__()
+        self.order = []
+
+    def add(self, entity, schema=None):
+        if schema is None:
+            schema = spec.schema(entity.tag())
+        super().add(entity, schema)
+        if schema.identifier is not None and getattr(entity, schema.identifier, None) is not None:
+            self.order.append(entity)
+
+def _merge(target, chunk):
+    ''' Adds the entities of a chunk index to target in the order they were parsed, like Index.add '''
+    for e in chunk.order:
+        if e.id in target.ids:
+            target.duplicates.append(e)
+        else:
+            target.ids[e.id] = e
+    for id, references in chunk.references.items():
+        target.references.setdefault(id, []).extend(references)
+
+def _parse_chunk(header, trailer, body, backend, options, indexed):
+    '''
+    Parses a chunk in a worker process and returns its root entity and index, pickled
+
+    body is the chunk as bytes or a (path, start, stop) tuple to read it in the worker. The result
+    is pickled here so that parse unpickles it with the garbage collector paused, not the executor.
+    '''
+    if isinstance(body, tuple):
+        body = _read(*body)
+
+    idx = None
+    if indexed:
+        idx = options["index"] = _Recorder()
+
+    with entity.paused_gc():
+        root = entity.fromstring(header + body + trailer, backend=backend, **options)
+        return pickle.dumps((root, idx), pickle.HIGHEST_PROTOCOL)
+
+def _load(data):
+    # unpickling is the part of parse that does not run in parallel
+    with entity.paused_gc():
+        return pickle.loads(data)
+
+def parse(source, max_workers=None, executor=None, chunk_size=None, backend="etree", **options):
+    '''
+    Parses a document given as bytes or as the path of a file across a process pool and returns
+    the root entity, see entity.Options and entity.fromstring for the keyword arguments
+
+    The top-level children are parsed in chunks of at least chunk_size bytes, by default about four
+    chunks per worker. A concurrent.futures executor can be passed instead of max_workers to reuse
+    a pool. Elements cannot be kept across processes, so keep_element defaults to False and the
+    keep_element and lazy options are not supported, nor is stats, which would count in the
+    workers. An index option is filled in this process with the entities in the same order as by
+    a sequential parse, including the duplicates of an Id.
+    '''
+    options = dict({"keep_element": False}, **options)
+    parsed = entity.Options(**options)
+    if parsed.keep_element or parsed.lazy or parsed.stats is not None:
+        raise exception.ISOXMLException("keep_element, lazy and stats are not supported by parallel parsing")
+
+    layout = scan(source)
+    if not layout.ranges:
+        return entity.fromstring(_read(source, 0), backend=backend, **options)
+
+    header, trailer = _read(source, 0, layout.header), _read(source, layout.trailer)
+    total = layout.trailer - layout.header
+    if chunk_size is None:
+        chunk_size = total // (4 * (max_workers or os.cpu_count() or 1)) or 1
+
+    indexed = parsed.index is not None
+    options["index"] = None
+    bodies = [
+        source[start:stop] if isinstance(source, (bytes, bytearray)) else (source, start, stop)
+        for start, stop in _chunks(layout.ranges, chunk_size)
+    ]
+
+    pool = executor or concurrent.futures.ProcessPoolExecutor(max_workers=max_workers)
+    try:
+        futures = [pool.submit(_parse_chunk, header, trailer, body, backend, options, indexed) for body in bodies]
+        results = [_load(future.result()) for future in futures]
+    finally:
+        if executor is None:
+            pool.shutdown()
+
+    root = results[0][0]
+    schema = spec.schema(root.tag())
+    lists = {}
+    for chunk, _ in results:
+        for _, name in schema.children:
+            lists.setdefault(name, []).extend(getattr(chunk, name, ()))
+
+    # child lists in the order of the spec, like a sequential parse
+    for name in lists:
+        root.__dict__.pop(name, None)
+    for name, children in lists.items():
+        if children:
+            setattr(root, name, children)
+
+    if indexed:
+        for _, idx in results:
+            _merge(parsed.index, idx)
+
+    return root
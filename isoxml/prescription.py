@@ -0,0 +1,138 @@
+'''
+Vectorized lookup of the commanded treatment zone and process values of a TSK at given positions
+
+The zone of a position is taken from the GRD of the task if there is one, otherwise from the
+polygons (PLN) of its treatment zones (TZN). Process values are the PDV values of the zone, or the
+cell values of grid type 2, scaled with the VPN referenced by each PDV.
+'''
+
+import numpy as np
+
+from . import exception
+from . import geometry
+from . import grid
+
+# TZN codes are bytes, the extra entry maps the code -1 (no zone) to a row of NaN values
+_CODES = 256 + 1
+
+class Prescription:
+    '''
+    Resolves zone codes and process values of a TSK for arrays of positions
+
+    cells are the GRD cells as returned by grid.open or grid.from_buffer and are required if the
+    task has a GRD. vpns is an iterable of VPN entities used to scale the PDV values, PDV without a
+    VPN keep their unscaled values.
+
+    The columns of the process values are the (DDI, DET id) of the PDVs, in the order of the TZN
+    referenced by the GRD for grid type 2 and in order of first appearance in the TZN otherwise.
+    '''
+
+    def __init__(self, tsk, cells=None, vpns=()):
+        self.tsk = tsk
+        self.grd = getattr(tsk, "grds", [None])[0]
+        self.cells = cells
+        if self.grd is not None and cells is None:
+            raise exception.ISOXMLException("The cells of the GRD are required for tasks with a grid")
+
+        vpns = {v.id: (float(v.offset), float(v.scale)) for v in vpns}
+        tzns = getattr(tsk, "tzns", [])
+
+        # the PDVs of the zone referenced by a grid of process values define the first columns
+        grid_pdvs = []
+        if self.grd is not None and int(self.grd.grid_type) == 2:
+            grid_pdvs = getattr(grid.zone(self.grd, tsk), "pdvs", [])
+            if not grid_pdvs:
+                code = getattr(self.grd, "treatment_zone_code", None)
+                raise exception.ISOXMLParseException(f"TZN {code} of GRD not found or without PDV")
+
+        columns = {_key(p): i for i, p in enumerate(grid_pdvs)}
+        for tzn in tzns:
+            for pdv in getattr(tzn, "pdvs", []):
+                columns.setdefault(_key(pdv), len(columns))
+        self.columns = list(columns)
+
+        # one row of scaled values per zone code, codes without a zone map to the last row (NaN)
+        self._rows = np.full(_CODES, len(tzns), dtype=np.intp)
+        self._values = np.full((len(tzns) + 1, len(columns)), np.nan)
+        for row, tzn in enumerate(tzns):
+            self._rows[int(tzn.code)] = row
+            for pdv in getattr(tzn, "pdvs", []):
+                offset, scale = vpns.get(getattr(pdv, "vpn_id_ref", None), (0.0, 1.0))
+                self._values[row, columns[_key(pdv)]] = (float(pdv.value) + offset) * scale
+
+        # scaling of the cell values of a grid of process values
+        scaling = [vpns.get(getattr(p, "vpn_id_ref", None), (0.0, 1.0)) for p in grid_pdvs]
+        self._offset = np.array([offset for offset, _ in scaling])
+        self._scale = np.array([scale for _, scale in scaling])
+        if grid_pdvs and cells.shape[2:] != (len(grid_pdvs),):
+            raise exception.ISOXMLException(f"GRD cells of shape {cells.shape} do not match {len(grid_pdvs)} PDV")
+
+        self._polygons = [
+            (int(tzn.code), [ring for pln in getattr(tzn, "plns", []) for _, ring in geometry.rings(pln)])
+            for tzn in tzns
+        ]
+
+    def _code(self, name):
+        code = getattr(self.tsk, name, None)
+        return -1 if code is None else int(code)
+
+    def zones(self, north, east):
+        '''
+        Returns the zone code of every position
+
+        Positions outside of the grid get the OutOfFieldTreatmentZoneCode of the task, positions
+        outside of all zone polygons its DefaultTreatmentZoneCode and positions with NaN coordinates
+        its PositionLostTreatmentZoneCode, each -1 if not set.
+        '''
+        north, east = np.asarray(north, dtype=float), np.asarray(east, dtype=float)
+
+        if self.grd is not None:
+            row, column, inside = self._cell(north, east)
+            codes = np.full(north.shape, self._code("out_of_field_treatment_zone_code"), dtype=np.int16)
+            if int(self.grd.grid_type) == 1:
+                codes[inside] = self.cells[row[inside], column[inside]]
+            else:
+                codes[inside] = int(self.grd.treatment_zone_code)
+        else:
+            codes = np.full(north.shape, self._code("default_treatment_zone_code"), dtype=np.int16)
+            unassigned = np.ones(north.shape, dtype=bool)
+            for code, rings in self._polygons:
+                if rings:
+                    hit = unassigned & geometry.contains(rings, north, east)
+                    codes[hit] = code
+                    unassigned &= ~hit
+
+        codes[np.isnan(north) | np.isnan(east)] = self._code("position_lost_treatment_zone_code")
+        return codes
+
+    def _cell(self, north, east):
+        ''' Returns row, column and a mask of positions inside the grid '''
+        grd = self.grd
+        with np.errstate(invalid="ignore"):
+            row = np.floor((north - float(grd.minimum_north_position)) / float(grd.cell_north_size))
+            column = np.floor((east - float(grd.minimum_east_position)) / float(grd.cell_east_size))
+            inside = (row >= 0) & (row < int(grd.maximum_row)) & (column >= 0) & (column < int(grd.maximum_column))
+        return np.where(inside, row, 0).astype(np.intp), np.where(inside, column, 0).astype(np.intp), inside
+
+    def lookup(self, north, east):
+        '''
+        Returns zone codes and scaled process values for arrays of positions (latitude/longitude)
+
+        The process values have one row per position and one column per entry of columns, values
+        that are not defined for a position are NaN.
+        '''
+        north, east = np.asarray(north, dtype=float), np.asarray(east, dtype=float)
+        codes = self.zones(north, east)
+        values = self._values[self._rows[codes]]
+
+        if self.grd is not None and int(self.grd.grid_type) == 2:
+            row, column, inside = self._cell(north, east)
+            inside &= ~(np.isnan(north) | np.isnan(east))
+            n = len(self._scale)
+            values[inside, :n] = (self.cells[row[inside], column[inside]] + self._offset) * self._scale
+
+        return codes, values
+
+def _key(pdv):
+    ''' Returns the column key of a PDV '''
+    return (int(pdv.ddi, 16) if isinstance(pdv.ddi, str) else pdv.ddi, getattr(pdv, "det_id_ref", None))
@@ -0,0 +1,209 @@
+'''
+Path queries over parsed documents
+
+A path is a sequence of tags separated by /, each optionally followed by predicates on the
+attributes of the entity in brackets, e.g.
+
+TSK/TZN/PDV[pdt_id_ref=PDT1]
+TSK[status=1]/TLG
+PFD[area>=10000][ctr_id_ref]
+*[ctr_id_ref=CTR1]
+
+The first step matches entities at any depth, every following step a child of the entity matched
+by the previous step. Predicates compare an attribute with = != < <= > >= or test that it is
+present. Values are converted with the spec type of the attribute, e.g. ddi=0006 matches DDI 6.
+
+Typical usage example:
+
+q = isoxml.query.Query(taskdata)
+for pdv in q.select("TSK/TZN/PDV[pdt_id_ref=PDT1]"):
+    ...
+
+'''
+
+import functools
+import operator
+import re
+import typing
+
+from . import exception
+from . import index
+from . import spec
+
+class Predicate(typing.NamedTuple):
+    ''' A comparison of an attribute with a value, op is None to test that the attribute is present '''
+    name: str
+    op: typing.Optional[str]
+    value: typing.Optional[str]
+
+class Step(typing.NamedTuple):
+    ''' A step of a path, tag is * to match entities of any tag '''
+    tag: str
+    predicates: typing.Tuple[Predicate, ...]
+
+_operators = {
+    "=": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+_step = re.compile(r"\s*(\w+|\*)\s*((?:\[[^\]]*\]\s*)*)$")
+_predicate = re.compile(r"\s*(\w+)\s*(?:(!=|<=|>=|=|<|>)\s*(.*?))?\s*$")
+
+@functools.lru_cache(maxsize=256)
+def compile(path):
+    ''' Returns the steps of a path '''
+    steps = []
+    for part in path.split("/"):
+        match = _step.match(part)
+        if match is None:
+            raise exception.ISOXMLException(f"Invalid query {path}")
+
+        tag, brackets = match.groups()
+        if tag != "*" and spec.schema(tag) is None:
+            raise exception.ISOXMLException(f"Unknown tag {tag} in query {path}")
+
+        predicates = []
+        for text in re.findall(r"\[([^\]]*)\]", brackets):
+            p = _predicate.match(text)
+            if p is None:
+                raise exception.ISOXMLException(f"Invalid predicate [{text}] in query {path}")
+            name, op, value = p.groups()
+            if value and value[0] == value[-1] and value[0] in "'\"" and len(value) > 1:
+                value = value[1:-1]
+            predicates.append(Predicate(name, op, value))
+
+        steps.append(Step(tag, tuple(predicates)))
+    return tuple(steps)
+
+@functools.lru_cache(maxsize=1024)
+def _literal(tag, name, value, typed):
+    ''' Returns value converted like the attribute name of tag, or None if it cannot be converted '''
+    if not typed:
+        return value
+    convert = spec.schema(tag).converters.get(name)
+    if convert is None:
+        return value
+    try:
+        return convert(value)
+    except ValueError:
+        return None
+
+def _matches(e, predicates):
+    for name, op, value in predicates:
+        actual = getattr(e, name, None)
+        if actual is None:
+            return False
+        if op is None:
+            continue
+        literal = _literal(e.tag(), name, value, not isinstance(actual, str))
+        if literal is None:
+            return False
+        try:
+            if not _operators[op](actual, literal):
+                return False
+        except TypeError:
+            return False
+    return True
+
+class Query:
+    '''
+    Per-tag index of the entities of one or more documents, e.g. TASKDATA.XML and its external files
+
+    The entities are walked once, when the query is created: entities lists the entities of every
+    tag in document order, parent returns the parent of an entity and index is an index.Index of
+    all entities. Paths are evaluated from their last step: the candidates are the entities of its
+    tag, or the entities found in the index for an = predicate on the Id (including entities with a
+    duplicate Id) or an IdRef, and only candidates whose ancestors match the earlier steps are
+    yielded.
+    '''
+
+    def __init__(self, *roots):
+        self.roots = roots
+        self.entities = {}
+        self.index = index.Index()
+        self._parents = {}
+        self._all = []
+
+        for root in roots:
+            self._walk(root, None)
+
+        # entities whose Id was already taken, in document order
+        self._duplicates = {}
+        for e in self.index.duplicates:
+            self._duplicates.setdefault(e.id, []).append(e)
+
+    def _walk(self, e, parent):
+        stack = [(e, parent)]
+        while stack:
+            e, parent = stack.pop()
+            schema = spec.schema(e.tag())
+            self.entities.setdefault(e.tag(), []).append(e)
+            self._all.append(e)
+            self._parents[id(e)] = parent
+            self.index.add(e, schema)
+
+            children = [c for _, name in schema.children for c in getattr(e, name, None) or ()]
+            stack.extend((c, e) for c in reversed(children))
+
+    def parent(self, e):
+        ''' Returns the parent entity of e or None for a root '''
+        return self._parents[id(e)]
+
+    def ancestors(self, e):
+        ''' Yields the parent, grandparent, ... of e '''
+        e = self._parents[id(e)]
+        while e is not None:
+            yield e
+            e = self._parents[id(e)]
+
+    def _candidates(self, step):
+        ''' Returns the entities that can match step, using the index for an Id or IdRef predicate '''
+        for name, op, value in step.predicates:
+            if op != "=":
+                continue
+
+            if name == "id":
+                e = self.index.resolve(value)
+                if e is None:
+                    return []
+                return [c for c in [e] + self._duplicates.get(value, []) if step.tag in ("*", c.tag())]
+
+            tags = [step.tag] if step.tag != "*" else self.entities
+            if any(name in spec.schema(tag).references for tag in tags):
+                return self.index.referencing(value, None if step.tag == "*" else step.tag, name)
+
+        if step.tag == "*":
+            return self._all
+        return self.entities.get(step.tag, [])
+
+    def select(self, path):
+        ''' Returns an iterator over the entities matching path in document order '''
+        return self._select(compile(path))
+
+    def _select(self, steps):
+        *ancestors, last = steps
+        for e in self._candidates(last):
+            if not _matches(e, last.predicates):
+                continue
+            if ancestors and not self._match_ancestors(e, ancestors):
+                continue
+            yield e
+
+    def _match_ancestors(self, e, steps):
+        for step in reversed(steps):
+            e = self._parents[id(e)]
+            if e is None or step.tag not in ("*", e.tag()) or not _matches(e, step.predicates):
+                return False
+        return True
+
+    def first(self, path):
+        ''' Returns the first entity matching path or None '''
+        return next(self.select(path), None)
+
+    def count(self, path):
+        ''' Returns the number of entities matching path '''
+        return sum(1 for _ in self.select(path))
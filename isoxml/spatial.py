@@ -0,0 +1,161 @@
+'''
+Spatial index over the field boundaries (PFD) for assigning positions to fields
+
+The boundary polygons of the fields are registered in a sparse uniform grid: every polygon is
+added to the grid cells overlapped by its bounding box. A query looks up the cell of every position,
+filters the (position, polygon) candidates by bounding box and runs the vectorized point in polygon
+test of geometry.contains once per polygon on its remaining candidates, so the cost grows with the
+number of candidates instead of positions x fields.
+
+Typical usage example:
+
+fields = isoxml.spatial.FieldIndex(dataset.pfds)
+ids = fields.query(north, east)
+
+'''
+
+import numpy as np
+
+from . import geometry
+
+# LSG types of the rings of a polygon: exterior and interior boundary
+_RINGS = (1, 2)
+
+class FieldIndex:
+    '''
+    Index of the polygons of PFD entities
+
+    Each PLN of a PFD with one of the given types (by default 1, partfield boundary) is a polygon
+    made of its exterior and interior rings (LSG type 1 and 2), other LSG such as guidance lines are
+    ignored. Positions inside any polygon of a field belong to it; if fields overlap, the first
+    field in the order of pfds wins. cell_size is the size of the grid cells in degrees and defaults
+    to the median extent of the polygons, so each polygon typically overlaps a few cells.
+    '''
+
+    def __init__(self, pfds, types=(1,), cell_size=None):
+        self.ids = []
+        self._polygons = []
+        owners, boxes = [], []
+
+        for pfd in pfds:
+            for pln in getattr(pfd, "plns", ()):
+                if int(pln.type) not in types:
+                    continue
+                rings = [(t, ring) for t, ring in geometry.rings(pln) if t in _RINGS and len(ring) >= 3]
+                exterior = [ring.bbox() for t, ring in rings if t == 1]
+                if not exterior:
+                    continue
+
+                exterior = np.array(exterior)
+                boxes.append((*exterior[:, :2].min(axis=0), *exterior[:, 2:].max(axis=0)))
+                self._polygons.append([ring for _, ring in rings])
+                owners.append(len(self.ids))
+            self.ids.append(pfd.id)
+
+        self._owners = np.array(owners, dtype=np.intp)
+        self._boxes = np.array(boxes, dtype=float).reshape(-1, 4)
+        self._build(cell_size)
+
+    def _build(self, cell_size):
+        ''' Registers every polygon in the grid cells overlapped by its bounding box '''
+        boxes = self._boxes
+        if not len(boxes):
+            self.origin, self.cell_size, self._columns = (0.0, 0.0), 1.0, 0
+            self._keys = np.zeros(0, dtype=np.int64)
+            self._starts = np.zeros(1, dtype=np.intp)
+            self._items = np.zeros(0, dtype=np.intp)
+            return
+
+        self.origin = (boxes[:, 0].min(), boxes[:, 1].min())
+        if cell_size is None:
+            cell_size = float(np.median(np.maximum(boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1])))
+        self.cell_size = cell_size if cell_size > 0 else 1e-6
+
+        first = self._cells(boxes[:, 0], boxes[:, 1])
+        last = self._cells(boxes[:, 2], boxes[:, 3])
+        self._columns = int(last[1].max()) + 1
+
+        # enumerate the cells of every bounding box without a loop over the polygons
+        height, width = last[0] - first[0] + 1, last[1] - first[1] + 1
+        counts = height * width
+        polygon = np.repeat(np.arange(len(boxes)), counts)
+        local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        rows = first[0][polygon] + local // width[polygon]
+        columns = first[1][polygon] + local % width[polygon]
+        keys = rows * self._columns + columns
+
+        order = np.lexsort((polygon, keys))
+        self._keys, starts = np.unique(keys[order], return_index=True)
+        self._starts = np.append(starts, len(order))
+        self._items = polygon[order]
+
+    def _cells(self, north, east):
+        ''' Returns the rows and columns of the grid cells of positions '''
+        rows = np.floor((north - self.origin[0]) / self.cell_size).astype(np.int64)
+        columns = np.floor((east - self.origin[1]) / self.cell_size).astype(np.int64)
+        return rows, columns
+
+    def __len__(self):
+        return len(self._polygons)
+
+    def bbox(self):
+        ''' Returns the bounding box of all polygons as (min north, min east, max north, max east) or None '''
+        if not len(self._boxes):
+            return None
+        boxes = self._boxes
+        return (boxes[:, 0].min(), boxes[:, 1].min(), boxes[:, 2].max(), boxes[:, 3].max())
+
+    def locate(self, north, east):
+        '''
+        Returns the index in pfds of the field of every position, -1 for positions outside all fields
+
+        north and east are arrays of WGS84 degrees of the same shape.
+        '''
+        north = np.asarray(north, dtype=float)
+        east = np.asarray(east, dtype=float)
+        shape = north.shape
+        north, east = north.ravel(), east.ravel()
+        result = np.full(len(north), -1, dtype=np.intp)
+        if not len(self._keys) or not len(north):
+            return result.reshape(shape)
+
+        # grid cell of every position, positions outside the grid or NaN are skipped
+        with np.errstate(invalid="ignore"):
+            valid = np.flatnonzero(np.isfinite(north) & np.isfinite(east))
+            rows, columns = self._cells(north[valid], east[valid])
+        inside = (rows >= 0) & (columns >= 0) & (columns < self._columns)
+        valid, keys = valid[inside], rows[inside] * self._columns + columns[inside]
+
+        slot = np.searchsorted(self._keys, keys)
+        found = slot < len(self._keys)
+        found[found] = self._keys[slot[found]] == keys[found]
+        valid, slot = valid[found], slot[found]
+
+        # (position, polygon) candidates of the cells, filtered by the bounding boxes
+        counts = self._starts[slot + 1] - self._starts[slot]
+        first = np.repeat(self._starts[slot], counts)
+        offset = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        position, polygon = np.repeat(valid, counts), self._items[first + offset]
+
+        box = self._boxes[polygon]
+        y, x = north[position], east[position]
+        keep = (y >= box[:, 0]) & (x >= box[:, 1]) & (y <= box[:, 2]) & (x <= box[:, 3])
+        position, polygon = position[keep], polygon[keep]
+
+        # test the candidates of one polygon at a time, polygons in field order
+        order = np.argsort(polygon, kind="stable")
+        position, polygon = position[order], polygon[order]
+        polygons, starts = np.unique(polygon, return_index=True)
+        for i, start, stop in zip(polygons, starts, np.append(starts[1:], len(polygon))):
+            candidates = position[start:stop]
+            candidates = candidates[result[candidates] < 0]
+            if len(candidates):
+                hit = geometry.contains(self._polygons[i], north[candidates], east[candidates])
+                result[candidates[hit]] = self._owners[i]
+
+        return result.reshape(shape)
+
+    def query(self, north, east):
+        ''' Returns the id of the field of every position as an object array, None outside all fields '''
+        ids = np.array(self.ids + [None], dtype=object)
+        return ids[self.locate(north, east)]
@@ -1,27 +1,114 @@
 ''' ISOXML spec '''
 
+import decimal
+import functools
+import hashlib
+import re
+import types
+import typing
+
 from . import exception
 
 def init():
     ''' Initialize the ISOXML spec '''
-    spec = {}
-
-    for tag in tags:
-        for x in ["map", "required", "ctags"]:
-            if f"{tag}_{x}" not in globals():
-                raise exception.ISOXMLInitException(f"Missing {tag} {x} spec")
-
-        _map = globals()[f"{tag}_map"]
-        required = globals()[f"{tag}_required"]
-        ctags = globals()[f"{tag}_ctags"]
-
-        spec[tag] = {
-            "map": _map,
-            "required": required,
-            "ctags": ctags
-        }
-
-    return spec
+    return {tag: init_tag(tag) for tag in tags}
+
+@functools.lru_cache(maxsize=None)
+def fingerprint():
+    ''' Returns a hash of the spec of all tags, which changes whenever the spec is changed '''
+    return hashlib.sha256(repr(init()).encode()).hexdigest()
+
+_pattern = re.compile(r'(?<!^)(?=[A-Z])')
+
+@functools.lru_cache(maxsize=None)
+def snake_case(name):
+    ''' Converts an attribute name from CamelCase to snake_case (e.g. PfdIdRef -> pfd_id_ref) '''
+    return _pattern.sub('_', name).lower()
+
+@functools.lru_cache(maxsize=None)
+def camel_case(name):
+    ''' Converts an attribute name from snake_case to CamelCase (e.g. pfd_id_ref -> PfdIdRef) '''
+    return "".join(part[:1].upper() + part[1:] for part in name.split("_"))
+
+# attribute types of the spec and the converters decoding their string values
+converters = {
+    "int": int,
+    "enum": int,
+    "decimal": float,
+    "hex": functools.partial(int, base=16),
+}
+
+decimal_converters = dict(converters, decimal=decimal.Decimal)
+
+class Schema(typing.NamedTuple):
+    '''
+    Compiled, immutable schema of a single tag
+
+    attributes maps XML attribute names to entity attribute names, required holds the entity
+    attribute names that must be present, children pairs every child tag with the name of the list
+    holding the child entities and types maps entity attribute names to their type in the spec.
+    converters and decimal_converters map entity attribute names to the functions decoding their
+    values, the latter decoding decimals to decimal.Decimal instead of float. identifier is the
+    name of the Id attribute (None if the tag has none) and references holds the names of the
+    IdRef attributes referencing other entities.
+    '''
+    tag: str
+    attributes: typing.Mapping[str, str]
+    required: typing.FrozenSet[str]
+    ctags: typing.Tuple[str, ...]
+    children: typing.Tuple[typing.Tuple[str, str], ...]
+    types: typing.Mapping[str, str]
+    converters: typing.Mapping[str, typing.Callable[[str], typing.Any]]
+    decimal_converters: typing.Mapping[str, typing.Callable[[str], typing.Any]]
+    identifier: typing.Optional[str]
+    references: typing.Tuple[str, ...]
+
+_schemas = {}
+
+def schema(tag):
+    ''' Returns the compiled schema of tag or None if the tag is unknown
+
+    Schemas are compiled on first use and cached for the lifetime of the process.
+    '''
+    try:
+        return _schemas[tag]
+    except KeyError:
+        pass
+
+    if tag not in tags:
+        return None
+
+    definition = init_tag(tag)
+    attributes = {k: snake_case(v) for k, v in definition["map"].items()}
+    ctags = tuple(definition["ctags"])
+    _types = {snake_case(k): v for k, v in definition["types"].items()}
+
+    _schemas[tag] = Schema(
+        tag=tag,
+        attributes=types.MappingProxyType(attributes),
+        required=frozenset(snake_case(k) for k in definition["required"]),
+        ctags=ctags,
+        children=tuple((t, t.lower() + 's') for t in ctags),
+        types=types.MappingProxyType(_types),
+        converters=types.MappingProxyType({k: converters[v] for k, v in _types.items()}),
+        decimal_converters=types.MappingProxyType({k: decimal_converters[v] for k, v in _types.items()}),
+        identifier="id" if "Id" in definition["map"].values() else None,
+        references=tuple(snake_case(v) for v in definition["map"].values() if "IdRef" in v),
+    )
+    return _schemas[tag]
+
+def init_tag(tag):
+    ''' Returns the spec of a single tag as a dict of map, required, ctags and types '''
+    for x in ["map", "required", "ctags", "types"]:
+        if f"{tag}_{x}" not in globals():
+            raise exception.ISOXMLInitException(f"Missing {tag} {x} spec")
+
+    return {
+        "map": globals()[f"{tag}_map"],
+        "required": globals()[f"{tag}_required"],
+        "ctags": globals()[f"{tag}_ctags"],
+        "types": globals()[f"{tag}_types"],
+    }
 
 tags = [
     "AFE", "ASP", "BSN", "CAN", "CAT", "CCG", "CCL", "CCT", "CLD", "CNN",
@@ -44,6 +131,7 @@ ISO11783_TaskData_ctags = [
     "AFE", "BSN", "CCT", "CCG", "CLD", "CTP", "CPC", "CTR", "DVC", "FRM",
     "OTQ", "PFD", "PDT", "PGP", "TSK", "TCC", "VPN", "WKR", "XFR"
 ]
+ISO11783_TaskData_types = {"VersionMajor": "enum", "VersionMinor": "enum"}
 
 ISO11783_LinkedList_required = [
     "VersionMajor",
@@ -63,6 +151,7 @@ ISO11783_LinkedList_map = {
     "DataTransferOrigin": "DataTransferOrigin",
 }
 ISO11783_LinkedList_ctags = ["LGP"]
+ISO11783_LinkedList_types = {"VersionMajor": "enum", "VersionMinor": "enum"}
 
 AFE_required = ["FilenameWithExtension", "Preserve", "ManufacturerGLN", "FileType"]
 AFE_map = {
@@ -74,14 +163,17 @@ AFE_map = {
     "F": "FileLength"
 }
 AFE_ctags = []
+AFE_types = {"FileLength": "int"}
 
 ASP_required = ["Start", "Type"]
 ASP_map = {"A": "Start", "B": "Stop", "C": "Duration", "D": "Type"}
 ASP_ctags = ["PTN"]
+ASP_types = {"Duration": "int", "Type": "enum"}
 
 BSN_required = ["Id", "Designator", "North", "East", "Up"]
 BSN_map = {"A": "Id", "B": "Designator", "C": "North", "D": "East", "E": "Up"}
 BSN_ctags = []
+BSN_types = {"North": "decimal", "East": "decimal", "Up": "int"}
 
 CAN_required = []
 CAN_map = {
@@ -90,10 +182,11 @@ CAN_map = {
     "C": "FreeCommentText",
 }
 CAN_ctags = ["ASP"]
+CAN_types = {}
 
 CAT_required = ["SourceClientName", "UserClientName", "SourceDeviceStructureLabal",
                 "UserDeviceStructureLabel", "SourceDeviceElementNumber", "UserDeviceElementNumber",
-                "ProcessDataDDI"]
+                "ProcessDataDdi"]
 CAT_map = {
     "A": "SourceClientName",
     "B": "UserClientName",
@@ -104,6 +197,11 @@ CAT_map = {
     "G": "ProcessDataDdi"
 }
 CAT_ctags = []
+CAT_types = {
+    "SourceDeviceElementNumber": "int",
+    "UserDeviceElementNumber": "int",
+    "ProcessDataDdi": "hex",
+}
 
 CCG_required = ["Id", "Designator"]
 CCG_map = {
@@ -111,6 +209,7 @@ CCG_map = {
     "B": "Designator",
 }
 CCG_ctags = []
+CCG_types = {}
 
 CCL_required = ["Id", "Designator",]
 CCL_map = {
@@ -118,10 +217,12 @@ CCL_map = {
     "B": "Designator",
 }
 CCL_ctags = []
+CCL_types = {}
 
 CCT_required = ["Id", "Designator", "Scope"]
 CCT_map = {"A": "Id", "B": "Designator", "C": "Scope", "D": "CCGIdRef"}
 CCT_ctags = ["CCL"]
+CCT_types = {"Scope": "enum"}
 
 CLD_required = ["Id", ]
 CLD_map = {
@@ -129,6 +230,7 @@ CLD_map = {
     "B": "DefaultColor",
 }
 CLD_ctags = ["CRG"]
+CLD_types = {"DefaultColor": "int"}
 
 CNN_required = [
     "DeviceIdRef_0",
@@ -143,6 +245,7 @@ CNN_map = {
     "D": "DeviceElementIdRef_1",
 }
 CNN_ctags = []
+CNN_types = {}
 
 CRG_required = [ "MinimumValue", "MaximumValue", "Color", ]
 CRG_map = {
@@ -151,14 +254,17 @@ CRG_map = {
     "C": "Color",
 }
 CRG_ctags = []
+CRG_types = {"MinimumValue": "int", "MaximumValue": "int", "Color": "int"}
 
 CPC_required = ["Id", "Designator"]
 CPC_map = {"A": "Id", "B": "Designator"}
 CPC_ctags = ["OTR"]
+CPC_types = {}
 
 CTP_required = ["Id", "Designator"]
 CTP_map = {"A": "Id", "B": "Designator", "C": "PGPIdRef"}
 CTP_ctags = ["CVT"]
+CTP_types = {}
 
 CTR_required = ["Id", "LastName"]
 CTR_map = {
@@ -177,14 +283,17 @@ CTR_map = {
     "M": "Email"
 }
 CTR_ctags = []
+CTR_types = {}
 
 CVT_required = ["Id", "Designator"]
 CVT_map = {"A": "Id", "B": "Designator", "C": "PDTIdRef"}
 CVT_ctags = []
+CVT_types = {}
 
 DAN_required = ["ClientNameValue"]
 DAN_map = {"A": "ClientNameValue", "B": "ClientNameMask", "C": "DvcIdRef"}
 DAN_ctags = ["ASP"]
+DAN_types = {}
 
 DET_required = ["Id", "ObjectId", "Type", "Number", "ParentObjectId"]
 DET_map = {
@@ -196,6 +305,7 @@ DET_map = {
     "F": "ParentObjectId",
 }
 DET_ctags = ["DOR"]
+DET_types = {"ObjectId": "int", "Type": "enum", "Number": "int", "ParentObjectId": "int"}
 
 DLT_required = ["Ddi", "Method"]
 DLT_map = {
@@ -213,6 +323,18 @@ DLT_map = {
     "L": "PgnStopBit",
 }
 DLT_ctags = []
+DLT_types = {
+    "Ddi": "hex",
+    "Method": "int",
+    "DistanceInterval": "int",
+    "TimeInterval": "int",
+    "ThresholdMinimum": "int",
+    "ThresholdMaximum": "int",
+    "ThresholdChange": "int",
+    "Pgn": "int",
+    "PgnStartBit": "int",
+    "PgnStopBit": "int",
+}
 
 DLV_required = ["Ddi", "Value", "DetIdRef"]
 DLV_map = {
@@ -224,10 +346,18 @@ DLV_map = {
     "F": "DataLogPgnStopBit",
 }
 DLV_ctags = []
+DLV_types = {
+    "Ddi": "hex",
+    "Value": "int",
+    "DataLogPgn": "int",
+    "DataLogPgnStartBit": "int",
+    "DataLogPgnStopBit": "int",
+}
 
-DOR_required = ["Id"]
-DOR_map = {"A": "Id",}
+DOR_required = ["DeviceObjectId"]
+DOR_map = {"A": "DeviceObjectId",}
 DOR_ctags = []
+DOR_types = {"DeviceObjectId": "int"}
 
 DPD_required = ["ObjectId", "Ddi", "Property", "TriggerMethods"]
 DPD_map = {
@@ -239,6 +369,13 @@ DPD_map = {
     "F": "DvpObjectId",
 }
 DPD_ctags = []
+DPD_types = {
+    "ObjectId": "int",
+    "Ddi": "hex",
+    "Property": "int",
+    "TriggerMethods": "int",
+    "DvpObjectId": "int",
+}
 
 DPT_required = ["ObjectId", "Ddi", "Value"]
 DPT_map = {
@@ -249,6 +386,7 @@ DPT_map = {
     "E": "DvpObjectId",
 }
 DPT_ctags = []
+DPT_types = {"ObjectId": "int", "Ddi": "hex", "Value": "int", "DvpObjectId": "int"}
 
 DVC_required = ["Id", "ClientName", "StructureLabel", "LocalizationLabel"]
 DVC_map = {
@@ -261,6 +399,7 @@ DVC_map = {
     "G": "LocalizationLabel",
 }
 DVC_ctags = ["DET", "DPD", "DPT", "DVP"]
+DVC_types = {}
 
 DVP_required = ["ObjectId", "Offset", "Scale", "NumberOfDecimals", "UnitDesignator"]
 DVP_map = {
@@ -271,6 +410,7 @@ DVP_map = {
     "E": "UnitDesignator",
 }
 DVP_ctags = []
+DVP_types = {"ObjectId": "int", "Offset": "int", "Scale": "decimal", "NumberOfDecimals": "int"}
 
 FRM_required = ["Id", "Designator"]
 FRM_map = {
@@ -285,10 +425,12 @@ FRM_map = {
     "I": "CustomerIdRef"
 }
 FRM_ctags = []
+FRM_types = {}
 
 GAN_required = ["GgnIdRef"]
 GAN_map = { "A": "GgnIdRef" }
 GAN_ctags = ["ASP", "GST"]
+GAN_types = {}
 
 GGP_required = ["Id"]
 GGP_map = {
@@ -296,6 +438,7 @@ GGP_map = {
     "B": "Designator",
 }
 GGP_ctags = ["GPN", "PLN"]
+GGP_types = {}
 
 GPN_required = ["Id", "Type"]
 GPN_map = {
@@ -316,6 +459,19 @@ GPN_map = {
     "O": "NumberOfSwathsRight",
 }
 GPN_ctags = ["LSG", "PLN"]
+GPN_types = {
+    "Type": "enum",
+    "Options": "enum",
+    "PropagationDirection": "enum",
+    "Extension": "enum",
+    "Heading": "decimal",
+    "Radius": "int",
+    "GnssMethod": "enum",
+    "HorizontalAccuracy": "decimal",
+    "VerticalAccuracy": "decimal",
+    "NumberOfSwathsLeft": "int",
+    "NumberOfSwathsRight": "int",
+}
 
 GRD_required = [
     "MinimumNorthPosition",
@@ -340,6 +496,17 @@ GRD_map = {
     "J": "TreatmentZoneCode",
 }
 GRD_ctags = []
+GRD_types = {
+    "MinimumNorthPosition": "decimal",
+    "MinimumEastPosition": "decimal",
+    "CellNorthSize": "decimal",
+    "CellEastSize": "decimal",
+    "MaximumColumn": "int",
+    "MaximumRow": "int",
+    "FileLength": "int",
+    "GridType": "enum",
+    "TreatmentZoneCode": "int",
+}
 
 GST_required = []
 GST_map = {
@@ -350,6 +517,7 @@ GST_map = {
     "E": "PropagationOffset",
 }
 GST_ctags = [ "ASP" ]
+GST_types = {"East": "int", "North": "int", "PropagationOffset": "int"}
 
 LGP_required = ["Id", "Type"]
 LGP_map = {
@@ -360,6 +528,7 @@ LGP_map = {
     "E": "Designator",
 }
 LGP_ctags = ["LNK"]
+LGP_types = {"Type": "enum"}
 
 LNK_required = ["ObjectIdRef", "Value"]
 LNK_map = {
@@ -368,6 +537,7 @@ LNK_map = {
     "C": "Designator",
 }
 LNK_ctags = []
+LNK_types = {}
 
 LSG_required = ["Type"]
 LSG_map = {
@@ -379,18 +549,22 @@ LSG_map = {
     "F": "Id",
 }
 LSG_ctags = ["PNT"]
+LSG_types = {"Type": "enum", "Width": "int", "Length": "int", "Color": "int"}
 
 OTP_required = ["CpcIdRef"]
 OTP_map = { "A": "CpcIdRef", "B": "OtqIdRef", }
 OTP_ctags = []
+OTP_types = {}
 
 OTQ_required = ["Id", "Designator"]
 OTQ_map = { "A": "Id", "B": "Designator", }
 OTQ_ctags = []
+OTQ_types = {}
 
 OTR_required = ["OtqIdRef"]
 OTR_map = { "A": "OtqIdRef" }
 OTR_ctags = []
+OTR_types = {}
 
 PAN_required = ["PdtIdRef"]
 PAN_map = {
@@ -403,6 +577,7 @@ PAN_map = {
     "G": "ProduyctSubTypeIdRef",
 }
 PAN_ctags = ["ASP"]
+PAN_types = {"QuantityDdi": "hex", "QuantityValue": "int", "TransferMode": "enum"}
 
 PDT_required = ["Id", "Designator"]
 PDT_map = {
@@ -418,6 +593,14 @@ PDT_map = {
     "J": "DensityVolumePerCount",
 }
 PDT_ctags = ["PRN"]
+PDT_types = {
+    "QuanityDdi": "hex",
+    "Type": "enum",
+    "MixtureRecipeQuantity": "int",
+    "DensityMassPerVolume": "int",
+    "DensityMassPerCount": "int",
+    "DensityVolumePerCount": "int",
+}
 
 PDV_required = ["Ddi", "Value"]
 PDV_map = {
@@ -429,7 +612,8 @@ PDV_map = {
     "F": "ActualCpcIdRef",
     "G": "ElementTypeInstanceValue",
 }
-PDV_ctags = ["PDV"]
+PDV_ctags = []
+PDV_types = {"Ddi": "hex", "Value": "int", "ElementTypeInstanceValue": "int"}
 
 PFD_required = ["Id", "Designator", "Area"]
 PFD_map = {
@@ -444,6 +628,7 @@ PFD_map = {
     "I": "FieldIdRef",
 }
 PFD_ctags = ["PLN", "LSG", "PNT", "GGP"]
+PFD_types = {"Area": "int"}
 
 PGP_required = ["Id", "Designator"]
 PGP_map = {
@@ -452,6 +637,7 @@ PGP_map = {
     "C": "Type",
 }
 PGP_ctags = []
+PGP_types = {"Type": "enum"}
 
 PLN_required = ["Type"]
 PLN_map = {
@@ -462,6 +648,7 @@ PLN_map = {
     "E": "Id",
 }
 PLN_ctags = ["LSG"]
+PLN_types = {"Type": "enum", "Area": "int", "Color": "int"}
 
 PNT_required = ["Type", "North", "East" ]
 PNT_map = {
@@ -478,6 +665,16 @@ PNT_map = {
     "K": "FileLength",
 }
 PNT_ctags = []
+PNT_types = {
+    "Type": "enum",
+    "North": "decimal",
+    "East": "decimal",
+    "Up": "int",
+    "Color": "int",
+    "HorizontalAccuracy": "decimal",
+    "VerticalAccuracy": "decimal",
+    "FileLength": "int",
+}
 
 PRN_required = ["PdtIdRef", "QuantityValue"]
 PRN_map = {
@@ -485,6 +682,7 @@ PRN_map = {
     "B": "QuantityValue",
 }
 PRN_ctags = []
+PRN_types = {"QuantityValue": "int"}
 
 PTN_required = ["North", "East", "Status"]
 PTN_map = {
@@ -500,6 +698,17 @@ PTN_map = {
 }
 
 PTN_ctags = []
+PTN_types = {
+    "North": "decimal",
+    "East": "decimal",
+    "Up": "int",
+    "Status": "enum",
+    "Pdop": "decimal",
+    "Hdop": "decimal",
+    "NumberOfSatellites": "int",
+    "GpsUtcTime": "int",
+    "GpsUtcDate": "int",
+}
 
 TCC_required = [
     "FunctionName",
@@ -520,6 +729,13 @@ TCC_map = {
     "G": "NumberOfControlChannels",
 }
 TCC_ctags = []
+TCC_types = {
+    "VersionNumber": "int",
+    "ProvidedCapabilities": "int",
+    "NumberOfBoomsSectionControl": "int",
+    "NumberOfSectionsSectionControl": "int",
+    "NumberOfControlChannels": "int",
+}
 
 TIM_required = ["Start", "Type"]
 TIM_map = {
@@ -529,6 +745,7 @@ TIM_map = {
     "D": "Type",   
 }
 TIM_ctags = ["PTN", "DLV"]
+TIM_types = {"Duration": "int", "Type": "enum"}
 
 TLG_required = ["FileName", "Type"]
 TLG_map = {
@@ -537,6 +754,7 @@ TLG_map = {
     "C": "Type",
 }
 TLG_ctags = []
+TLG_types = {"FileLength": "int", "Type": "enum"}
 
 TSK_required = ["Id", "Status"]
 TSK_map = {
@@ -555,6 +773,12 @@ TSK_ctags = [
     "TZN", "TIM", "OTP", "WAN", "DAN", "CNN",
     "PAN", "DLT", "CAN", "TLG", "GRD", "CAT", "GAN"
 ]
+TSK_types = {
+    "Status": "enum",
+    "DefaultTreatmentZoneCode": "int",
+    "PositionLostTreatmentZoneCode": "int",
+    "OutOfFieldTreatmentZoneCode": "int",
+}
 
 TZN_required = ["Code"]
 TZN_map = {
@@ -562,7 +786,8 @@ TZN_map = {
     "B": "Designator",
     "C": "Color",
 }
-TZN_ctags = ["PLN", "PDT"]
+TZN_ctags = ["PLN", "PDV"]
+TZN_types = {"Code": "int", "Color": "int"}
 
 VPN_required = ["Id", "Offset", "Scale", "NumberOfDecimals"]
 VPN_map = {
@@ -574,10 +799,12 @@ VPN_map = {
     "F": "CldIdRef",
 }
 VPN_ctags = []
+VPN_types = {"Offset": "int", "Scale": "decimal", "NumberOfDecimals": "int"}
 
 WAN_required = ["WkrIdRef"]
 WAN_map = { "A": "WkrIdRef" }
 WAN_ctags = ["ASP"]
+WAN_types = {}
 
 WKR_required = ["Id", "LastName"]
 WKR_map = {
@@ -596,6 +823,7 @@ WKR_map = {
     "M": "Email"
 }
 WKR_ctags = []
+WKR_types = {}
 
 XFC_required = []
 XFC_map = {}
@@ -603,6 +831,7 @@ XFC_ctags = [
     "BSN", "CCT", "CCG", "CLD", "CTP", "CPC", "CTR", "DVC", "FRM",
     "OTQ", "PFD", "PDT", "PGP", "TSK", "VPN", "WKR"
 ]
+XFC_types = {}
 
 XFR_required = ["FileName", "Type"]
 XFR_map  = {
@@ -610,3 +839,4 @@ XFR_map  = {
     "B": "Type",
 }
 XFR_ctags = []
+XFR_types = {"Type": "enum"}
@@ -0,0 +1,253 @@
+'''
+Parse instrumentation: per-tag counts and timings, bytes read and peak memory
+
+Instrumentation is enabled by passing a Stats instance as the stats parse option (see
+entity.Options). The parsers check the option once per document and then use the instrumented
+code paths of this module, so parsing without stats is not slowed down at all.
+
+Typical usage example:
+
+stats = isoxml.stats.Stats(memory=True, callback=export)
+taskdata = isoxml.entity.fromstring(data, stats=stats)
+print(stats.report())
+
+'''
+
+import contextlib
+import os
+import time
+import tracemalloc
+import xml.etree.ElementTree
+
+from . import builder
+from . import entity
+from . import exception
+from . import spec
+
+class Stats:
+    '''
+    Statistics of the documents parsed with this instance as the stats option
+
+    counts maps every tag to the number of parsed entities, seconds maps every tag to the time
+    spent building its entities, excluding their children. elapsed is the total time spent
+    parsing, including tokenizing the XML, documents the number of parsed documents and bytes_read
+    their total size. If memory is set, peak_memory is the highest peak of memory allocated while
+    parsing a document as traced by tracemalloc, which is started for the duration of the parse if
+    it is not tracing already. cache_hits is the number of those documents that were loaded from
+    a cache.Cache instead of being parsed. callback is called with this instance after every
+    document.
+
+    Entities of deferred child lists (see Options.lazy) and entities parsed in other processes are
+    not counted.
+    '''
+
+    def __init__(self, memory=False, callback=None):
+        self.memory = memory
+        self.callback = callback
+        self.counts = {}
+        self.seconds = {}
+        self.elapsed = 0.0
+        self.documents = 0
+        self.bytes_read = 0
+        self.cache_hits = 0
+        self.peak_memory = None
+
+    def _add(self, tag, seconds):
+        self.counts[tag] = self.counts.get(tag, 0) + 1
+        self.seconds[tag] = self.seconds.get(tag, 0.0) + seconds
+
+    def merge(self, other):
+        ''' Adds the statistics of another instance, e.g. of another thread '''
+        for tag, count in other.counts.items():
+            self.counts[tag] = self.counts.get(tag, 0) + count
+            self.seconds[tag] = self.seconds.get(tag, 0.0) + other.seconds[tag]
+        self.elapsed += other.elapsed
+        self.documents += other.documents
+        self.bytes_read += other.bytes_read
+        self.cache_hits += other.cache_hits
+        if other.peak_memory is not None:
+            self.peak_memory = max(self.peak_memory or 0, other.peak_memory)
+
+    def as_dict(self):
+        ''' Returns the statistics as a dict, e.g. for exporting them as JSON '''
+        return {
+            "documents": self.documents,
+            "bytes_read": self.bytes_read,
+            "cache_hits": self.cache_hits,
+            "elapsed": self.elapsed,
+            "peak_memory": self.peak_memory,
+            "tags": {tag: {"count": self.counts[tag], "seconds": self.seconds[tag]} for tag in self.counts},
+        }
+
+    def report(self):
+        ''' Returns a table of the tags sorted by time '''
+        lines = [
+            f"{self.documents} documents, {self.bytes_read / 1e6:.1f} MB in {self.elapsed:.3f} s"
+            + (f", peak memory {self.peak_memory / 1e6:.1f} MB" if self.peak_memory is not None else "")
+        ]
+        for tag in sorted(self.seconds, key=self.seconds.get, reverse=True):
+            lines.append(f"{tag:20} {self.counts[tag]:10} {self.seconds[tag]:10.3f} s")
+        return "\n".join(lines)
+
+    @contextlib.contextmanager
+    def document(self, size=None):
+        '''
+        Measures the parse of a document of size bytes
+
+        Yields a list, a size that is only known after parsing (e.g. of a file object) can be
+        appended to it.
+        '''
+        sizes = [] if size is None else [size]
+        tracing = False
+        if self.memory:
+            tracing = not tracemalloc.is_tracing()
+            if tracing:
+                tracemalloc.start()
+            elif hasattr(tracemalloc, "reset_peak"):
+                tracemalloc.reset_peak()
+
+        start = time.perf_counter()
+        try:
+            yield sizes
+        except BaseException:
+            if tracing:
+                tracemalloc.stop()
+            raise
+
+        elapsed = time.perf_counter() - start
+        peak = None
+        if self.memory:
+            _, peak = tracemalloc.get_traced_memory()
+            if tracing:
+                tracemalloc.stop()
+        self._finish(elapsed, sum(sizes), peak)
+
+    def record_hit(self, data, elapsed):
+        ''' Records the document data that was loaded from a cache.Cache in elapsed seconds '''
+        self.cache_hits += 1
+        self._finish(elapsed, _length(data), None)
+
+    def _finish(self, elapsed, size, peak):
+        self.elapsed += elapsed
+        self.documents += 1
+        self.bytes_read += size
+        if peak is not None:
+            self.peak_memory = max(self.peak_memory or 0, peak)
+        if self.callback is not None:
+            self.callback(self)
+
+def _options(options):
+    ''' Returns the options parsing a single entity without its children '''
+    if options.lazy:
+        raise exception.ISOXMLException("The stats option cannot be combined with lazy parsing")
+    return options._replace(include=(), index=None, stats=None)
+
+def _children(e, element, options, single, start):
+    ''' Builds the child entities of e from element and records the time of e since start '''
+    stats = options.stats
+    schema = spec.schema(e.tag())
+
+    lists = []
+    if not (options.columnar and e.tag() == "LSG"):
+        for child_tag, name in schema.children:
+            if entity._selected(child_tag, options):
+                children = element.findall(child_tag)
+                if children:
+                    lists.append((name, children))
+    stats._add(e.tag(), time.perf_counter() - start)
+
+    for name, children in lists:
+        setattr(e, name, [build(c, options, single) for c in children])
+
+    if options.index is not None:
+        options.index.add(e, schema)
+    return e
+
+def build(element, options, single=None):
+    ''' Builds the entity of element and its children, like entity.Entity.from_element '''
+    if single is None:
+        single = _options(options)
+    start = time.perf_counter()
+    e = entity.Entity._from_element(element, single)
+    return _children(e, element, options, single, start)
+
+def init(e, data, options):
+    ''' Parses data into the entity e, like entity.Entity(data) '''
+    single = _options(options)
+    with options.stats.document(_length(data)):
+        e.element = element = xml.etree.ElementTree.fromstring(data)
+        e._tag = element.tag
+        start = time.perf_counter()
+        e.parse(single)
+        _children(e, element, options, single, start)
+
+def from_element(element, options):
+    ''' Parses an element, like entity.Entity.from_element '''
+    single = _options(options)
+    with options.stats.document():
+        return build(element, options, single)
+
+def fromstring(data, options):
+    ''' Parses a document, like entity.fromstring '''
+    single = _options(options)
+    with options.stats.document(_length(data)):
+        return build(xml.etree.ElementTree.fromstring(data), options, single)
+
+def _length(data):
+    ''' Returns the number of bytes of data, a string is counted in UTF-8 '''
+    if isinstance(data, str):
+        return len(data.encode())
+    return len(data)
+
+def _size(source):
+    ''' Returns the number of bytes read from a file name or file object after parsing it '''
+    if hasattr(source, "tell"):
+        return source.tell()
+    return os.path.getsize(source)
+
+def iterparse(source, tags, options):
+    '''
+    Incrementally parses a document, like entity.iterparse
+
+    Only the time spent in the generator is measured, not that of the caller processing the
+    entities, and the peak memory is not measured.
+    '''
+    stats = options.stats
+    single = _options(options)
+    elapsed = 0.0
+    start = time.perf_counter()
+    for e in entity._iterparse(source, tags, options, lambda element, options: build(element, options, single)):
+        elapsed += time.perf_counter() - start
+        yield e
+        start = time.perf_counter()
+
+    elapsed += time.perf_counter() - start
+    stats._finish(elapsed, _size(source), None)
+
+class _Builder(builder.Builder):
+    ''' Builder recording the time spent in the start and end events of every entity '''
+
+    def __init__(self, options):
+        super().__init__(options._replace(stats=None))
+        self.stats = options.stats
+
+    def start(self, tag, attrib):
+        start = time.perf_counter()
+        depth = len(self._stack)
+        super().start(tag, attrib)
+        if len(self._stack) > depth:
+            self.stats._add(tag, time.perf_counter() - start)
+
+    def end(self, tag):
+        start = time.perf_counter()
+        depth = len(self._stack)
+        super().end(tag)
+        if len(self._stack) < depth:
+            self.stats.seconds[tag] += time.perf_counter() - start
+
+def parse_expat(source, options):
+    ''' Parses a string, bytes or binary file object with the expat backend, like builder.parse '''
+    with options.stats.document() as sizes:
+        root = builder.run(_Builder(options), source)
+        sizes.append(_size(source) if hasattr(source, "read") else _length(source))
+    return root
@@ -0,0 +1,396 @@
+'''
+Reader for binary TimeLog files (TLG)
+
+A TLG entity references two files: TLGxxxxx.XML, a header holding a TIM template with PTN and DLV
+children, and TLGxxxxx.BIN with the logged records. Attributes that are present but empty in the
+header are stored in every binary record, attributes with a value are constant for the whole log.
+Each binary record holds the time, the position fields of the template and a variable number of
+(DLV index, value) pairs, so records are variable-length.
+
+The binary file is memory-mapped and decoded in chunks into NumPy structured arrays, so logs far
+larger than RAM can be processed chunk by chunk. A sparse TimeIndex of the byte offset and time
+range of every block of records lets reads of a record or time range seek straight to the first
+block they need instead of scanning the file from its start. It is built on the first scan and can
+be kept in a sidecar file next to the BIN file (see open) or in a cache.Cache.
+'''
+
+import array
+import builtins
+import mmap
+import os
+import struct
+import typing
+import xml.etree.ElementTree
+
+import numpy as np
+
+from . import exception
+
+# TLG dates are days since 1980-01-01
+EPOCH = np.datetime64("1980-01-01", "ms")
+
+# PTN attribute -> (field name, binary type, decoded type, scale)
+_ptn = {
+    "A": ("north", "<i4", "f8", 1e-7),
+    "B": ("east", "<i4", "f8", 1e-7),
+    "C": ("up", "<i4", "i4", None),
+    "D": ("status", "u1", "u1", None),
+    "E": ("pdop", "<u2", "f8", 0.1),
+    "F": ("hdop", "<u2", "f8", 0.1),
+    "G": ("number_of_satellites", "u1", "u1", None),
+    "H": ("gps_utc_time", "<u4", "u4", None),
+    "I": ("gps_utc_date", "<u2", "u2", None),
+}
+
+class Field(typing.NamedTuple):
+    ''' A fixed-size field of the binary records '''
+    name: str
+    offset: int
+    binary: np.dtype
+    dtype: np.dtype
+    scale: typing.Optional[float]
+
+class Header(typing.NamedTuple):
+    '''
+    Parsed TLG header
+
+    fields are the position fields stored in every record after the time, size is the number of
+    bytes of a record up to the DLV count, dlvs holds (DDI, DET id) of every logged DLV in header
+    order and constants holds the header values that are not part of the binary records.
+    '''
+    fields: typing.Tuple[Field, ...]
+    size: int
+    dlvs: typing.Tuple[typing.Tuple[int, str], ...]
+    constants: typing.Mapping[str, str]
+
+def parse_header(data):
+    ''' Parses a TLG header from a string or an xml.etree element '''
+    tim = xml.etree.ElementTree.fromstring(data) if isinstance(data, (str, bytes)) else data
+    if tim.tag != "TIM":
+        raise exception.ISOXMLParseException(f"Unexpected tag {tim.tag} in TLG header, expected TIM")
+    if tim.get("A") != "":
+        raise exception.ISOXMLParseException("TLG header does not log the start time (TIM A)")
+
+    # time of day in ms and days since 1980-01-01
+    fields = [
+        Field("time", 0, np.dtype("<u4"), np.dtype("u4"), None),
+        Field("date", 4, np.dtype("<u2"), np.dtype("u2"), None),
+    ]
+    offset = 6
+    constants = {k: v for k, v in tim.attrib.items() if v}
+
+    ptn = tim.find("PTN")
+    if ptn is not None:
+        for attribute, (name, binary, dtype, scale) in _ptn.items():
+            value = ptn.get(attribute)
+            if value == "":
+                fields.append(Field(name, offset, np.dtype(binary), np.dtype(dtype), scale))
+                offset += np.dtype(binary).itemsize
+            elif value is not None:
+                constants[name] = value
+
+    dlvs = []
+    for dlv in tim.findall("DLV"):
+        try:
+            dlvs.append((int(dlv.attrib["A"], 16), dlv.get("C")))
+        except (KeyError, ValueError) as e:
+            raise exception.ISOXMLParseException("Invalid DLV DDI in TLG header") from e
+
+    if len(dlvs) > 255:
+        raise exception.ISOXMLParseException("TLG header has more than 255 DLV")
+
+    return Header(tuple(fields), offset, tuple(dlvs), constants)
+
+# number of records per block of the time index
+STRIDE = 4096
+
+INDEX_SUFFIX = ".IDX"
+_INDEX_MAGIC = b"ISOXMLT1"
+# magic, stride, number of records, size of the binary file and number of blocks
+_INDEX_HEADER = struct.Struct("<8sQQQQ")
+
+class TimeIndex(typing.NamedTuple):
+    '''
+    Sparse index of the records of a TLG, one entry per block of stride records
+
+    offsets holds the byte offset of the first record of every block, start its time and minimum and
+    maximum the time range of the records of the block, as ms since the epoch. count is the number
+    of records and size the size of the binary file the index was built for.
+    '''
+    stride: int
+    count: int
+    size: int
+    offsets: np.ndarray
+    start: np.ndarray
+    minimum: np.ndarray
+    maximum: np.ndarray
+
+def write_index(index, file):
+    ''' Writes a TimeIndex to a binary file or a file path '''
+    if isinstance(file, (str, os.PathLike)):
+        with builtins.open(file, "wb") as f:
+            write_index(index, f)
+        return
+
+    file.write(_INDEX_HEADER.pack(_INDEX_MAGIC, index.stride, index.count, index.size, len(index.offsets)))
+    for column in index[3:]:
+        file.write(np.ascontiguousarray(column, dtype="<i8").tobytes())
+
+def read_index(file):
+    ''' Reads a TimeIndex written by write_index from a binary file or a file path '''
+    if isinstance(file, (str, os.PathLike)):
+        with builtins.open(file, "rb") as f:
+            return read_index(f)
+
+    try:
+        magic, stride, count, size, blocks = _INDEX_HEADER.unpack(file.read(_INDEX_HEADER.size))
+    except struct.error as e:
+        raise exception.ISOXMLParseException("Truncated TLG index") from e
+    if magic != _INDEX_MAGIC:
+        raise exception.ISOXMLParseException("Not a TLG index")
+
+    data = file.read(4 * 8 * blocks)
+    if len(data) != 4 * 8 * blocks:
+        raise exception.ISOXMLParseException("Truncated TLG index")
+    columns = np.frombuffer(data, dtype="<i8").reshape(4, blocks).astype(np.int64)
+    return TimeIndex(stride, count, size, *columns)
+
+def _milliseconds(time):
+    ''' Returns a datetime64, ISO 8601 string or datetime as ms since the epoch '''
+    return int(np.datetime64(time, "ms").astype(np.int64))
+
+class TimeLog:
+    '''
+    Decodes the binary records of a TLG
+
+    header is the header XML (string or element) or a parsed Header, data is a bytes-like object
+    holding the binary records, e.g. a memory map of the BIN file (see open). index is a TimeIndex
+    of data, e.g. read from a sidecar file, and is otherwise built by build_index when needed.
+
+    Decoded records are NumPy structured arrays with a datetime64 time column, the position fields
+    of the header (north/east in degrees, pdop/hdop scaled, other fields as logged) and the values
+    (int32) and present (bool) columns with one entry per DLV of the header. present is the DLV
+    presence mask of the record, values of DLV that are not present are 0.
+    '''
+
+    def __init__(self, header, data, index=None):
+        self.header = header if isinstance(header, Header) else parse_header(header)
+        self.data = data
+        self._buffer = np.frombuffer(data, dtype=np.uint8)
+        self._offsets = None
+        if index is not None and index.size != len(self._buffer):
+            raise exception.ISOXMLException(f"TLG index of {index.size} bytes does not match the data")
+        self.index = index
+
+        n = len(self.header.dlvs)
+        self.dtype = np.dtype(
+            [("time", "datetime64[ms]")]
+            + [(f.name, f.dtype) for f in self.header.fields[2:]]
+            + [("values", "<i4", (n,)), ("present", "?", (n,))]
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        ''' Releases the buffer and closes the memory map if there is one '''
+        self._buffer = None
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+    def __len__(self):
+        if self._offsets is None and self.index is not None:
+            return self.index.count
+        return len(self.offsets())
+
+    def offsets(self):
+        ''' Returns the byte offsets of all records, scanning the whole file on first use '''
+        if self._offsets is None:
+            self._offsets = self._scan(0, len(self._buffer))
+        return self._offsets
+
+    def _scan(self, position, limit):
+        ''' Returns the byte offsets of at most limit records starting at position '''
+        data, size, end = self.data, self.header.size, len(self._buffer)
+        offsets = array.array("q")
+        while position < end and len(offsets) < limit:
+            offsets.append(position)
+            if position + size >= end:
+                raise exception.ISOXMLParseException(f"Truncated TLG record at byte {position}")
+            position += size + 1 + 5 * data[position + size]
+
+        if position > end:
+            raise exception.ISOXMLParseException(f"Truncated TLG record at byte {offsets[-1]}")
+
+        return np.frombuffer(offsets, dtype=np.int64)
+
+    def _next(self, offset):
+        ''' Returns the offset of the record following the record at offset '''
+        return int(offset) + self.header.size + 1 + 5 * int(self._buffer[offset + self.header.size])
+
+    def _times(self, offsets):
+        ''' Returns the times of the records at offsets as ms since the epoch '''
+        ms = self._gather(offsets, np.dtype("<u4")).astype(np.int64)
+        days = self._gather(offsets + 4, np.dtype("<u2")).astype(np.int64)
+        return int(EPOCH.astype(np.int64)) + days * 86400000 + ms
+
+    def build_index(self, stride=STRIDE):
+        '''
+        Builds the TimeIndex of the records and keeps it as index
+
+        Uses the offsets of all records if they were scanned already, otherwise the file is scanned
+        one block at a time without keeping the offsets of every record.
+        '''
+        blocks = []
+        if self._offsets is not None:
+            for start in range(0, len(self._offsets), stride):
+                blocks.append(self._offsets[start:start + stride])
+        else:
+            position, end = 0, len(self._buffer)
+            while position < end:
+                offsets = self._scan(position, stride)
+                position = self._next(offsets[-1])
+                blocks.append(offsets)
+
+        columns = [[], [], [], []]
+        for offsets in blocks:
+            times = self._times(offsets)
+            for column, value in zip(columns, (offsets[0], times[0], times.min(), times.max())):
+                column.append(value)
+
+        self.index = TimeIndex(stride, sum(len(b) for b in blocks), len(self._buffer),
+                               *(np.array(c, dtype=np.int64) for c in columns))
+        return self.index
+
+    def _gather(self, offsets, dtype):
+        ''' Gathers a value of dtype at each offset '''
+        index = offsets[:, None] + np.arange(dtype.itemsize)
+        return self._buffer[index].view(dtype).reshape(len(offsets))
+
+    def decode(self, offsets):
+        ''' Decodes the records starting at offsets into a structured array '''
+        records = np.zeros(len(offsets), dtype=self.dtype)
+        columns = {f.name: self._gather(offsets + f.offset, f.binary) for f in self.header.fields}
+
+        days = columns.pop("date").astype("timedelta64[D]")
+        records["time"] = EPOCH + days + columns.pop("time").astype("timedelta64[ms]")
+        for f in self.header.fields[2:]:
+            records[f.name] = columns[f.name] * f.scale if f.scale else columns[f.name]
+
+        counts = self._buffer[offsets + self.header.size].astype(np.int64)
+        total = int(counts.sum())
+        if total:
+            record = np.repeat(np.arange(len(offsets)), counts)
+            first = np.repeat(np.cumsum(counts) - counts, counts)
+            positions = np.repeat(offsets + self.header.size + 1, counts) + 5 * (np.arange(total) - first)
+
+            dlv = self._buffer[positions]
+            if dlv.max() >= len(self.header.dlvs):
+                raise exception.ISOXMLParseException(f"TLG record references unknown DLV {dlv.max()}")
+
+            records["values"][record, dlv] = self._gather(positions + 1, np.dtype("<i4"))
+            records["present"][record, dlv] = True
+
+        return records
+
+    def read(self, start=0, stop=None):
+        '''
+        Decodes records start to stop (exclusive) into a structured array
+
+        With an index, the records are scanned from the block of start instead of the file start.
+        '''
+        if self._offsets is not None or self.index is None:
+            return self.decode(self.offsets()[start:stop])
+
+        start, stop, _ = slice(start, stop).indices(self.index.count)
+        if start >= stop:
+            return self.decode(np.zeros(0, dtype=np.int64))
+        block, skip = divmod(start, self.index.stride)
+        return self.decode(self._scan(int(self.index.offsets[block]), skip + stop - start)[skip:])
+
+    def read_time(self, start=None, stop=None):
+        '''
+        Decodes the records logged from start to stop (exclusive) into a structured array
+
+        start and stop are datetime64 values, ISO 8601 strings or datetimes, None for an open end.
+        Only the blocks of the index whose time range overlaps the interval are scanned, so records
+        that are out of time order are found as well. Builds the index if there is none.
+        '''
+        index = self.index if self.index is not None else self.build_index()
+        first = -2 ** 63 if start is None else _milliseconds(start)
+        last = 2 ** 63 - 1 if stop is None else _milliseconds(stop)
+
+        blocks = np.flatnonzero((index.maximum >= first) & (index.minimum < last))
+        chunks = []
+        # scan runs of consecutive blocks at once
+        for run in np.split(blocks, np.flatnonzero(np.diff(blocks) != 1) + 1):
+            if not len(run):
+                continue
+            count = min(len(run) * index.stride, index.count - int(run[0]) * index.stride)
+            offsets = self._scan(int(index.offsets[run[0]]), count)
+            times = self._times(offsets)
+            chunks.append(offsets[(times >= first) & (times < last)])
+
+        return self.decode(np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.int64))
+
+    def chunks(self, size=65536):
+        ''' Yields the records as structured arrays of at most size records, scanning incrementally '''
+        if self._offsets is not None:
+            for start in range(0, len(self._offsets), size):
+                yield self.decode(self._offsets[start:start + size])
+            return
+
+        position, end = 0, len(self._buffer)
+        while position < end:
+            offsets = self._scan(position, size)
+            position = self._next(offsets[-1])
+            yield self.decode(offsets)
+
+def map_file(path):
+    ''' Returns a read-only memory map of the file at path, or empty bytes for an empty file '''
+    with builtins.open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def open(path, index=False):
+    '''
+    Opens a TLG given the path of its files without extension (e.g. TASKDATA/TLG00001)
+
+    The header is read from path.XML and the binary records are memory-mapped from path.BIN. If
+    index is set, the time index is read from the sidecar file path.IDX, or built and written to it
+    if it is missing or older than the BIN file. A sidecar that cannot be written is skipped.
+    '''
+    with builtins.open(path + ".XML", "rb") as f:
+        header = parse_header(f.read())
+
+    log = TimeLog(header, map_file(path + ".BIN"))
+    if index:
+        load_index(log, path + INDEX_SUFFIX, path + ".BIN")
+    return log
+
+def load_index(log, sidecar, path):
+    '''
+    Sets the index of log from the sidecar file of its BIN file at path
+
+    The index is built and written to the sidecar if it is missing, older than the BIN file or
+    built for a different size. A sidecar that cannot be written is skipped.
+    '''
+    try:
+        if os.path.getmtime(sidecar) >= os.path.getmtime(path):
+            found = read_index(sidecar)
+            if found.size == len(log._buffer):
+                log.index = found
+                return found
+    except (OSError, exception.ISOXMLParseException):
+        pass
+
+    log.build_index()
+    try:
+        write_index(log.index, sidecar)
+    except OSError:
+        pass
+    return log.index
@@ -0,0 +1,292 @@
+'''
+Streaming serializer writing entities back to ISOXML
+
+Attribute names are written as the short codes of the spec (A, B, C, ...) in the order of the
+spec and typed values are formatted back to their XML representation, e.g. DDI as four hex
+digits. Output is encoded incrementally to a binary file, so large documents are never held as
+one string, and entities can be written one at a time with Writer.start, write and end.
+
+Typical usage example:
+
+isoxml.writer.write(taskdata, "TASKDATA.XML")
+
+with isoxml.writer.Writer(f) as w:
+    w.start(root)
+    for tsk in tasks():
+        w.write(tsk)
+
+'''
+
+import decimal
+import functools
+import io
+import math
+import os
+import xml.sax.saxutils
+import zipfile
+
+from . import entity
+from . import exception
+from . import spec
+
+# characters escaped in attribute values, newlines and tabs would be normalized to spaces otherwise
+_entities = {'"': "&quot;", "\n": "&#10;", "\r": "&#13;", "\t": "&#9;"}
+
+# size of the text buffered before it is encoded and written
+_BUFFER = 1 << 16
+
+@functools.lru_cache(maxsize=None)
+def _attributes(tag):
+    '''
+    Returns the entity attribute names of tag in the order of the spec, mapped to their XML names
+    and types
+
+    Tags without short codes, like ISO11783_TaskData, use the CamelCase names of the spec.
+    '''
+    schema = spec.schema(tag)
+    definition = spec.init_tag(tag)
+    names = {v: k for k, v in schema.attributes.items()}
+    for name in definition["required"] + list(definition["types"]):
+        names.setdefault(spec.snake_case(name), name)
+    return {name: (xml_name, schema.types.get(name)) for name, xml_name in names.items()}
+
+def format_value(value, type=None):
+    ''' Formats an attribute value of the given spec type as a string '''
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, int):
+        return f"{value:04X}" if type == "hex" else str(value)
+    if isinstance(value, float):
+        if not math.isfinite(value):
+            raise exception.ISOXMLException(f"Cannot write {value} as a decimal")
+        text = repr(value)
+        # xs:decimal has no exponent notation
+        if "e" in text:
+            text = format(decimal.Decimal(text), "f")
+        return text[:-2] if text.endswith(".0") else text
+    if isinstance(value, decimal.Decimal):
+        return format(value, "f")
+    return str(value)
+
+class Writer:
+    '''
+    Writes entities as XML to a binary file
+
+    indent is the string written per nesting level, e.g. "  ", or None to write no whitespace.
+    Attributes that are not part of the spec are written with the CamelCase of their name.
+    '''
+
+    def __init__(self, file, indent=None, declaration=True):
+        self.file = file
+        self.indent = indent
+        self._stack = []
+        self._buffer = []
+        self._size = 0
+        if declaration:
+            self._write('<?xml version="1.0" encoding="UTF-8"?>')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, kind, *args):
+        if kind is None:
+            self.close()
+        else:
+            self.flush()
+
+    def _write(self, text):
+        self._buffer.append(text)
+        self._size += len(text)
+        if self._size >= _BUFFER:
+            self.flush()
+
+    def flush(self):
+        ''' Writes the buffered text to the file '''
+        if self._buffer:
+            self.file.write("".join(self._buffer).encode("utf-8"))
+            self._buffer = []
+            self._size = 0
+
+    def _newline(self, depth):
+        if self.indent is not None:
+            self._write("\n" + self.indent * depth)
+
+    def _tag(self, e, schema):
+        ''' Returns the start tag of e without its closing bracket '''
+        attributes = _attributes(e.tag())
+        children = {name for _, name in schema.children}
+        fields = e._fields()
+
+        text = ["<", e.tag()]
+        for name, (xml_name, type) in attributes.items():
+            value = fields.get(name)
+            if value is not None:
+                text.append(f' {xml_name}="{xml.sax.saxutils.escape(format_value(value, type), _entities)}"')
+
+        # attributes that are not part of the spec, with the XML names kept by the parser
+        names = None
+        for name, value in fields.items():
+            skip = name in attributes or name in children or name == "points"
+            if not skip and value is not None and not isinstance(value, list):
+                if names is None:
+                    names = getattr(e, "_names", None) or {}
+                xml_name = names.get(name) or spec.camel_case(name)
+                text.append(f' {xml_name}="{xml.sax.saxutils.escape(format_value(value), _entities)}"')
+
+        return "".join(text)
+
+    def start(self, e):
+        ''' Writes the start tag of e with its attributes but none of its children '''
+        schema = spec.schema(e.tag())
+        self._newline(len(self._stack))
+        self._write(self._tag(e, schema) + ">")
+        self._stack.append(e.tag())
+
+    def end(self):
+        ''' Writes the end tag of the last started entity '''
+        tag = self._stack.pop()
+        self._newline(len(self._stack))
+        self._write(f"</{tag}>")
+
+    def write(self, e):
+        ''' Writes e and all its children '''
+        schema = spec.schema(e.tag())
+        if schema is None:
+            raise exception.ISOXMLException(f"Unknown tag {e.tag()}")
+
+        depth = len(self._stack)
+        self._newline(depth)
+        self._write(self._tag(e, schema))
+
+        children = [c for _, name in schema.children for c in getattr(e, name, None) or ()]
+        points = getattr(e, "points", None) if e.tag() == "LSG" else None
+        if not children and points is None:
+            self._write("/>")
+            return
+
+        self._write(">")
+        self._stack.append(e.tag())
+        if points is not None:
+            self._points(points)
+        for child in children:
+            self.write(child)
+        self.end()
+
+    def _points(self, points):
+        ''' Writes columnar geometry.Points as PNT elements '''
+        columns = [("A", points.type, "enum"), ("C", points.north, "decimal"), ("D", points.east, "decimal")]
+        for attribute, name in (("E", "up"), ("H", "horizontal_accuracy"), ("I", "vertical_accuracy")):
+            column = getattr(points, name)
+            if column is not None:
+                columns.append((attribute, column, "decimal" if name != "up" else "int"))
+
+        depth = len(self._stack)
+        for i in range(len(points)):
+            text = ["<PNT"]
+            for attribute, column, type in columns:
+                value = column[i].item()
+                # missing values of the optional columns are NaN
+                if isinstance(value, float) and math.isnan(value):
+                    continue
+                if type != "decimal":
+                    value = int(value)
+                text.append(f' {attribute}="{format_value(value, type)}"')
+            self._newline(depth)
+            self._write("".join(text) + "/>")
+
+    def close(self):
+        ''' Ends all started entities and flushes the buffer '''
+        while self._stack:
+            self.end()
+        self.flush()
+
+def write(root, file, indent=None):
+    ''' Writes an entity and its children as a document to a binary file or a file path '''
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, "wb") as f:
+            write(root, f, indent)
+        return
+
+    with Writer(file, indent) as w:
+        w.write(root)
+
+def tostring(root, indent=None):
+    ''' Returns an entity and its children as a document encoded in UTF-8 '''
+    f = io.BytesIO()
+    write(root, f, indent)
+    return f.getvalue()
+
+def write_set(root, target, external=None, split=(), per_file=1000, files=None, indent=None):
+    '''
+    Writes a TASKDATA set to a directory or a ZIP archive
+
+    target is a directory, the path of a ZIP archive (ending in .zip) or a zipfile.ZipFile opened
+    for writing, in which the files are placed in a TASKDATA directory. external maps the names of
+    external files that root references with XFR to their XFC root entities, e.g. as returned by
+    dataset.Dataset.load. The top-level entities with a tag in split are moved to new external
+    files of at most per_file entities, named like TSK00001. files maps the names of further files,
+    e.g. GRD00001.BIN, to their contents as bytes.
+    '''
+    allowed = spec.schema("XFC").ctags
+    for tag in split:
+        if tag not in allowed:
+            raise exception.ISOXMLException(f"{tag} cannot be written to an external file")
+
+    if isinstance(target, zipfile.ZipFile):
+        _write_set(root, _ZipTarget(target), external or {}, split, per_file, files or {}, indent)
+    elif str(target).lower().endswith(".zip"):
+        with zipfile.ZipFile(target, "w", zipfile.ZIP_DEFLATED) as z:
+            _write_set(root, _ZipTarget(z), external or {}, split, per_file, files or {}, indent)
+    else:
+        os.makedirs(target, exist_ok=True)
+        _write_set(root, functools.partial(_open_file, target), external or {}, split, per_file, files or {}, indent)
+
+def _open_file(directory, name):
+    return open(os.path.join(directory, name), "wb")
+
+class _ZipTarget:
+    ''' Opens members of a ZIP archive in its TASKDATA directory for writing '''
+
+    def __init__(self, z):
+        self.zip = z
+
+    def __call__(self, name):
+        return self.zip.open("TASKDATA/" + name, "w", force_zip64=True)
+
+def _write_set(root, target, external, split, per_file, files, indent):
+    schema = spec.schema(root.tag())
+    xfrs = list(getattr(root, "xfrs", None) or ())
+    used = {x.file_name.upper() for x in xfrs}
+
+    for tag in split:
+        entities = getattr(root, tag.lower() + "s", None) or []
+        number = 0
+        for start in range(0, len(entities), per_file):
+            number += 1
+            while f"{tag}{number:05d}" in used:
+                number += 1
+            name = f"{tag}{number:05d}"
+            used.add(name)
+            xfrs.append(entity.new("XFR", file_name=name, type=1))
+            with target(name + ".XML") as f, Writer(f, indent) as w:
+                w.start(entity.new("XFC"))
+                for e in entities[start:start + per_file]:
+                    w.write(e)
+
+    with target("TASKDATA.XML") as f, Writer(f, indent) as w:
+        w.start(root)
+        for tag, name in schema.children:
+            if tag in split:
+                continue
+            for e in xfrs if tag == "XFR" else getattr(root, name, None) or ():
+                w.write(e)
+
+    for name, xfc in external.items():
+        with target(name + ".XML") as f:
+            write(xfc, f, indent)
+
+    for name, data in files.items():
+        with target(name) as f:
+            f.write(data)
@@ -0,0 +1,109 @@
+''' Test cases for isoxml.aggregate '''
+import concurrent.futures
+import pickle
+import struct
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from isoxml import aggregate, dataset, device, entity, exception, prescription, timelog  # noqa: E402
+from .timelog_test import record  # noqa: E402
+
+header = """<TIM A="" D="4">
+    <PTN A="" B="" D="" G="" />
+    <DLV A="0074" B="" C="DET-1" />
+    <DLV A="008D" B="" C="DET-1" />
+    <DLV A="0002" B="" C="DET-2" />
+</TIM>"""
+
+dvc = """<DVC A="DVC-1" B="Sprayer" D="A000860020800001" F="535052415945525F" G="FF000000006564">
+    <DET A="DET-1" B="1" C="1" D="Sprayer" E="0" F="0"><DOR A="10" /></DET>
+    <DET A="DET-2" B="2" C="2" D="Boom" E="1" F="1"><DOR A="11" /></DET>
+    <DPD A="10" B="0074" C="1" D="8" />
+    <DPD A="11" B="0002" C="1" D="8" F="100" />
+    <DVP A="100" B="0" C="0.01" D="2" E="l/ha" />
+</DVC>"""
+
+# ten seconds: work state on at 0 s, off at 4 s, on at 6 s, area counter from 1000 to 1900
+records = [
+    record(36000000, 15706, 0, 0, 1, 12, [(0, 1000), (1, 1), (2, 10000)]),
+    record(36001000, 15706, 0, 0, 1, 12, [(2, 12000)]),
+    record(36002000, 15706, 0, 0, 1, 12, [(0, 1200)]),
+    record(36004000, 15706, 20000000, 0, 1, 12, [(1, 0)]),
+    record(36006000, 15706, 20000000, 0, 1, 12, [(0, 1500), (1, 1), (2, 20000)]),
+    record(36010000, 15706, 20000000, 0, 1, 12, [(0, 1900), (2, 30000)]),
+]
+
+def test_summarize():
+    ''' Test totals, work time and statistics of a log '''
+    devices = device.Devices([entity.fromstring(dvc)])
+    log = timelog.TimeLog(header, b"".join(records))
+    s = aggregate.summarize(log, devices)
+    assert s.records == 6
+    assert s.total() == 900
+    assert s.work_time() == 8
+    assert s.work_time("DET-9") is None
+    assert s.mean(2) == pytest.approx(180)
+    assert s.count.tolist() == [4, 3, 4]
+    assert s.min[2] == pytest.approx(100) and s.max[2] == pytest.approx(300)
+
+def test_chunks():
+    ''' Test that merging chunks gives the same summary as a single chunk '''
+    log = timelog.TimeLog(header, b"".join(records))
+    whole = aggregate.summarize(log, chunk_size=100)
+    for size in (1, 2, 4):
+        s = aggregate.summarize(log, chunk_size=size)
+        for name in ("count", "sum", "min", "max", "first", "last", "delta", "work", "state"):
+            np.testing.assert_array_equal(getattr(s, name), getattr(whole, name))
+        assert (s.start, s.end, s.records) == (whole.start, whole.end, whole.records)
+
+def test_merge():
+    ''' Test merging summaries of separate logs with different headers '''
+    log = timelog.TimeLog(header, b"".join(records))
+    # a log without positions and only the rate
+    other = timelog.TimeLog('<TIM A="" D="4"><DLV A="0002" B="" C="DET-2" /></TIM>',
+                            struct.pack("<IHBBi", 36020000, 15706, 1, 0, 50000))
+    s = aggregate.summarize(log)
+    s.merge(pickle.loads(pickle.dumps(aggregate.summarize(other))))
+    assert s.keys == [(0x74, "DET-1"), (0x8D, "DET-1"), (2, "DET-2")]
+    assert s.count.tolist() == [4, 3, 5]
+    assert s.last[2] == 50000 and s.first[2] == 10000
+    assert s.work_time() == 8 and s.total() == 900
+
+def test_duplicate_dlvs():
+    ''' Test that logs with two DLVs of the same DDI and DET are rejected '''
+    log = timelog.TimeLog('<TIM A="" D="4"><DLV A="0002" B="" C="DET-2" /><DLV A="0002" B="" C="DET-2" /></TIM>',
+                          struct.pack("<IHBBiBi", 36020000, 15706, 2, 0, 50000, 1, 60000))
+    with pytest.raises(exception.ISOXMLParseException):
+        aggregate.summarize(log)
+
+def test_zones():
+    ''' Test the mean per zone of a prescription '''
+    tsk = entity.fromstring("""<TSK A="TSK1" G="1" H="0">
+        <TZN A="0"><PDV A="0001" B="0" /></TZN>
+        <TZN A="1"><PDV A="0001" B="100" /><PLN A="2"><LSG A="1">
+            <PNT A="2" C="1" D="-1" /><PNT A="2" C="1" D="1" /><PNT A="2" C="3" D="1" /><PNT A="2" C="3" D="-1" />
+        </LSG></PLN></TZN>
+    </TSK>""")
+    log = timelog.TimeLog(header, b"".join(records))
+    s = aggregate.summarize(log, prescription=prescription.Prescription(tsk), chunk_size=4)
+    assert s.zone_means(2) == {0: 11000, 1: 25000}
+
+def test_task(tmp_path):
+    ''' Test the summary of a task of a dataset with concurrently summarized logs '''
+    (tmp_path / "TASKDATA.XML").write_text(f"""<ISO11783_TaskData VersionMajor="4" VersionMinor="0"
+        ManagementSoftwareManufacturer="GaiaData" ManagementSoftwareVersion="1.0.0" DataTransferOrigin="1">
+        {dvc}<TSK A="TSK1" G="1"><TLG A="TLG00001" C="1" /><TLG A="TLG00002" C="1" /></TSK>
+    </ISO11783_TaskData>""")
+    for name in ("TLG00001", "TLG00002"):
+        (tmp_path / f"{name}.XML").write_text(header)
+        (tmp_path / f"{name}.BIN").write_bytes(b"".join(records))
+
+    with dataset.open(str(tmp_path)) as ds, concurrent.futures.ThreadPoolExecutor(2) as pool:
+        s = aggregate.summarize_task(ds, ds.tsks[0], executor=pool)
+    assert s.records == 12
+    assert s.total() == 1800
+    assert s.work_time() == 16
+    assert s.mean(2) == pytest.approx(180)
+    assert s.as_dict()["keys"]["0074/DET-1"]["delta"] == 1800
@@ -0,0 +1,75 @@
+''' Test cases for isoxml.batch '''
+import concurrent.futures
+import zipfile
+
+import pytest
+
+from isoxml import batch, exception, index, stats
+from .entity_test import full
+from .dataset_test import files
+
+def test_parse(tmp_path):
+    ''' Test that bytes, XML files and TASKDATA sets are parsed with per input errors '''
+    xml = tmp_path / "TASKDATA.XML"
+    xml.write_text(full)
+    archive = tmp_path / "taskdata.zip"
+    with zipfile.ZipFile(archive, "w") as z:
+        for name, data in files.items():
+            z.writestr(name, data)
+    broken = tmp_path / "broken.xml"
+    broken.write_text("<ISO11783_TaskData>")
+
+    sources = [full.encode(), str(xml), str(archive), str(broken), str(tmp_path / "missing.xml")]
+    calls = []
+    results = sorted(batch.parse(sources, max_workers=2, chunksize=2, progress=lambda *a: calls.append(a)))
+
+    assert [r.index for r in results] == [0, 1, 2, 3, 4]
+    assert results[0].root.tsks[0].id == "TSK1"
+    assert results[0].root.element is None
+    assert results[1].root.pfds[0].plns[0].lsgs[0].pnts[0].north == 49.3682793876954
+    assert results[2].external["TSK00001"].tsks[0].id == "TSK1"
+    assert all(r.error is None for r in results[:3])
+    assert results[0].external is None
+
+    for r in results[3:]:
+        assert isinstance(r.error, exception.ISOXMLParseException)
+        assert r.error.source == r.source
+        assert r.source in str(r.error)
+
+    assert sorted(calls)[-1] == (5, 5)
+    assert len(calls) == 3
+
+def test_backend():
+    ''' Test that parse options are passed to the workers '''
+    (result,) = batch.parse([full.encode()], backend="expat", raw=True)
+    assert result.root.version_major == "3"
+
+class CrashingExecutor(concurrent.futures.ThreadPoolExecutor):
+    ''' Executor whose chunks with the input 1 fail like a crashed worker process '''
+
+    def submit(self, fn, chunk, options):
+        if any(index == 1 for index, _ in chunk):
+            return super().submit(self.crash)
+        return super().submit(fn, chunk, options)
+
+    @staticmethod
+    def crash():
+        raise concurrent.futures.process.BrokenProcessPool("worker died")
+
+def test_crash():
+    ''' Test that the inputs of a failed chunk get error results and the other chunks are parsed '''
+    with CrashingExecutor() as executor:
+        results = sorted(batch.parse([full.encode()] * 3, executor=executor))
+
+    assert [r.index for r in results] == [0, 1, 2]
+    assert results[0].root.tsks[0].id == results[2].root.tsks[0].id == "TSK1"
+    assert isinstance(results[1].error, exception.ISOXMLParseException)
+    assert results[1].error.source == "<input 1>"
+    assert "worker died" in str(results[1].error)
+
+def test_invalid():
+    ''' Test that options filled in the workers are rejected '''
+    with pytest.raises(exception.ISOXMLException):
+        next(batch.parse([full.encode()], stats=stats.Stats()))
+    with pytest.raises(exception.ISOXMLException):
+        next(batch.parse([full.encode()], index=index.Index()))
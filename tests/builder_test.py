@@ -0,0 +1,50 @@
+''' Test cases for isoxml.builder '''
+import io
+
+import pytest
+
+from isoxml import builder, entity, exception, index
+from .entity_test import full, valid
+
+def test_same_result():
+    ''' Test that the expat backend builds the same entities as the etree backend '''
+    for options in [{}, {"compact": True}, {"raw": True}, {"include": ["TSK", "TZN"]}, {"exclude": ["PNT"]}]:
+        expected = entity.fromstring(full, keep_element=False, **options)
+        result = entity.fromstring(full, backend="expat", **options)
+        assert repr(result) == repr(expected)
+        assert result.element is None
+
+    for data in valid.values():
+        assert repr(builder.parse(data)) == repr(entity.fromstring(data, keep_element=False))
+
+def test_file():
+    ''' Test parsing from a file object '''
+    e = builder.parse(io.BytesIO(full.encode()), compact=True)
+    assert e.tsks[0].grds[0].maximum_row == 30
+
+def test_index():
+    ''' Test that entities are added to the index '''
+    idx = index.Index()
+    e = builder.parse(full, index=idx)
+    assert idx.resolve("PFD1") is e.pfds[0]
+
+def test_unknown_child():
+    ''' Test that child elements which are not part of the spec are skipped like by the etree backend '''
+    data = '<LSG A="1"><FOO><PNT A="2" C="1" D="2" /></FOO><PNT A="1" C="1" D="2" /></LSG>'
+    assert repr(builder.parse(data)) == repr(entity.fromstring(data, keep_element=False))
+
+def test_errors():
+    ''' Test that invalid documents raise exceptions '''
+    with pytest.raises(exception.ISOXMLParseException):
+        builder.parse("<FOO />")
+    with pytest.raises(exception.ISOXMLParseException):
+        builder.parse("<PNT A='1'")
+    with pytest.raises(exception.ISOXMLException):
+        builder.parse(full, lazy=True)
+
+def test_columnar():
+    ''' Test that columnar points match the etree backend '''
+    pytest.importorskip("numpy")
+    expected = entity.fromstring(full, columnar=True).pfds[0].plns[0].lsgs[0].points
+    result = builder.parse(full, columnar=True).pfds[0].plns[0].lsgs[0].points
+    assert (result.north == expected.north).all() and (result.east == expected.east).all()
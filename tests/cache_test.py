@@ -0,0 +1,149 @@
+''' Test cases for isoxml.cache '''
+import concurrent.futures
+import mmap
+import os
+import subprocess
+import sys
+
+import pytest
+
+from isoxml import cache, dataset, entity
+from .entity_test import full, _tree
+from .dataset_test import files as dataset_files, source  # noqa: F401
+
+def test_fromstring(tmp_path, monkeypatch):
+    ''' Test that documents are parsed on a miss and loaded on a hit '''
+    c = cache.Cache(str(tmp_path))
+    first = c.fromstring(full.encode(), compact=True, keep_element=False)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("parsed again")
+
+    monkeypatch.setattr(entity, "fromstring", fail)
+    second = c.fromstring(full.encode(), compact=True, keep_element=False)
+    assert second is not first
+    assert _tree(second) == _tree(first)
+
+    # other options, contents or versions are misses
+    monkeypatch.undo()
+    assert c.fromstring(full.encode(), compact=True, keep_element=False, raw=True).version_major == "3"
+    assert len(os.listdir(tmp_path)) == 2
+
+    key = c.key(b"x")
+    monkeypatch.setattr(cache, "__version__", "0.0.0")
+    assert c.key(b"x") != key
+    monkeypatch.undo()
+    assert c.key(b"x") == key
+    monkeypatch.setattr(cache.spec, "fingerprint", lambda: "changed")
+    assert c.key(b"x") != key
+
+def test_document_key(tmp_path):
+    ''' Test that collection options give the same key in every process and in every form '''
+    script = "from isoxml import cache; print(cache.Cache(%r).document_key(b'x', include={'TSK', 'DLT', 'PFD'}))"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    keys = set()
+    for seed in ["1", "2", "3"]:
+        env = dict(os.environ, PYTHONHASHSEED=seed)
+        result = subprocess.run([sys.executable, "-c", script % str(tmp_path)], env=env, cwd=root, capture_output=True,
+                                check=True)
+        keys.add(result.stdout.decode().strip())
+    assert len(keys) == 1
+
+    c = cache.Cache(str(tmp_path))
+    key = c.document_key(b"x", include=["PFD", "TSK", "DLT"])
+    assert keys == {key, c.document_key(b"x", include=frozenset(["DLT", "PFD", "TSK"]))}
+    assert c.document_key(b"x", include=["PFD"]) != key
+
+def test_records(tmp_path):
+    ''' Test that decoded records are memory-mapped from the cache '''
+    pytest.importorskip("numpy")
+    from isoxml import timelog
+    from .timelog_test import header, records
+
+    c = cache.Cache(str(tmp_path))
+    log = timelog.TimeLog(header, b"".join(records * 10))
+    expected = log.read()
+    assert (c.records(log) == expected).all()
+
+    cached = c.records(log)
+    assert (cached == expected).all()
+    assert not cached.flags.writeable
+    base = cached.base
+    while not isinstance(base, memoryview):
+        base = base.base
+    assert isinstance(base.obj, mmap.mmap)
+    assert (c.records(log, 5, 10) == expected[5:10]).all()
+
+def test_time_index(tmp_path):
+    ''' Test that the time index of a log is built only on a miss '''
+    pytest.importorskip("numpy")
+    from isoxml import timelog
+    from .timelog_test import header, records
+
+    c = cache.Cache(str(tmp_path))
+    data = b"".join(records * 10)
+    index = c.time_index(timelog.TimeLog(header, data), "TLG00001")
+    log = timelog.TimeLog(header, data)
+    cached = c.time_index(log, "TLG00001")
+    assert log.index is cached and cached.count == 30
+    assert cached.offsets.tolist() == index.offsets.tolist()
+    assert c.time_index(timelog.TimeLog(header, data), "TLG00002") is not cached
+
+def test_evict(tmp_path):
+    ''' Test that the least recently used entries are evicted beyond max_bytes '''
+    c = cache.Cache(str(tmp_path), max_bytes=1 << 20)
+    for i, key in enumerate(["a", "b", "c"]):
+        c.put(key, bytes(300000))
+        os.utime(tmp_path / f"{key}.cache", (i, i))
+
+    assert c.get("a") is not None
+    c.put("d", bytes(300000))
+    assert sorted(os.listdir(tmp_path)) == ["a.cache", "c.cache", "d.cache"]
+
+    c.clear()
+    assert os.listdir(tmp_path) == []
+
+def test_corrupt(tmp_path):
+    ''' Test that unreadable entries are misses and deleted '''
+    c = cache.Cache(str(tmp_path))
+    c.put("a", [1, 2, 3])
+    assert c.get("a") == [1, 2, 3]
+
+    (tmp_path / "a.cache").write_bytes((tmp_path / "a.cache").read_bytes()[:-4])
+    assert c.get("a", "miss") == "miss"
+    (tmp_path / "b.cache").write_bytes(b"garbage")
+    assert c.get("b") is None
+    assert os.listdir(tmp_path) == []
+
+def test_dataset(source, tmp_path):  # noqa: F811
+    ''' Test that a dataset stores its parsed files in the cache '''
+    c = cache.Cache(str(tmp_path / "cache"))
+    with dataset.open(source, cache=c) as d:
+        assert [t.id for t in d.tsks] == ["TSK1"]
+    assert len(os.listdir(tmp_path / "cache")) == 2
+
+    with dataset.open(source, cache=c) as d:
+        assert [p.id for p in d.pfds] == ["PFD1", "PFD2"]
+    assert len(os.listdir(tmp_path / "cache")) == 3
+
+def test_dataset_stats(source, tmp_path):  # noqa: F811
+    ''' Test that the stats option is not part of the key and hits are recorded in it '''
+    from isoxml import stats
+
+    c = cache.Cache(str(tmp_path / "cache"))
+    with dataset.open(source, cache=c, stats=stats.Stats()) as d:
+        d.load()
+    assert len(os.listdir(tmp_path / "cache")) == 3
+
+    s = stats.Stats()
+    with dataset.open(source, cache=c, stats=s) as d:
+        d.load()
+        assert d.tsks[0].pfd_id_ref == "PFD1"
+    assert len(os.listdir(tmp_path / "cache")) == 3
+    assert s.cache_hits == s.documents == 3 and s.counts == {}
+    assert s.bytes_read == sum(len(data) for data in dataset_files.values())
+
+    s = stats.Stats()
+    with dataset.open(source, cache=c, stats=s) as d, concurrent.futures.ThreadPoolExecutor(max_workers=2) as pool:
+        d.load(pool)
+    assert s.cache_hits == s.documents == 3 and s.elapsed > 0
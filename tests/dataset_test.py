@@ -0,0 +1,97 @@
+''' Test cases for isoxml.dataset '''
+import concurrent.futures
+import zipfile
+
+import pytest
+
+from isoxml import dataset, exception
+
+taskdata = """<ISO11783_TaskData VersionMajor="4" VersionMinor="0" ManagementSoftwareManufacturer="GaiaData"
+    ManagementSoftwareVersion="1.0.0" DataTransferOrigin="1">
+    <CTR A="CTR1" B="Farmer" />
+    <XFR A="PFD00001" B="1" />
+    <XFR A="TSK00001" B="1" />
+</ISO11783_TaskData>"""
+
+files = {
+    "TASKDATA.XML": taskdata,
+    "PFD00001.XML": '<XFC><PFD A="PFD1" C="Field" D="1" /><PFD A="PFD2" C="Field 2" D="2" /></XFC>',
+    "TSK00001.XML": '<XFC><TSK A="TSK1" G="1" E="PFD1" /></XFC>',
+}
+
+@pytest.fixture(params=["directory", "zip"])
+def source(request, tmp_path):
+    ''' A TASKDATA set in a subdirectory of a directory or a ZIP archive '''
+    if request.param == "directory":
+        (tmp_path / "TASKDATA").mkdir()
+        for name, data in files.items():
+            (tmp_path / "TASKDATA" / name).write_text(data)
+        return str(tmp_path)
+
+    path = tmp_path / "taskdata.zip"
+    with zipfile.ZipFile(path, "w") as z:
+        for name, data in files.items():
+            z.writestr("TASKDATA/" + name, data)
+    return str(path)
+
+def test_lazy(source):
+    ''' Test that external files are only parsed when their entities are accessed '''
+    with dataset.open(source) as d:
+        assert [c.id for c in d.ctrs] == ["CTR1"]
+        assert [t.id for t in d.tsks] == ["TSK1"]
+        assert list(d._external) == ["TSK00001"]
+        assert [p.id for p in d.pfds] == ["PFD1", "PFD2"]
+
+@pytest.mark.parametrize("executor", [concurrent.futures.ThreadPoolExecutor, concurrent.futures.ProcessPoolExecutor])
+def test_load(source, executor):
+    ''' Test that all external files can be parsed concurrently '''
+    with dataset.open(source, compact=True, keep_element=False) as d, executor(max_workers=2) as pool:
+        d.load(pool)
+        assert sorted(d._external) == ["PFD00001", "TSK00001"]
+        assert d.tsks[0].pfd_id_ref == "PFD1"
+
+def test_load_invalid(source):
+    ''' Test that options filled in worker processes are rejected with a process pool '''
+    from isoxml import stats
+
+    with dataset.open(source, stats=stats.Stats()) as d, concurrent.futures.ProcessPoolExecutor(max_workers=1) as pool:
+        with pytest.raises(exception.ISOXMLException):
+            d.load(pool)
+
+def test_zipfile(tmp_path):
+    ''' Test that a zipfile.ZipFile passed in is not closed with the dataset '''
+    path = tmp_path / "taskdata.zip"
+    with zipfile.ZipFile(path, "w") as z:
+        for name, data in files.items():
+            z.writestr(name, data)
+
+    with zipfile.ZipFile(path) as z:
+        with dataset.open(z) as d:
+            assert [t.id for t in d.tsks] == ["TSK1"]
+        assert z.read("TASKDATA.XML").decode() == taskdata
+
+def test_missing(tmp_path):
+    ''' Test that a directory without TASKDATA.XML raises an exception '''
+    with pytest.raises(exception.ISOXMLParseException):
+        dataset.open(str(tmp_path))
+
+def test_index(source):
+    ''' Test that the index covers TASKDATA.XML and all external files '''
+    with dataset.open(source) as d:
+        idx = d.index()
+        assert idx.resolve("PFD2").designator == "Field 2"
+        assert [t.id for t in idx.referencing("PFD1")] == ["TSK1"]
+
+def test_grid_case(tmp_path):
+    ''' Test that binary files are found regardless of the case of their names '''
+    np = pytest.importorskip("numpy")
+    (tmp_path / "TASKDATA.XML").write_text(taskdata.replace(
+        '<CTR A="CTR1" B="Farmer" />',
+        '<TSK A="TSK1" G="1"><GRD A="0" B="0" C="1" D="1" E="3" F="2" G="GRD00001" I="1" /></TSK>'))
+    (tmp_path / "grd00001.bin").write_bytes(bytes(range(6)))
+    (tmp_path / "PFD00001.XML").write_text(files["PFD00001.XML"])
+    (tmp_path / "TSK00001.XML").write_text(files["TSK00001.XML"])
+    with dataset.open(str(tmp_path)) as d:
+        cells = d.grid(d.root.tsks[0].grds[0])
+        assert isinstance(cells, np.memmap)
+        assert cells.tolist() == [[0, 1, 2], [3, 4, 5]]
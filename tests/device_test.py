@@ -0,0 +1,74 @@
+''' Test cases for isoxml.device '''
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from isoxml import device, entity, exception  # noqa: E402
+
+dvc = """
+<DVC A="DVC-1" B="Sprayer" D="A000860020800001" F="535052415945525F" G="FF000000006564">
+    <DET A="DET-1" B="1" C="1" D="Sprayer" E="0" F="0"><DOR A="10" /><DOR A="20" /></DET>
+    <DET A="DET-2" B="2" C="2" D="Boom" E="1" F="1"><DOR A="11" /></DET>
+    <DET A="DET-3" B="3" C="4" D="Section 1" E="2" F="2"><DOR A="12" /></DET>
+    <DET A="DET-4" B="4" C="4" D="Section 2" E="3" F="2"><DOR A="12" /></DET>
+    <DPD A="10" B="0074" C="1" D="8" F="100" />
+    <DPD A="11" B="0001" C="1" D="8" F="101" />
+    <DPD A="12" B="008D" C="1" D="8" />
+    <DPT A="20" B="0043" C="24000" E="102" />
+    <DVP A="100" B="0" C="0.0001" D="2" E="ha" />
+    <DVP A="101" B="5" C="0.01" D="1" E="l/ha" />
+    <DVP A="102" B="0" C="0.001" D="0" E="m" />
+</DVC>
+"""
+
+def test_hierarchy():
+    ''' Test the element hierarchy arrays and navigation '''
+    d = device.Devices([entity.fromstring(dvc)])
+    assert d.ids == ["DET-1", "DET-2", "DET-3", "DET-4"]
+    assert d.parent.tolist() == [-1, 0, 1, 1]
+    assert d.depth.tolist() == [0, 1, 2, 2]
+    assert d.type.tolist() == [1, 2, 4, 4]
+    assert d.ancestors("DET-4") == ["DET-2", "DET-1"]
+    assert d.children("DET-2") == ["DET-3", "DET-4"]
+
+def test_lookup():
+    ''' Test the (DET, DDI) tables of process data, properties and presentations '''
+    d = device.Devices([entity.fromstring(dvc, compact=True)])
+    assert d.process_data["DET-3", 0x8D].object_id == 12
+    assert d.presentation("DET-2", 1) == device.Presentation(5.0, 0.01, 1, "l/ha")
+    assert d.presentation("DET-3", 0x8D) == device.Presentation(0.0, 1.0, 0, None)
+    assert d.property("DET-4", 0x43).value == 24000
+    assert d.property("DET-4", 0x43, inherit=False) is None
+
+def test_raw():
+    ''' Test that string values of raw documents are decoded like typed ones, DDIs as hex '''
+    raw = device.Devices([entity.fromstring(dvc.replace('B="0043"', 'B="004B"'), raw=True)])
+    typed = device.Devices([entity.fromstring(dvc.replace('B="0043"', 'B="004B"'))])
+    assert set(raw.process_data) == set(typed.process_data)
+    assert ("DET-1", 0x74) in raw.process_data and ("DET-1", 0x4B) in raw.properties
+    assert raw.property("DET-4", 0x4B).value == "24000"
+    assert raw.presentations == typed.presentations
+    assert raw.parent.tolist() == typed.parent.tolist() == [-1, 0, 1, 1]
+    assert raw.object_id.tolist() == typed.object_id.tolist()
+
+def test_decode():
+    ''' Test vectorized scaling of logged values '''
+    d = device.Devices([entity.fromstring(dvc)])
+    dlvs = ((0x74, "DET-1"), (1, "DET-2"), (0x8D, "DET-3"), (1, "DET-9"))
+    values = np.array([[10000, 995, 1, 7], [20000, 1995, 0, 8]], dtype=np.int32)
+    present = np.array([[True, True, True, True], [True, False, True, True]])
+    result = d.decode(values, dlvs, present)
+    assert result[0].tolist() == pytest.approx([1.0, 10.0, 1, 7])
+    assert result[1, 0] == pytest.approx(2.0) and np.isnan(result[1, 1])
+
+    offset, scale = d.scaling(np.array([1, 1, -1]), np.array([1, 2, 1]))
+    assert offset.tolist() == [5.0, 0.0, 0.0] and scale.tolist() == [0.01, 1.0, 1.0]
+    assert device.Devices([]).scaling([0], [1])[1].tolist() == [1.0]
+
+def test_invalid():
+    ''' Test that duplicate DET ids and cycles are rejected '''
+    with pytest.raises(exception.ISOXMLException):
+        device.Devices([entity.fromstring(dvc)] * 2)
+    cyclic = dvc.replace('E="0" F="0"', 'E="0" F="3"')
+    with pytest.raises(exception.ISOXMLException):
+        device.Devices([entity.fromstring(cyclic)])
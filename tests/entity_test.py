@@ -1,7 +1,12 @@
 ''' Test cases for isoxml.entity '''
+import decimal
+import pickle
+import tracemalloc
+from xml.etree import ElementTree
+
 import pytest
 
-from isoxml import entity, exception
+from isoxml import entity, exception, index
 
 valid = {}
 
@@ -101,3 +106,188 @@ def test_entity():
     for tag, xml in valid.items():
         e = entity.Entity(xml)
         assert e.tag() == tag
+
+def test_from_element():
+    ''' Test that an entity can be created from an existing element without re-parsing '''
+    element = ElementTree.fromstring(full)
+    e = entity.Entity.from_element(element)
+    assert e.element is element
+    assert e.pfds[0].plns[0].lsgs[0].pnts[0].element is element.find("PFD/PLN/LSG/PNT")
+    assert len(e.pfds[0].plns[0].lsgs[0].pnts) == 38
+
+def _boundary(n):
+    ''' Returns a taskdata document with a single boundary of n points '''
+    pnts = '<PNT A="10" C="49.3682793876954" D="9.55990880103963" />' * n
+    return f"""<ISO11783_TaskData VersionMajor="4" VersionMinor="0" ManagementSoftwareManufacturer="GaiaData"
+        ManagementSoftwareVersion="1.0.0" DataTransferOrigin="1">
+        <PFD A="PFD1" C="Field" D="1"><PLN A="1"><LSG A="1">{pnts}</LSG></PLN></PFD>
+    </ISO11783_TaskData>"""
+
+def test_iterparse(tmp_path):
+    ''' Test that top-level entities are streamed in document order and can be filtered by tag '''
+    path = tmp_path / "TASKDATA.XML"
+    path.write_text(full)
+
+    tags = [e.tag() for e in entity.iterparse(str(path))]
+    assert tags == ["CTR", "FRM", "PFD", "PGP", "VPN", "CPC", "PDT", "TSK"]
+
+    with open(path, "rb") as f:
+        tsks = list(entity.iterparse(f, tags=["TSK"]))
+    assert [t.id for t in tsks] == ["TSK1"]
+    assert len(tsks[0].tzns) == 2
+
+def test_iterparse_bounded_memory(tmp_path):
+    ''' Test that streaming memory does not grow with the number of top-level entities '''
+    def peak(n):
+        path = tmp_path / f"TASKDATA{n}.XML"
+        tsks = '<TSK A="TSK1" G="1"><DLT A="DFFF" B="31" /></TSK>' * n
+        path.write_text(_boundary(200).replace("</PFD>", "</PFD>" + tsks))
+        tracemalloc.start()
+        for _ in entity.iterparse(str(path)):
+            pass
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return peak
+
+    assert peak(20000) < 2 * peak(1000)
+
+def test_iterparse_unknown_root(tmp_path):
+    ''' Test that an unknown root tag raises an exception '''
+    path = tmp_path / "TASKDATA.XML"
+    path.write_text("<FOO><TSK A='TSK1' G='1' /></FOO>")
+    with pytest.raises(exception.ISOXMLParseException):
+        list(entity.iterparse(str(path)))
+
+def _tree(e):
+    ''' Returns the attributes and child entities of e as nested dicts '''
+    return (e.tag(), {k: [_tree(c) for c in v] if isinstance(v, list) else v for k, v in e._fields().items()})
+
+def test_compact():
+    ''' Test that compact entities expose the same attributes and children as the generic ones '''
+    e = entity.fromstring(full, compact=True, keep_element=False)
+    assert _tree(e) == _tree(entity.Entity(full))
+
+    pnt = e.pfds[0].plns[0].lsgs[0].pnts[0]
+    assert type(pnt) is entity.compact_class("PNT")
+    assert isinstance(pnt, entity.Entity)
+    assert pnt.tag() == "PNT"
+    assert pnt.north == 49.3682793876954
+    assert pnt.element is None
+    assert not hasattr(pnt, "up")
+
+def test_compact_unknown_attribute():
+    ''' Test that attributes outside of the spec are kept on compact entities '''
+    e = entity.fromstring('<PNT A="10" C="49.1" D="9.5" P094_Quality="4" />', compact=True)
+    assert e.p094__quality == "4"
+
+def test_typed():
+    ''' Test that attribute values are decoded according to the spec '''
+    e = entity.Entity(full)
+    assert e.version_major == 3
+    pnt = e.pfds[0].plns[0].lsgs[0].pnts[0]
+    assert (pnt.type, pnt.north, pnt.east) == (10, 49.3682793876954, 9.55990880103963)
+    tsk = e.tsks[0]
+    assert tsk.dlts[0].ddi == 0xDFFF
+    assert tsk.grds[0].maximum_column == 33
+    assert tsk.grds[0].cell_north_size == 8.928038554500972e-05
+    assert e.vpns[0].scale == 0.01
+    assert e.pdts[0].quanity_ddi == 0x004B
+    assert e.pfds[0].id == "PFD1"
+
+def test_typed_decimal():
+    ''' Test that decimals can be decoded losslessly '''
+    e = entity.Entity(full, decimal=True)
+    assert e.vpns[0].scale == decimal.Decimal("0.01")
+    assert e.vpns[0].offset == 0
+
+def test_raw():
+    ''' Test that raw keeps the attribute values as strings '''
+    e = entity.Entity(full, raw=True)
+    assert e.pfds[0].plns[0].lsgs[0].pnts[0].north == "49.3682793876954"
+    assert e.tsks[0].dlts[0].ddi == "DFFF"
+
+def test_typed_invalid():
+    ''' Test that values that cannot be decoded raise an exception '''
+    with pytest.raises(exception.ISOXMLParseException):
+        entity.Entity('<PNT A="10" C="north" D="9.5" />')
+
+def test_compact_init():
+    ''' Test that Entity(data) rejects compact and fromstring builds a compact root '''
+    with pytest.raises(exception.ISOXMLException):
+        entity.Entity(full, compact=True)
+    assert type(entity.fromstring(full, compact=True)) is entity.compact_class("ISO11783_TaskData")
+
+def test_compact_pickle():
+    ''' Test that compact entities survive pickling '''
+    e = entity.fromstring(full, compact=True, keep_element=False)
+    assert _tree(pickle.loads(pickle.dumps(e))) == _tree(e)
+    assert type(e.pfds[0]) is entity.PFD
+    with pytest.raises(AttributeError):
+        entity.FOO
+
+def test_compact_memory():
+    ''' Test that compact entities retain fewer bytes per entity than the generic class '''
+    data = _boundary(10000)
+
+    def size(**kwargs):
+        tracemalloc.start()
+        e = entity.fromstring(data, **kwargs)
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        assert len(e.pfds[0].plns[0].lsgs[0].pnts) == 10000
+        return current / 10000
+
+    generic = size()
+    compact = size(compact=True, keep_element=False)
+    assert compact < 0.6 * generic
+
+def test_include():
+    ''' Test that only included child tags are parsed '''
+    e = entity.Entity(full, include={"TSK", "DLT"})
+    assert not hasattr(e, "pfds")
+    assert e.tsks[0].dlts[0].ddi == 0xDFFF
+    assert not hasattr(e.tsks[0], "tzns")
+
+def test_exclude():
+    ''' Test that excluded child tags are skipped with their subtree '''
+    e = entity.fromstring(full, exclude=["PNT", "TZN"], compact=True)
+    assert not hasattr(e.pfds[0].plns[0].lsgs[0], "pnts")
+    assert not hasattr(e.tsks[0], "tzns")
+    assert e.tsks[0].grds[0].grid_type == 2
+
+def test_lazy():
+    ''' Test that deferred child entity lists are parsed on first access '''
+    idx = index.Index()
+    for compact in (False, True):
+        e = entity.fromstring(full, lazy={"PNT", "TSK"}, compact=compact, keep_element=False, index=idx)
+        lsg = e.pfds[0].plns[0].lsgs[0]
+        assert "pnts" not in lsg._fields() and "tsks" not in e._fields()
+        assert idx.resolve("TSK1") is None
+        assert len(lsg.pnts) == 38
+        assert lsg.pnts[0].element is None
+        assert e.tsks[0].id == "TSK1"
+        assert idx.resolve("TSK1") is e.tsks[0]
+        assert e.ctrs[0].element is None
+        assert not hasattr(lsg, "lsgs")
+        idx = index.Index()
+
+def test_lazy_pickle():
+    ''' Test that deferred child entity lists survive pickling '''
+    idx = index.Index()
+    for compact in (False, True):
+        e = entity.fromstring(full, lazy={"PNT", "TSK"}, compact=compact, keep_element=False, index=idx)
+        copy = pickle.loads(pickle.dumps(e))
+        lsg = copy.pfds[0].plns[0].lsgs[0]
+        assert "pnts" not in lsg._fields() and "tsks" not in copy._fields()
+        assert len(lsg.pnts) == 38
+        assert copy.tsks[0].id == "TSK1"
+        assert e.tsks and e.pfds[0].plns[0].lsgs[0].pnts
+        assert _tree(copy) == _tree(e)
+
+def test_lazy_all():
+    ''' Test that lazy=True defers every child entity list '''
+    e = entity.Entity(full, lazy=True, exclude=["PFD"])
+    assert e._fields().keys() == {"version_major", "version_minor", "management_software_manufacturer",
+                                  "management_software_version", "data_transfer_origin"}
+    assert e.tsks[0].tzns[1].pdvs[0].value == 0
+    assert not hasattr(e, "pfds")
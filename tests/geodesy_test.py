@@ -0,0 +1,74 @@
+''' Test cases for isoxml.geodesy '''
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from isoxml import entity, geodesy, geometry  # noqa: E402
+
+def _meridian_arc(north):
+    ''' Returns the length of the meridian from the equator to north by numeric integration '''
+    lat = np.linspace(0, np.radians(north), 200001)
+    m = geodesy.A * (1 - geodesy.E2) / (1 - geodesy.E2 * np.sin(lat) ** 2) ** 1.5
+    return float(((m[1:] + m[:-1]) / 2 * np.diff(lat)).sum())
+
+def test_distance():
+    ''' Test Vincenty's inverse formula against the Flinders Peak - Buninyong reference '''
+    d = geodesy.distance(-(37 + 57 / 60 + 3.72030 / 3600), 144 + 25 / 60 + 29.52440 / 3600,
+                         -(37 + 39 / 60 + 10.15610 / 3600), 143 + 55 / 60 + 35.38390 / 3600)
+    assert d == pytest.approx(54972.271, abs=1e-3)
+    assert geodesy.distance(0, 0, 0, 1) == pytest.approx(111319.491, abs=1e-3)
+    d = geodesy.distance([48, 48], [9, 9], [48, 49], [9, 9])
+    assert d.tolist() == pytest.approx([0, _meridian_arc(49) - _meridian_arc(48)])
+    assert np.isnan(geodesy.distance(0, 0, 0.5, 179.7))
+
+def test_utm():
+    ''' Test the transverse Mercator projection on the central meridian and zones '''
+    easting, northing, zone = geodesy.utm(np.array([45.0, -45.0]), np.array([9.0, 9.0]))
+    assert zone == 32
+    assert easting.tolist() == pytest.approx([500000, 500000])
+    assert northing[0] == pytest.approx(0.9996 * _meridian_arc(45), abs=1e-3)
+    assert northing[1] == pytest.approx(10000000 - northing[0], abs=1e-3)
+
+    # point scale at 3 degrees from the central meridian: k0 (1 + (dlon cos lat)^2 / 2)
+    x, y = geodesy.transverse_mercator(48.0, [12.0, 12.0001], 9)
+    scale = np.hypot(np.diff(x), np.diff(y))[0] / geodesy.distance(48.0, 12.0, 48.0, 12.0001)
+    assert scale == pytest.approx(0.9996 * (1 + (np.radians(3) * np.cos(np.radians(48))) ** 2 / 2), abs=2e-6)
+
+    assert geodesy.utm_zone([48, 60, 78, 78, -10], [9.5, 5, 10, 40, -179]).tolist() == [32, 32, 33, 37, 1]
+
+def test_enu():
+    ''' Test that local coordinates keep distances and the up direction '''
+    e, n, u = geodesy.enu([48.001, 48.0, 48.0], [9.0, 9.001, 9.0], [0, 0, 100], origin=(48.0, 9.0))
+    assert e[0] == pytest.approx(0, abs=1e-9) and n[0] == pytest.approx(geodesy.distance(48, 9, 48.001, 9), abs=1e-3)
+    assert e[1] == pytest.approx(geodesy.distance(48, 9, 48, 9.001), abs=1e-3)
+    assert (e[2], n[2], u[2]) == pytest.approx((0, 0, 100), abs=1e-6)
+
+    x, y, z = geodesy.ecef(0, 90)
+    assert (x, y, z) == pytest.approx((0, geodesy.A, 0), abs=1e-6)
+
+def test_area():
+    ''' Test areas of a field with a hole against local planar coordinates and grid cells '''
+    corners = [(48.0, 9.0), (48.0, 9.01), (48.01, 9.01), (48.01, 9.0)]
+    hole = [(48.004, 9.004), (48.004, 9.005), (48.005, 9.005), (48.005, 9.004)]
+    rings = "".join(
+        f'<LSG A="{t}">' + "".join(f'<PNT A="2" C="{n}" D="{e}" />' for n, e in ring + ring[:1]) + "</LSG>"
+        for t, ring in ((1, corners), (2, hole)))
+    pln = entity.fromstring(f'<PLN A="1">{rings}</PLN>')
+
+    points = geometry.rings(pln)[0][1]
+    e, n, _ = geodesy.enu(points.north, points.east)
+    planar = geometry.Points(north=n, east=e, type=points.type).area()
+    assert geodesy.area(points) == pytest.approx(planar, rel=1e-4)
+    assert geodesy.length(points) == pytest.approx(2 * 1112.0 + 2 * 744.6, rel=1e-3)
+    assert geodesy.pln_area(pln) == pytest.approx(geodesy.area(points) * 0.99, rel=1e-4)
+
+    # orientation and closing point do not matter, the cells of a grid over the field add up
+    assert geodesy.polygon_area(points.north[::-1], points.east[::-1]) == pytest.approx(geodesy.area(points))
+    assert geodesy.polygon_area(points.north[:-1], points.east[:-1]) == pytest.approx(geodesy.area(points))
+    grd = entity.fromstring('<GRD A="48" B="9" C="0.001" D="0.001" E="10" F="10" G="GRD00001" I="1" />')
+    cells = geodesy.cell_areas(grd)
+    assert cells.shape == (10,) and cells[0] > cells[-1]
+    assert cells.sum() * 10 == pytest.approx(geodesy.area(points), rel=1e-6)
+
+    # the authalic sphere has the surface of the ellipsoid
+    assert 4 * np.pi * geodesy.R_AUTHALIC ** 2 == pytest.approx(510065621.7e6, rel=1e-9)
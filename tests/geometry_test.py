@@ -0,0 +1,44 @@
+''' Test cases for isoxml.geometry '''
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from isoxml import entity, geometry  # noqa: E402
+
+square = """
+<PLN A="1">
+    <LSG A="1">
+        <PNT A="10" C="0" D="0" E="5" />
+        <PNT A="10" C="0" D="2" />
+        <PNT A="10" C="1" D="2" />
+        <PNT A="10" C="1" D="0" />
+        <PNT A="10" C="0" D="0" />
+    </LSG>
+</PLN>
+"""
+
+def test_columnar():
+    ''' Test that LSG points are parsed into columns instead of PNT entities '''
+    pln = entity.fromstring(square, columnar=True)
+    lsg = pln.lsgs[0]
+    assert not hasattr(lsg, "pnts")
+    points = lsg.points
+    assert len(points) == 5
+    assert points.north.tolist() == [0, 0, 1, 1, 0]
+    assert points.type.tolist() == [10] * 5
+    assert points.up[0] == 5 and np.isnan(points.up[1])
+    assert points.horizontal_accuracy is None
+
+def test_measures():
+    ''' Test bounding box, length and area of a ring '''
+    points = geometry.points(entity.fromstring(square, compact=True).lsgs[0])
+    assert points.bbox() == (0, 0, 1, 2)
+    assert points.length() == 6
+    assert points.area() == 2
+
+def test_points_without_element():
+    ''' Test that points can be built from PNT entities once the element is dropped '''
+    pln = entity.fromstring(square, keep_element=False)
+    (lsg_type, points), = geometry.rings(pln)
+    assert lsg_type == 1
+    assert points.east.tolist() == [0, 2, 2, 0, 0]
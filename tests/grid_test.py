@@ -0,0 +1,39 @@
+''' Test cases for isoxml.grid '''
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from isoxml import entity, exception, grid  # noqa: E402
+
+tsk = """
+<TSK A="TSK1" G="1">
+    <TZN A="1" B="Zone 1"><PDV A="0006" B="100" /><PDV A="0001" B="5" /></TZN>
+    <TZN A="2" B="Zone 2"><PDV A="0006" B="200" /><PDV A="0001" B="7" /></TZN>
+    <GRD A="49.0" B="9.0" C="0.001" D="0.002" E="3" F="2" G="GRD00001" I="{grid_type}" J="1" />
+</TSK>
+"""
+
+def test_grid_type_1(tmp_path):
+    ''' Test that a grid of TZN codes is memory-mapped as (rows, columns) '''
+    t = entity.Entity(tsk.format(grid_type=1))
+    (tmp_path / "GRD00001.BIN").write_bytes(bytes([1, 1, 2, 2, 2, 1]))
+    cells = grid.open(t.grds[0], str(tmp_path))
+    assert isinstance(cells, np.memmap)
+    assert cells.tolist() == [[1, 1, 2], [2, 2, 1]]
+
+def test_grid_type_2():
+    ''' Test that a grid of process values is shaped (rows, columns, PDVs) '''
+    t = entity.Entity(tsk.format(grid_type=2))
+    data = np.arange(12, dtype="<i4").tobytes()
+    cells = grid.from_buffer(t.grds[0], data, t)
+    assert cells.shape == (2, 3, 2)
+    assert cells[1, 0].tolist() == [6, 7]
+    assert grid.from_buffer(t.grds[0], data).shape == (2, 3, 2)
+
+def test_grid_length():
+    ''' Test that the file length is validated against the GRD dimensions '''
+    t = entity.Entity(tsk.format(grid_type=2))
+    with pytest.raises(exception.ISOXMLParseException):
+        grid.from_buffer(t.grds[0], bytes(16), t)
+    with pytest.raises(exception.ISOXMLParseException):
+        grid.from_buffer(entity.Entity(tsk.format(grid_type=1)).grds[0], bytes(5))
@@ -0,0 +1,44 @@
+''' Test cases for isoxml.index '''
+from isoxml import entity, index
+
+taskdata = """<ISO11783_TaskData VersionMajor="4" VersionMinor="0" ManagementSoftwareManufacturer="GaiaData"
+    ManagementSoftwareVersion="1.0.0" DataTransferOrigin="1">
+    <CTR A="CTR1" B="Farmer" />
+    <PFD A="PFD1" C="Field" D="1" E="CTR1" />
+    <PFD A="PFD2" C="Field 2" D="2" E="CTR1" />
+    <PDT A="PDT1" B="Fertilizer" />
+    <TSK A="TSK1" G="1" E="PFD1" C="CTR1">
+        <TZN A="1"><PDV A="0006" B="100" C="PDT1" E="VPN9" /></TZN>
+    </TSK>
+    <TSK A="TSK2" G="1" E="PFD1" />
+    <TSK A="TSK1" G="1" E="PFD2" />
+</ISO11783_TaskData>"""
+
+def test_index():
+    ''' Test that ids and references are indexed while parsing '''
+    idx = index.Index()
+    root = entity.Entity(taskdata, index=idx)
+
+    assert idx.resolve("PFD1") is root.pfds[0]
+    assert idx.resolve("TSK1") is root.tsks[0]
+    assert idx.resolve("PDT2") is None
+    assert [t.id for t in idx.referencing("PFD1", tag="TSK")] == ["TSK1", "TSK2"]
+    assert [e.tag() for e in idx.referencing("CTR1")] == ["PFD", "PFD", "TSK"]
+    assert [e.tag() for e in idx.referencing("CTR1", attribute="ctr_id_ref", tag="PFD")] == ["PFD", "PFD"]
+    assert idx.referencing("PDT1")[0].ddi == 6
+    assert idx.duplicates == [root.tsks[2]]
+
+def test_dangling():
+    ''' Test that references to unknown ids are reported '''
+    idx = index.Index()
+    entity.Entity(taskdata, index=idx)
+    (ref,) = idx.dangling()
+    assert (ref.entity.tag(), ref.attribute, ref.id) == ("PDV", "vpn_id_ref", "VPN9")
+
+def test_add_tree():
+    ''' Test that an index built after parsing matches the one built while parsing '''
+    idx, built = index.Index(), index.Index()
+    root = entity.fromstring(taskdata, index=idx, compact=True)
+    built.add_tree(root)
+    assert built.ids == idx.ids
+    assert built.references.keys() == idx.references.keys()
@@ -0,0 +1,65 @@
+''' Test cases for isoxml.parallel '''
+import concurrent.futures
+
+import pytest
+
+from isoxml import entity, exception, index, parallel, stats
+from .entity_test import full, _tree
+from .index_test import taskdata
+
+@pytest.fixture(scope="module")
+def executor():
+    with concurrent.futures.ProcessPoolExecutor(max_workers=2) as pool:
+        yield pool
+
+@pytest.mark.parametrize("chunk_size", [1, 200, None])
+def test_parse(executor, chunk_size):
+    ''' Test that parallel parsing gives the same entities as sequential parsing '''
+    data = full.encode()
+    result = parallel.parse(data, executor=executor, chunk_size=chunk_size)
+    assert _tree(result) == _tree(entity.fromstring(full, keep_element=False))
+
+def test_parse_file(executor, tmp_path):
+    ''' Test that workers read the chunks of a file themselves '''
+    path = tmp_path / "TASKDATA.XML"
+    path.write_bytes(b'<?xml version="1.0" encoding="UTF-8"?>\n<!-- export -->' + taskdata.encode())
+
+    result = parallel.parse(str(path), executor=executor, chunk_size=1, compact=True, backend="expat")
+    assert _tree(result) == _tree(entity.fromstring(taskdata, compact=True))
+    assert [t.id for t in result.tsks] == ["TSK1", "TSK2", "TSK1"]
+
+def test_parse_index(executor):
+    ''' Test that the index is filled in the same order as by a sequential parse '''
+    idx = index.Index()
+    root = parallel.parse(taskdata.encode(), executor=executor, chunk_size=1, index=idx)
+    assert idx.resolve("TSK1") is root.tsks[0]
+    assert idx.duplicates == [root.tsks[2]]
+    assert [e.tag() for e in idx.referencing("CTR1")] == ["PFD", "PFD", "TSK"]
+
+def test_parse_duplicates(executor):
+    ''' Test that duplicate Ids within and across chunks are in document order '''
+    first = '<CTR A="CTR1" B="Farmer with a much longer name" />'
+    data = taskdata.split("<CTR")[0] + first + '<CTR A="CTR2" B="F" />' * 2 + '<CTR A="CTR1" B="F" /></ISO11783_TaskData>'
+    expected = index.Index()
+    entity.fromstring(data, index=expected)
+
+    # the first CTR is a chunk of its own, the others are one chunk
+    idx = index.Index()
+    root = parallel.parse(data.encode(), executor=executor, chunk_size=len(first), index=idx)
+    assert idx.duplicates == [root.ctrs[2], root.ctrs[3]]
+    assert [e.last_name for e in idx.duplicates] == [e.last_name for e in expected.duplicates]
+    assert list(idx.ids) == list(expected.ids)
+
+def test_parse_empty():
+    ''' Test that documents without top-level children are parsed in this process '''
+    data = taskdata.split(">")[0].encode() + b" />"
+    assert parallel.parse(data).version_major == 4
+
+def test_parse_fail():
+    ''' Test that invalid documents and unsupported options are rejected '''
+    with pytest.raises(exception.ISOXMLParseException):
+        parallel.parse(b"<ISO11783_TaskData><PFD>")
+    with pytest.raises(exception.ISOXMLException):
+        parallel.parse(full.encode(), keep_element=True)
+    with pytest.raises(exception.ISOXMLException):
+        parallel.parse(full.encode(), stats=stats.Stats())
@@ -0,0 +1,64 @@
+''' Test cases for isoxml.prescription '''
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from isoxml import entity, exception, grid, prescription  # noqa: E402
+
+vpn = entity.Entity('<VPN A="VPN1" B="0" C="0.01" D="2" />')
+
+tsk = """
+<TSK A="TSK1" G="1" J="0" {zone}>
+    <TZN A="0" B="Out of field"><PDV A="0006" B="0" /></TZN>
+    <TZN A="1" B="Zone 1">
+        <PDV A="0006" B="10000" E="VPN1" />
+        <PLN A="2"><LSG A="1">
+            <PNT A="2" C="0" D="0" /><PNT A="2" C="0" D="2" /><PNT A="2" C="2" D="2" /><PNT A="2" C="2" D="0" />
+        </LSG><LSG A="2">
+            <PNT A="2" C="0.5" D="0.5" /><PNT A="2" C="0.5" D="1" /><PNT A="2" C="1" D="1" /><PNT A="2" C="1" D="0.5" />
+        </LSG></PLN>
+    </TZN>
+    <TZN A="2" B="Zone 2"><PDV A="0006" B="20000" E="VPN1" /></TZN>
+    {grd}
+</TSK>
+"""
+
+grd = '<GRD A="0" B="0" C="1" D="1" E="2" F="2" G="GRD00001" I="{grid_type}" J="1" />'
+
+def test_grid_type_1():
+    ''' Test lookup of zone codes from a grid of TZN codes '''
+    t = entity.Entity(tsk.format(zone="", grd=grd.format(grid_type=1)))
+    cells = grid.from_buffer(t.grds[0], bytes([1, 2, 2, 1]))
+    p = prescription.Prescription(t, cells, [vpn])
+    codes, values = p.lookup([0.5, 0.5, 1.5, 5, np.nan], [0.5, 1.5, 0.5, 5, 0])
+    assert codes.tolist() == [1, 2, 2, 0, -1]
+    assert p.columns == [(6, None)]
+    assert values[:4, 0].tolist() == [100, 200, 200, 0]
+    assert np.isnan(values[4, 0])
+
+def test_grid_type_2():
+    ''' Test lookup of process values from a grid of values '''
+    t = entity.Entity(tsk.format(zone='I="2"', grd=grd.format(grid_type=2)))
+    cells = grid.from_buffer(t.grds[0], np.array([100, 200, 300, 400], dtype="<i4").tobytes(), t)
+    codes, values = prescription.Prescription(t, cells, [vpn]).lookup([0.5, 1.5, 9, np.nan], [1.5, 1.5, 9, 0])
+    assert codes.tolist() == [1, 1, 0, 2]
+    assert values[:, 0].tolist() == [2, 4, 0, 200]
+
+def test_polygons():
+    ''' Test zone lookup by TZN polygon containment, including holes '''
+    t = entity.Entity(tsk.format(zone='H="2"', grd=""))
+    codes, values = prescription.Prescription(t, vpns=[vpn]).lookup([0.25, 0.75, 3], [0.25, 0.75, 3])
+    assert codes.tolist() == [1, 2, 2]
+    assert values[:, 0].tolist() == [100, 200, 200]
+
+def test_missing_cells():
+    ''' Test that the grid cells are required for tasks with a grid '''
+    with pytest.raises(exception.ISOXMLException):
+        prescription.Prescription(entity.Entity(tsk.format(zone="", grd=grd.format(grid_type=1))))
+
+def test_missing_zone():
+    ''' Test that a grid of process values without PDVs of its TZN is rejected '''
+    t = entity.Entity(tsk.format(zone="", grd=grd.format(grid_type=2).replace('J="1"', 'J="7"')))
+    cells = np.zeros((2, 2, 1), dtype="<i4")
+    with pytest.raises(exception.ISOXMLParseException):
+        prescription.Prescription(t, cells, [vpn])
@@ -0,0 +1,64 @@
+''' Test cases for isoxml.query '''
+import pytest
+
+from isoxml import dataset, entity, exception, query
+from .index_test import taskdata
+from .dataset_test import source  # noqa: F401
+
+def _ids(entities):
+    return [e.id for e in entities]
+
+def test_select():
+    ''' Test paths with predicates on typed attributes '''
+    root = entity.fromstring(taskdata)
+    q = query.Query(root)
+
+    assert _ids(q.select("TSK")) == ["TSK1", "TSK2", "TSK1"]
+    assert _ids(q.select("PFD[ctr_id_ref=CTR1]")) == ["PFD1", "PFD2"]
+    assert _ids(q.select("PFD[area>1]")) == ["PFD2"]
+    assert _ids(q.select("TSK[pfd_id_ref=PFD1][ctr_id_ref]")) == ["TSK1"]
+    assert _ids(q.select("TSK[ pfd_id_ref != 'PFD1' ]")) == ["TSK1"]
+    assert q.select("TSK[ pfd_id_ref != 'PFD1' ]") is not q.select("TSK")
+
+    pdvs = list(q.select("TSK/TZN/PDV[pdt_id_ref=PDT1]"))
+    assert pdvs == root.tsks[0].tzns[0].pdvs
+    assert list(q.select("TSK/TZN/PDV[ddi=0006]")) == pdvs
+    assert list(q.select("TSK/*/PDV[ddi=6]")) == pdvs
+    assert list(q.select("TSK[id=TSK2]/TZN/PDV")) == []
+    assert list(q.select("PDV[ddi=xyz]")) == []
+    assert [e.tag() for e in q.select("*[ctr_id_ref=CTR1]")] == ["PFD", "PFD", "TSK"]
+    assert q.first("*[id=PDT1]").designator == "Fertilizer"
+    assert q.count("TZN") == 1
+
+    assert q.parent(pdvs[0]) is root.tsks[0].tzns[0]
+    assert [e.tag() for e in q.ancestors(pdvs[0])] == ["TZN", "TSK", "ISO11783_TaskData"]
+
+def test_plan():
+    ''' Test that predicates on an Id or IdRef are answered from the index '''
+    q = query.Query(entity.fromstring(taskdata))
+    q.entities["TSK"] = []
+    assert _ids(q.select("TSK[pfd_id_ref=PFD1]")) == ["TSK1", "TSK2"]
+    assert _ids(q.select("*[id=TSK2]")) == ["TSK2"]
+    assert _ids(q.select("TSK[pfd_id_ref!=PFD1]")) == []
+
+def test_duplicate_id():
+    ''' Test that the index plan for an Id finds entities with a duplicate Id like a full scan '''
+    q = query.Query(entity.fromstring(taskdata))
+    assert len(q.index.duplicates) == 1
+    assert list(q.select("TSK[id=TSK1]")) == [e for e in q.select("TSK") if e.id == "TSK1"]
+    assert len(list(q.select("*[id=TSK1]"))) == 2
+    assert list(q.select("PFD[id=TSK1]")) == []
+
+def test_invalid():
+    ''' Test that invalid paths raise an exception when the query is made '''
+    q = query.Query(entity.fromstring(taskdata))
+    for path in ["TSK//PDV", "FOO", "TSK[", "TSK[a b]"]:
+        with pytest.raises(exception.ISOXMLException):
+            q.select(path)
+
+def test_dataset(source):  # noqa: F811
+    ''' Test queries over TASKDATA.XML and its external files '''
+    with dataset.open(source) as d:
+        q = d.query()
+        assert _ids(q.select("XFC/TSK[pfd_id_ref=PFD1]")) == ["TSK1"]
+        assert _ids(q.select("PFD")) == ["PFD1", "PFD2"]
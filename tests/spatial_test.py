@@ -0,0 +1,70 @@
+''' Test cases for isoxml.spatial '''
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from isoxml import entity, geometry, spatial  # noqa: E402
+
+def _ring(lsg_type, corners):
+    pnts = "".join(f'<PNT A="2" C="{n}" D="{e}" />' for n, e in corners + corners[:1])
+    return f'<LSG A="{lsg_type}">{pnts}</LSG>'
+
+def _square(n, e, size):
+    return [(n, e), (n, e + size), (n + size, e + size), (n + size, e)]
+
+def _pfd(id, *plns):
+    return entity.fromstring(f'<PFD A="{id}" C="{id}" D="1">{"".join(plns)}</PFD>')
+
+# field with a hole, a field made of two polygons and a field with only an obstacle
+fields = [
+    _pfd("PFD1", f'<PLN A="1">{_ring(1, _square(0, 0, 2))}{_ring(2, _square(0.5, 0.5, 0.5))}</PLN>'),
+    _pfd("PFD2", f'<PLN A="1">{_ring(1, _square(0, 3, 1))}</PLN>', f'<PLN A="1">{_ring(1, _square(5, 5, 1))}</PLN>'),
+    _pfd("PFD3", f'<PLN A="6">{_ring(1, _square(10, 10, 1))}</PLN>'),
+]
+
+def test_query():
+    ''' Test assignment of positions to fields, holes and positions outside all fields '''
+    index = spatial.FieldIndex(fields)
+    assert len(index) == 3
+    north = [1.5, 0.75, 0.5, 5.5, 10.5, -1, np.nan, 2.5]
+    east = [1.5, 0.75, 3.5, 5.5, 10.5, -1, 0, 0.5]
+    assert index.query(north, east).tolist() == ["PFD1", None, "PFD2", "PFD2", None, None, None, None]
+    assert index.locate(north, east).tolist() == [0, -1, 1, 1, -1, -1, -1, -1]
+    assert index.bbox() == (0, 0, 6, 6)
+
+def test_types():
+    ''' Test that polygons of other PLN types are indexed when requested '''
+    index = spatial.FieldIndex(fields, types=(1, 6))
+    assert index.query([10.5], [10.5]).tolist() == ["PFD3"]
+
+def test_shape():
+    ''' Test that the shape of the positions is kept '''
+    index = spatial.FieldIndex(fields, cell_size=0.25)
+    ids = index.locate(np.full((2, 3), 1.5), np.full((2, 3), 1.5))
+    assert ids.shape == (2, 3) and (ids == 0).all()
+
+def test_empty():
+    ''' Test an index without polygons '''
+    index = spatial.FieldIndex([_pfd("PFD1")])
+    assert index.ids == ["PFD1"] and len(index) == 0
+    assert index.bbox() is None
+    assert index.query([0], [0]).tolist() == [None]
+
+def test_random():
+    ''' Test the index against the point in polygon test of every field '''
+    rng = np.random.default_rng(1)
+    pfds = []
+    for i in range(30):
+        n, e = rng.uniform(0, 1, 2)
+        corners = [(round(n + 0.05 * np.sin(a), 6), round(e + 0.08 * np.cos(a), 6)) for a in rng.uniform(0, 6.28, 7)]
+        corners.sort(key=lambda c: np.arctan2(c[0] - n, c[1] - e))
+        pfds.append(_pfd(f"PFD{i}", f'<PLN A="1">{_ring(1, corners)}</PLN>'))
+
+    north, east = rng.uniform(-0.1, 1.1, (2, 5000))
+    expected = np.full(len(north), -1)
+    for i, pfd in reversed(list(enumerate(pfds))):
+        rings = [ring for _, ring in geometry.rings(pfd.plns[0])]
+        expected[geometry.contains(rings, north, east)] = i
+
+    for cell_size in (None, 0.01, 0.5):
+        assert (spatial.FieldIndex(pfds, cell_size=cell_size).locate(north, east) == expected).all()
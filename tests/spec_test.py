@@ -5,3 +5,29 @@ def test_init():
     '''test init which may raise ISOXMLInitException'''
     spec.init()
     assert True
+
+def test_schema():
+    ''' Test that schemas are compiled once with snake_case names '''
+    pnt = spec.schema("PNT")
+    assert pnt is spec.schema("PNT")
+    assert pnt.attributes["C"] == "north"
+    assert "north" in pnt.required
+    assert spec.schema("TSK").attributes["E"] == "pfd_id_ref"
+    assert ("TZN", "tzns") in spec.schema("TSK").children
+
+def test_schema_unknown():
+    ''' Test that unknown tags have no schema '''
+    assert spec.schema("FOO") is None
+
+def test_snake_case():
+    ''' Test CamelCase to snake_case conversion '''
+    assert spec.snake_case("ManagementSoftwareVersion") == "management_software_version"
+
+def test_schema_types():
+    ''' Test that attribute types are compiled into converters '''
+    pnt = spec.schema("PNT")
+    assert pnt.types["north"] == "decimal"
+    assert pnt.converters["north"]("49.5") == 49.5
+    assert str(pnt.decimal_converters["north"]("49.50")) == "49.50"
+    assert spec.schema("DLV").converters["ddi"]("DFFF") == 0xDFFF
+    assert "designator" not in pnt.converters
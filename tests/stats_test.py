@@ -0,0 +1,100 @@
+''' Test cases for isoxml.stats '''
+import io
+import tracemalloc
+import xml.etree.ElementTree
+
+import pytest
+
+from isoxml import entity, exception, index, stats
+from .entity_test import full, _tree
+from .index_test import taskdata
+
+def _counts(e, counts=None):
+    counts = {} if counts is None else counts
+    counts[e.tag()] = counts.get(e.tag(), 0) + 1
+    for value in e._fields().values():
+        if isinstance(value, list):
+            for child in value:
+                _counts(child, counts)
+    return counts
+
+@pytest.mark.parametrize("backend", ["etree", "expat"])
+def test_fromstring(backend):
+    ''' Test that counts, timings and sizes are collected without changing the result '''
+    calls = []
+    s = stats.Stats(callback=calls.append)
+    root = entity.fromstring(full, backend=backend, stats=s, compact=True)
+
+    assert _tree(root) == _tree(entity.fromstring(full, backend=backend, compact=True))
+    assert s.counts == _counts(root)
+    assert s.counts["PNT"] == 38
+    assert set(s.seconds) == set(s.counts)
+    assert s.elapsed >= sum(s.seconds.values()) > 0
+    assert s.documents == 1
+    assert s.bytes_read == len(full)
+    assert s.peak_memory is None
+    assert calls == [s]
+
+    d = s.as_dict()
+    assert d["tags"]["PNT"]["count"] == 38
+    assert "PNT" in s.report()
+
+def test_index():
+    ''' Test that the index is filled in the same order as without stats '''
+    expected, idx = index.Index(), index.Index()
+    entity.fromstring(taskdata, index=expected)
+    root = entity.fromstring(taskdata, index=idx, stats=stats.Stats())
+    assert idx.duplicates == [root.tsks[2]]
+    assert [e.id for e in idx.ids.values()] == [e.id for e in expected.ids.values()]
+
+def test_entry_points(tmp_path):
+    ''' Test Entity, from_element, iterparse and file objects of the expat backend '''
+    s = stats.Stats()
+    entity.Entity(full, stats=s)
+    entity.Entity.from_element(xml.etree.ElementTree.fromstring(full), stats=s, exclude=["PNT"])
+    assert s.documents == 2
+    assert s.counts["PNT"] == 38
+    assert s.counts["LSG"] == 2
+
+    path = tmp_path / "TASKDATA.XML"
+    path.write_text(full)
+    s = stats.Stats()
+    tops = list(entity.iterparse(str(path), stats=s))
+    assert s.counts["PNT"] == 38 and "ISO11783_TaskData" not in s.counts
+    assert s.counts["CTR"] == sum(1 for e in tops if e.tag() == "CTR")
+    assert s.bytes_read == path.stat().st_size
+
+    s = stats.Stats()
+    entity.fromstring(io.BytesIO(full.encode()), backend="expat", stats=s)
+    assert s.bytes_read == len(full.encode())
+
+@pytest.mark.parametrize("backend", ["etree", "expat"])
+def test_bytes_read(backend):
+    ''' Test that strings are counted in encoded bytes, not characters '''
+    data = '<CTR A="CTR1" B="Bäuerin Müller" />'
+    s = stats.Stats()
+    entity.fromstring(data, backend=backend, stats=s)
+    entity.Entity(data, stats=s)
+    assert s.bytes_read == 2 * len(data.encode()) == 2 * (len(data) + 2)
+
+def test_memory():
+    ''' Test that the peak memory is traced while parsing '''
+    s = stats.Stats(memory=True)
+    entity.fromstring(full, stats=s)
+    assert s.peak_memory > len(full)
+    assert not tracemalloc.is_tracing()
+
+    other = stats.Stats()
+    entity.fromstring(taskdata, stats=other)
+    s.merge(other)
+    assert s.documents == 2
+    assert s.counts["TSK"] == 4
+
+def test_invalid():
+    ''' Test that lazy parsing is rejected and failed documents are not counted '''
+    s = stats.Stats()
+    with pytest.raises(exception.ISOXMLException):
+        entity.fromstring(full, stats=s, lazy=True)
+    with pytest.raises(exception.ISOXMLParseException):
+        entity.fromstring('<PNT A="1" />', stats=s)
+    assert s.documents == 0
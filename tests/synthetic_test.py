@@ -0,0 +1,27 @@
+''' Test cases for benchmarks.synthetic '''
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from isoxml import dataset  # noqa: E402
+from benchmarks import synthetic  # noqa: E402
+
+def test_generate(tmp_path):
+    ''' Test that a generated set opens with its time logs and grids '''
+    counts = synthetic.generate(str(tmp_path), tasks=2, vertices=8, depth=2, records=5, grid=(2, 3))
+    assert counts["TSK"] == 2 and counts["PNT"] == 18
+
+    with dataset.open(str(tmp_path)) as ds:
+        assert [t.id for t in ds.tsks] == ["TSK1", "TSK2"]
+        assert [p.id for p in ds.pfds] == ["PFD1", "PFD2"]
+        assert len(ds.dvcs[0].dets) == counts["DET"]
+
+        tsk = ds.tsks[1]
+        with ds.timelog(tsk.tlgs[0]) as log:
+            records = log.read()
+        assert len(records) == 5
+        assert records["present"].any()
+
+        cells = ds.grid(tsk.grds[0], tsk)
+        assert cells.shape[:2] == (2, 3)
+        assert ((cells >= 50000) & (cells < 200000)).all()
@@ -0,0 +1,132 @@
+''' Test cases for isoxml.timelog '''
+import os
+import struct
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from isoxml import exception, timelog  # noqa: E402
+
+header = """<TIM A="" D="4">
+    <PTN A="" B="" D="" G="" />
+    <DLV A="0001" B="" C="DET-1" />
+    <DLV A="008D" B="" C="DET-2" />
+</TIM>"""
+
+def record(ms, days, north, east, status, satellites, dlvs):
+    ''' Encodes a binary record matching header '''
+    data = struct.pack("<IHiiBB", ms, days, north, east, status, satellites)
+    data += struct.pack("<B", len(dlvs))
+    for index, value in dlvs:
+        data += struct.pack("<Bi", index, value)
+    return data
+
+records = [
+    record(36000000, 15706, 493682793, 95599088, 1, 12, [(0, 100), (1, 1)]),
+    record(36001000, 15706, 493682800, 95599090, 1, 12, []),
+    record(36002000, 15706, 493682810, 95599095, 4, 11, [(1, 0)]),
+]
+
+def test_header():
+    ''' Test that the header template is parsed into binary fields '''
+    h = timelog.parse_header(header)
+    assert [f.name for f in h.fields] == ["time", "date", "north", "east", "status", "number_of_satellites"]
+    assert h.size == 6 + 4 + 4 + 1 + 1
+    assert h.dlvs == ((1, "DET-1"), (0x8D, "DET-2"))
+    assert h.constants == {"D": "4"}
+
+def test_read():
+    ''' Test that records are decoded into a structured array '''
+    log = timelog.TimeLog(header, b"".join(records))
+    assert len(log) == 3
+    r = log.read()
+    assert r["time"][0] == np.datetime64("2023-01-01T10:00:00", "ms")
+    assert r["north"][0] == pytest.approx(49.3682793)
+    assert r["east"][2] == pytest.approx(9.5599095)
+    assert r["status"].tolist() == [1, 1, 4]
+    assert r["values"].tolist() == [[100, 1], [0, 0], [0, 0]]
+    assert r["present"].tolist() == [[True, True], [False, False], [False, True]]
+
+def test_chunks():
+    ''' Test that chunked decoding returns the same records as a full read '''
+    log = timelog.TimeLog(header, b"".join(records * 100))
+    chunks = list(log.chunks(size=64))
+    assert [len(c) for c in chunks] == [64, 64, 64, 64, 44]
+    assert (np.concatenate(chunks) == log.read()).all()
+
+def test_truncated():
+    ''' Test that a truncated record raises an exception '''
+    log = timelog.TimeLog(header, b"".join(records)[:-3])
+    with pytest.raises(exception.ISOXMLParseException):
+        log.read()
+
+def test_open(tmp_path):
+    ''' Test that a TLG is opened from its XML and memory-mapped BIN file '''
+    (tmp_path / "TLG00001.XML").write_text(header)
+    (tmp_path / "TLG00001.BIN").write_bytes(b"".join(records))
+    with timelog.open(str(tmp_path / "TLG00001")) as log:
+        assert log.read()["number_of_satellites"].tolist() == [12, 12, 11]
+
+def _log(n):
+    ''' Returns a log of n records, one per second with a gap of an hour after the first half '''
+    data = []
+    for i in range(n):
+        ms = 36000000 + 1000 * i + (3600000 if i >= n // 2 else 0)
+        data.append(record(ms, 15706, 0, 0, 1, 12, [(0, i)] if i % 3 else []))
+    return timelog.TimeLog(header, b"".join(data))
+
+def test_index():
+    ''' Test that reads with a time index match reads of the scanned offsets '''
+    log = _log(300)
+    expected = log.read()
+    log = _log(300)
+    index = log.build_index(stride=16)
+    assert (index.count, len(index.offsets)) == (300, 19)
+    assert log._offsets is None and len(log) == 300
+    for start, stop in [(0, None), (0, 1), (15, 17), (100, 290), (290, 400), (-5, None), (50, 40)]:
+        assert (log.read(start, stop) == expected[start:stop]).all()
+    assert log._offsets is None
+
+    # the index of scanned offsets is the same
+    log.offsets()
+    assert log.build_index(stride=16).offsets.tolist() == index.offsets.tolist()
+
+def test_read_time():
+    ''' Test reads of time ranges, including ranges within the gap and open ends '''
+    log = _log(300)
+    log.build_index(stride=16)
+    r = log.read_time("2023-01-01T10:00:10", np.datetime64("2023-01-01T10:00:20"))
+    assert r["time"][0] == np.datetime64("2023-01-01T10:00:10") and len(r) == 10
+    assert r["values"][:, 0].tolist() == [0 if i % 3 == 0 else i for i in range(10, 20)]
+    assert len(log.read_time("2023-01-01T10:30")) == 150
+    assert len(log.read_time(stop="2023-01-01T10:30")) == 150
+    assert len(log.read_time("2023-01-01T10:05", "2023-01-01T11:00")) == 0
+    assert len(log.read_time()) == 300
+
+    # records out of time order are found in their block
+    data = b"".join(records[::-1])
+    assert len(timelog.TimeLog(header, data).read_time("2023-01-01T10:00:01", "2023-01-01T10:00:02")) == 1
+
+def test_sidecar(tmp_path):
+    ''' Test that the index is written to a sidecar file and reused or rebuilt '''
+    (tmp_path / "TLG00001.XML").write_text(header)
+    (tmp_path / "TLG00001.BIN").write_bytes(b"".join(records * 10))
+    path = str(tmp_path / "TLG00001")
+    with timelog.open(path, index=True) as log:
+        assert log.index.count == 30
+    assert timelog.read_index(path + timelog.INDEX_SUFFIX).count == 30
+    with timelog.open(path, index=True) as log:
+        assert log.index.count == 30 and log._offsets is None
+
+    # a sidecar of different data is rebuilt
+    (tmp_path / "TLG00001.BIN").write_bytes(b"".join(records * 20))
+    os.utime(path + timelog.INDEX_SUFFIX, (0, 1e10))
+    with timelog.open(path, index=True) as log:
+        assert log.index.count == 60
+
+    with pytest.raises(exception.ISOXMLException):
+        timelog.TimeLog(header, b"".join(records), log.index)
+    (tmp_path / "TLG00001.IDX").write_bytes(b"ISOXMLT1")
+    with pytest.raises(exception.ISOXMLParseException):
+        timelog.read_index(path + timelog.INDEX_SUFFIX)
@@ -0,0 +1,130 @@
+''' Test cases for isoxml.writer '''
+import io
+import pickle
+import random
+import xml.etree.ElementTree
+import zipfile
+
+import pytest
+
+from isoxml import dataset, entity, exception, spec, writer
+from .entity_test import full, _tree
+from .index_test import taskdata
+
+_chars = "abcXYZ019 _-.,;:/&<>\"'\n\täöß€"
+
+def _value(rng, type):
+    ''' Returns a random XML value of a spec type '''
+    if type == "hex":
+        return f"{rng.randrange(0x10000):04X}"
+    if type == "int":
+        return str(rng.randrange(-2 ** 31, 2 ** 31))
+    if type == "enum":
+        return str(rng.randrange(256))
+    if type == "decimal":
+        return f"{rng.uniform(-1e4, 1e4) * 10 ** -rng.randrange(8):.{rng.randrange(12)}f}"
+    return "".join(rng.choice(_chars) for _ in range(rng.randrange(1, 12)))
+
+def _element(rng, tag, depth=0):
+    ''' Returns a random element of tag with random attributes and children following the spec '''
+    definition = spec.init_tag(tag)
+    names = definition["map"] or {name: name for name in definition["required"]}
+
+    attrib = {}
+    for code, name in names.items():
+        if name in definition["required"] or rng.random() < 0.5:
+            attrib[code] = _value(rng, definition["types"].get(name))
+    # attributes that are not part of the spec, also with names snake_case cannot restore
+    for name in ("VendorInfo", "P094_Quality", "quality"):
+        if rng.random() < 0.2:
+            attrib[name] = _value(rng, None)
+
+    element = xml.etree.ElementTree.Element(tag, attrib)
+    if depth < 3:
+        for ctag in definition["ctags"]:
+            if rng.random() < 0.3:
+                element.extend(_element(rng, ctag, depth + 1) for _ in range(rng.randrange(1, 3)))
+    return element
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("options", [{}, {"compact": True}, {"raw": True}, {"decimal": True}])
+def test_roundtrip(seed, options):
+    ''' Test that parse, write and parse again gives the same entities for random documents '''
+    element = _element(random.Random(seed), "ISO11783_TaskData")
+    data = xml.etree.ElementTree.tostring(element)
+    parsed = pickle.loads(pickle.dumps(entity.fromstring(data, keep_element=False, **options)))
+    written = writer.tostring(parsed)
+    assert _tree(entity.fromstring(written, keep_element=False, **options)) == _tree(parsed)
+    names = [sorted(e.attrib) for e in xml.etree.ElementTree.fromstring(written).iter()]
+    assert names == [sorted(e.attrib) for e in element.iter()]
+    assert writer.tostring(entity.fromstring(written, **options)) == written
+
+def test_write():
+    ''' Test that attributes are written with short codes in spec order and typed values formatted '''
+    root = entity.fromstring(taskdata.replace("<ISO11783_TaskData", '<ISO11783_TaskData TaskControllerManufacturer="TC"'))
+    text = writer.tostring(root, indent="  ").decode()
+
+    assert text.startswith('<?xml version="1.0" encoding="UTF-8"?>\n<ISO11783_TaskData VersionMajor="4"')
+    assert 'TaskControllerManufacturer="TC"' in text
+    assert '\n    <TZN A="1">\n      <PDV A="0006" B="100" C="PDT1" E="VPN9"/>' in text
+    assert '<PFD A="PFD1" C="Field" D="1" E="CTR1"/>' in text
+
+def test_format_value():
+    ''' Test the formatting of typed values '''
+    assert writer.format_value(141, "hex") == "008D"
+    assert writer.format_value(49.3682793876954) == "49.3682793876954"
+    assert writer.format_value(1e-07) == "0.0000001"
+    assert writer.format_value(2.0) == "2"
+    with pytest.raises(exception.ISOXMLException):
+        writer.format_value(float("nan"))
+
+def test_columnar():
+    ''' Test that columnar points are written as PNT elements '''
+    pytest.importorskip("numpy")
+    parsed = entity.fromstring(full, columnar=True, keep_element=False)
+    written = entity.fromstring(writer.tostring(parsed), keep_element=False)
+    assert _tree(written) == _tree(entity.fromstring(full, keep_element=False))
+
+def test_stream():
+    ''' Test that entities can be written one at a time '''
+    f = io.BytesIO()
+    with writer.Writer(f) as w:
+        w.start(entity.new("ISO11783_TaskData", version_major=4, version_minor=3, management_software_manufacturer="GaiaData",
+                           management_software_version="1.0", data_transfer_origin=1))
+        for i in range(3):
+            pnt = entity.new("PNT", type=2, north=49.0 + i, east=9.5)
+            w.write(entity.new("PFD", compact=True, id=f"PFD{i}", designator="Field", area=i,
+                               plns=[entity.new("PLN", type=1, lsgs=[entity.new("LSG", type=1, pnts=[pnt])])]))
+
+    root = entity.fromstring(f.getvalue())
+    assert [p.id for p in root.pfds] == ["PFD0", "PFD1", "PFD2"]
+    assert root.pfds[2].plns[0].lsgs[0].pnts[0].north == 51.0
+
+    with pytest.raises(exception.ISOXMLException):
+        entity.new("PNT", type=2)
+
+def test_write_set(tmp_path):
+    ''' Test that TASKDATA sets are written with entities split into external files '''
+    root = entity.fromstring(taskdata)
+    writer.write_set(root, str(tmp_path / "taskdata.zip"), split=["TSK", "PFD"], per_file=2, files={"GRD00001.BIN": b"\1\2"})
+
+    with zipfile.ZipFile(tmp_path / "taskdata.zip") as z:
+        assert sorted(z.namelist()) == [
+            "TASKDATA/GRD00001.BIN", "TASKDATA/PFD00001.XML", "TASKDATA/TASKDATA.XML",
+            "TASKDATA/TSK00001.XML", "TASKDATA/TSK00002.XML",
+        ]
+
+    with dataset.open(str(tmp_path / "taskdata.zip")) as d:
+        assert "tsks" not in d.root.__dict__
+        assert [t.id for t in d.tsks] == ["TSK1", "TSK2", "TSK1"]
+        assert [p.id for p in d.pfds] == ["PFD1", "PFD2"]
+        assert d.read("GRD00001.BIN") == b"\1\2"
+
+        # external files are written as given
+        writer.write_set(d.root, str(tmp_path / "copy"), external=d.load())
+
+    with dataset.open(str(tmp_path / "copy")) as d:
+        assert [t.id for t in d.tsks] == ["TSK1", "TSK2", "TSK1"]
+
+    with pytest.raises(exception.ISOXMLException):
+        writer.write_set(root, str(tmp_path / "x"), split=["PNT"])